@@ -1,14 +1,181 @@
 # authentication/admin.py
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.admin.views.main import ChangeList
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
 from django.utils.html import format_html
 from django.urls import reverse
+from django.utils import timezone
 from django.utils.safestring import mark_safe
 from .models import (
     UserProfile, CompostUnit, CompostMaterial, 
-    CompostEntry, CompostHarvest, MonitoringLog
+    CompostEntry, CompostHarvest, MonitoringLog, SensorReading, SlowQuery,
+    DeviceKey, Job
 )
+from .apikeys import generate_key, key_cache
+from .catalog import catalog
+from .deletion import soft_delete_units, soft_delete_users
+from .pagination import EstimatedCountPaginator, keyset_paginate
+from .routers import replica_reads
+from .search import available as search_available, key_subquery, match_expression
+
+CURSOR_VAR = 'cursor'
+
+class ReplicaChangeListMixin:
+    """Los listados (GET) leen de la réplica analítica si está al día"""
+
+    def changelist_view(self, request, extra_context=None):
+        if request.method != 'GET':
+            return super().changelist_view(request, extra_context)
+        with replica_reads():
+            response = super().changelist_view(request, extra_context)
+            # TemplateResponse evalúa las consultas al renderizar
+            if hasattr(response, 'render'):
+                response.render()
+        return response
+
+
+class KeysetChangeList(ChangeList):
+    """ChangeList que pagina por cursor sobre la clave primaria (sin OFFSET)"""
+
+    def __init__(self, request, *args, **kwargs):
+        self.cursor = request.GET.get(CURSOR_VAR)
+        if CURSOR_VAR in request.GET:
+            # El cursor no es un filtro: se retira antes de que ChangeList lo valide
+            request.GET = request.GET.copy()
+            del request.GET[CURSOR_VAR]
+        super().__init__(request, *args, **kwargs)
+
+    def get_results(self, request):
+        paginator = self.model_admin.get_paginator(
+            request, self.queryset, self.list_per_page
+        )
+        page = keyset_paginate(
+            self.queryset, self.cursor, self.list_per_page,
+            fields=self.model_admin.keyset_fields,
+            approx_total=paginator.count,
+        )
+        self.keyset_page = page
+        self.next_url = page.next_cursor and self.get_query_string({CURSOR_VAR: page.next_cursor})
+        self.previous_url = page.previous_cursor and self.get_query_string(
+            {CURSOR_VAR: page.previous_cursor}
+        )
+        self.result_count = page.approx_total
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.full_result_count = None
+        self.result_list = page.object_list
+        self.can_show_all = False
+        self.multi_page = page.has_other_pages()
+        self.paginator = paginator
+
+
+class CompostUnitListFilter(admin.RelatedFieldListFilter):
+    """Filtro por unidad al estilo raw_id: se escribe el id de la unidad.
+
+    Listar todas las unidades en la barra lateral crece sin límite; aquí solo
+    se muestra la unidad elegida (una consulta por clave primaria) y un campo
+    para el id.
+    """
+    template = 'admin/authentication/unit_id_filter.html'
+
+    def field_choices(self, field, request, model_admin):
+        if not self.lookup_val:
+            return []
+        try:
+            units = CompostUnit.all_objects.select_related('owner').filter(pk__in=self.lookup_val)
+            return [(unit.pk, str(unit)) for unit in units]
+        except ValidationError:
+            return []
+
+    def has_output(self):
+        return True
+
+    def choices(self, changelist):
+        # Los demás filtros y la búsqueda se conservan al enviar el formulario
+        ignored = {self.lookup_kwarg, self.lookup_kwarg_isnull, CURSOR_VAR}
+        self.hidden_params = [
+            (name, value) for name, value in changelist.params.items() if name not in ignored
+        ]
+        return super().choices(changelist)
+
+
+class ScalableAdminMixin:
+    """Listados en tiempo acotado: total estimado y paginación por cursor.
+
+    El orden es siempre por clave primaria descendente (búsqueda directa en el
+    índice, también con filtros por clave foránea), así que se desactiva el
+    ordenamiento por columnas.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    sortable_by = ()
+    keyset_fields = ('id',)
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+
+class BackgroundDeleteMixin:
+    """Borrado en segundo plano (ver authentication/deletion.py).
+
+    La confirmación no recorre las relaciones en cascada, que para una unidad
+    con historial largo son millones de filas: solo lista los objetos
+    elegidos. `soft_delete` marca los objetos y encola su purga.
+    """
+    soft_delete = None
+
+    def get_deleted_objects(self, objs, request):
+        objs = list(objs)
+        opts = self.model._meta
+        return [str(obj) for obj in objs], {opts.verbose_name_plural: len(objs)}, set(), []
+
+    def delete_model(self, request, obj):
+        self.delete_queryset(request, [obj])
+
+    def delete_queryset(self, request, queryset):
+        jobs = self.soft_delete(list(queryset))
+        self.message_user(
+            request, f'{len(jobs)} purgas encoladas: el historial se borra en segundo plano.',
+            messages.INFO,
+        )
+
+
+class FullTextSearchMixin:
+    """Búsqueda del admin sobre los índices FTS5 (ver authentication/search.py).
+
+    `fulltext_search` asocia 'pk' o una clave foránea con el índice que la
+    resuelve. Los search_fields que no cubre (p. ej. 'user__username') se
+    buscan en su tabla relacionada con una subconsulta, así que todas las
+    condiciones son IN sobre columnas indexadas y no hay LIKE sobre la tabla
+    grande. Fuera de SQLite se usa la búsqueda normal.
+    """
+    fulltext_search = {}
+
+    def get_search_results(self, request, queryset, search_term):
+        expression = match_expression(search_term)
+        if expression is None or not self.fulltext_search or not search_available(queryset.db):
+            return super().get_search_results(request, queryset, search_term)
+        term = search_term.strip()
+        condition = Q()
+        for path, kind in self.fulltext_search.items():
+            condition |= Q(**{f'{path}__in': RawSQL(*key_subquery(kind, expression))})
+        for field in self.get_search_fields(request):
+            path, _, rest = field.partition('__')
+            if path in self.fulltext_search or (not rest and 'pk' in self.fulltext_search):
+                continue
+            if not rest:
+                condition |= Q(**{f'{field}__icontains': term})
+                continue
+            related = self.model._meta.get_field(path).related_model
+            condition |= Q(**{f'{path}__in': related._base_manager.filter(
+                **{f'{rest}__icontains': term}
+            ).values('pk')})
+        return queryset.filter(condition), False
+
 
 class UserProfileInline(admin.StackedInline):
     """Inline para mostrar el perfil en el admin de usuarios"""
@@ -17,7 +184,7 @@ class UserProfileInline(admin.StackedInline):
     verbose_name_plural = 'Perfil'
 
 
-class UserAdmin(BaseUserAdmin):
+class UserAdmin(BackgroundDeleteMixin, BaseUserAdmin):
     """Admin personalizado para usuarios"""
     inlines = (UserProfileInline,)
     list_display = ('username', 'email', 'first_name', 'last_name', 
@@ -25,6 +192,9 @@ class UserAdmin(BaseUserAdmin):
     list_filter = ('is_staff', 'is_superuser', 'is_active', 'profile__is_verified')
     search_fields = ('username', 'first_name', 'last_name', 'email', 
                     'profile__organization')
+    list_select_related = ('profile',)
+    show_full_result_count = False
+    soft_delete = staticmethod(soft_delete_users)
     
     def get_organization(self, obj):
         return obj.profile.organization if hasattr(obj, 'profile') else '-'
@@ -45,6 +215,7 @@ from .models import UserProfile
 class UserProfileAdmin(admin.ModelAdmin):
     """Admin para perfiles de usuario"""
     list_display = ('user',)  # Usa solo campo seguro
+    list_select_related = ('user',)
     list_filter = ()
     readonly_fields = ()
     date_hierarchy = None
@@ -61,20 +232,25 @@ from django.utils.html import format_html
 from .models import CompostUnit
 
 @admin.register(CompostUnit)
-class CompostUnitAdmin(admin.ModelAdmin):
+class CompostUnitAdmin(FullTextSearchMixin, BackgroundDeleteMixin, admin.ModelAdmin):
     list_display = (
         'name', 'owner', 'unit_type', 'status', 'capacity', 
         'get_capacity_used', 'location', 'is_public', 'created_at'
     )
-    readonly_fields = ('capacity_percentage_display',)
+    readonly_fields = ('current_load', 'capacity_percentage_display')
+    list_select_related = ('owner',)
+    show_full_result_count = False
+    search_fields = ('name', 'description', 'location')
+    fulltext_search = {'pk': 'unit'}
+    soft_delete = staticmethod(soft_delete_units)
 
     def get_capacity_used(self, obj):
         # Llama al método del modelo que devuelve float
         percentage = obj.get_capacity_percentage()
         color = 'green' if percentage < 70 else 'orange' if percentage < 90 else 'red'
         return format_html(
-        '<span style="color: {};">{:.1f}%</span>',
-        color, percentage
+        '<span style="color: {};">{}%</span>',
+        color, f'{percentage:.1f}'
     )
     get_capacity_used.short_description = 'Capacidad Usada'
 
@@ -90,12 +266,13 @@ class CompostUnitAdmin(admin.ModelAdmin):
 
 
 @admin.register(CompostMaterial)
-class CompostMaterialAdmin(admin.ModelAdmin):
+class CompostMaterialAdmin(FullTextSearchMixin, admin.ModelAdmin):
     """Admin para materiales de compostaje"""
     list_display = ('name', 'material_type', 'carbon_nitrogen_ratio', 
                    'is_recommended', 'get_type_badge')
     list_filter = ('material_type', 'is_recommended')
     search_fields = ('name', 'description')
+    fulltext_search = {'pk': 'material'}
     ordering = ('material_type', 'name')
     
     def get_type_badge(self, obj):
@@ -128,14 +305,23 @@ class MonitoringLogInline(admin.TabularInline):
 
 
 @admin.register(CompostEntry)
-class CompostEntryAdmin(admin.ModelAdmin):
+class CompostEntryAdmin(ReplicaChangeListMixin, FullTextSearchMixin, ScalableAdminMixin,
+                        admin.ModelAdmin):
     """Admin para entradas de material"""
-    list_display = ('compost_unit', 'material', 'quantity', 'user', 'date_added')
-    list_filter = ('material__material_type', 'date_added', 'material__is_recommended')
-    search_fields = ('compost_unit__name', 'material__name', 'user__username')
-    date_hierarchy = 'date_added'
+    list_display = ('compost_unit', 'get_material', 'quantity', 'user', 'date_added')
+    # Solo filtros sobre columnas indexadas (claves foráneas)
+    list_filter = ('material', ('compost_unit', CompostUnitListFilter))
+    # El material se resuelve desde el catálogo en memoria
+    list_select_related = ('compost_unit__owner', 'user')
+    raw_id_fields = ('compost_unit', 'user')
+    search_fields = ('compost_unit__name', 'material__name', 'user__username', 'notes')
+    fulltext_search = {'pk': 'entry', 'compost_unit': 'unit', 'material': 'material'}
     readonly_fields = ('date_added',)
     
+    @admin.display(description='Material', ordering='material__name')
+    def get_material(self, obj):
+        return catalog.get(obj.material_id) or obj.material
+
     fieldsets = (
         ('Entrada de Material', {
             'fields': ('compost_unit', 'material', 'quantity', 'user')
@@ -147,13 +333,16 @@ class CompostEntryAdmin(admin.ModelAdmin):
 
 
 @admin.register(CompostHarvest)
-class CompostHarvestAdmin(admin.ModelAdmin):
+class CompostHarvestAdmin(ReplicaChangeListMixin, FullTextSearchMixin, ScalableAdminMixin,
+                          admin.ModelAdmin):
     """Admin para cosechas de compost"""
     list_display = ('compost_unit', 'quantity', 'quality_grade', 
                    'compost_age_days', 'user', 'harvest_date')
-    list_filter = ('quality_grade', 'harvest_date')
-    search_fields = ('compost_unit__name', 'user__username')
-    date_hierarchy = 'harvest_date'
+    list_filter = (('compost_unit', CompostUnitListFilter),)
+    list_select_related = ('compost_unit__owner', 'user')
+    raw_id_fields = ('compost_unit', 'user')
+    search_fields = ('compost_unit__name', 'user__username', 'notes')
+    fulltext_search = {'pk': 'harvest', 'compost_unit': 'unit'}
     readonly_fields = ('harvest_date',)
     
     fieldsets = (
@@ -170,13 +359,16 @@ class CompostHarvestAdmin(admin.ModelAdmin):
 
 
 @admin.register(MonitoringLog)
-class MonitoringLogAdmin(admin.ModelAdmin):
+class MonitoringLogAdmin(ReplicaChangeListMixin, FullTextSearchMixin, ScalableAdminMixin,
+                         admin.ModelAdmin):
     """Admin para registros de monitoreo"""
     list_display = ('compost_unit', 'temperature', 'ph_level', 'moisture_level', 
                    'get_status_indicators', 'user', 'date_recorded')
-    list_filter = ('pest_presence', 'turning_performed', 'date_recorded')
-    search_fields = ('compost_unit__name', 'user__username')
-    date_hierarchy = 'date_recorded'
+    list_filter = (('compost_unit', CompostUnitListFilter),)
+    list_select_related = ('compost_unit__owner', 'user')
+    raw_id_fields = ('compost_unit', 'user')
+    search_fields = ('compost_unit__name', 'user__username', 'notes')
+    fulltext_search = {'pk': 'log', 'compost_unit': 'unit'}
     readonly_fields = ('date_recorded',)
     
     fieldsets = (
@@ -225,6 +417,96 @@ class MonitoringLogAdmin(admin.ModelAdmin):
     get_status_indicators.short_description = 'Indicadores'
 
 
+@admin.register(SensorReading)
+class SensorReadingAdmin(ReplicaChangeListMixin, ScalableAdminMixin, admin.ModelAdmin):
+    """Admin para lecturas de sensores (decenas de millones de filas)"""
+    list_display = ('compost_unit', 'timestamp', 'temperature', 'ph',
+                   'humidity', 'oxygen')
+    list_filter = (('compost_unit', CompostUnitListFilter),)
+    list_select_related = ('compost_unit__owner',)
+    raw_id_fields = ('compost_unit',)
+    readonly_fields = ('timestamp',)
+
+
+@admin.register(DeviceKey)
+class DeviceKeyAdmin(admin.ModelAdmin):
+    """Admin para claves de API de dispositivos"""
+    list_display = ('name', 'owner', 'compost_unit', 'prefix', 'created_at', 'revoked_at')
+    list_filter = ('revoked_at',)
+    list_select_related = ('owner', 'compost_unit__owner')
+    raw_id_fields = ('owner', 'compost_unit')
+    search_fields = ('name', 'prefix', 'owner__username')
+    readonly_fields = ('prefix', 'created_at')
+    actions = ['revoke_keys']
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            obj.prefix, raw_key, obj.key_hash = generate_key()
+            messages.warning(
+                request,
+                f'Clave generada para "{obj.name}": {raw_key} — cópiela ahora, '
+                'no se volverá a mostrar.'
+            )
+        super().save_model(request, obj, form, change)
+
+    @admin.action(description='Revocar claves seleccionadas')
+    def revoke_keys(self, request, queryset):
+        revoked = queryset.filter(revoked_at__isnull=True).update(revoked_at=timezone.now())
+        key_cache.clear()
+        self.message_user(request, f'{revoked} claves revocadas.')
+
+
+@admin.register(SlowQuery)
+class SlowQueryAdmin(admin.ModelAdmin):
+    """Admin de solo lectura para el registro de consultas lentas"""
+    list_display = ('normalized_sql', 'view', 'calls', 'total_time_ms',
+                   'max_time_ms', 'full_scan', 'last_seen')
+    list_filter = ('full_scan',)
+    search_fields = ('normalized_sql', 'view')
+    ordering = ('-total_time_ms',)
+    readonly_fields = [field.name for field in SlowQuery._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    """Admin de la cola de trabajos en segundo plano"""
+    list_display = ('id', 'kind', 'status', 'priority', 'progress', 'attempts',
+                    'owner', 'created_at', 'finished_at')
+    list_filter = ('status', 'kind')
+    list_select_related = ('owner',)
+    search_fields = ('kind', 'dedup_key', 'owner__username')
+    raw_id_fields = ('owner',)
+    readonly_fields = ('attempts', 'progress', 'progress_message', 'result', 'result_file',
+                       'error', 'worker', 'created_at', 'started_at', 'heartbeat_at',
+                       'finished_at')
+    actions = ['retry_jobs', 'cancel_jobs']
+
+    @admin.action(description='Reintentar trabajos fallidos o cancelados')
+    def retry_jobs(self, request, queryset):
+        retried = 0
+        for job in queryset.filter(status__in=('failed', 'cancelled')):
+            # Una clave de deduplicación ya activa en otro trabajo impide reencolar este
+            if job.dedup_key and Job.objects.filter(
+                dedup_key=job.dedup_key, status__in=Job.ACTIVE_STATUSES
+            ).exists():
+                continue
+            retried += Job.objects.filter(pk=job.pk).update(
+                status='queued', attempts=0, run_after=timezone.now(), progress=0,
+                error='', finished_at=None,
+            )
+        self.message_user(request, f'{retried} trabajos reencolados.')
+
+    @admin.action(description='Cancelar trabajos seleccionados')
+    def cancel_jobs(self, request, queryset):
+        cancelled = queryset.filter(status__in=Job.ACTIVE_STATUSES).update(
+            status='cancelled', finished_at=timezone.now()
+        )
+        self.message_user(request, f'{cancelled} trabajos cancelados.')
+
+
 # Configurar el admin personalizado para User
 admin.site.unregister(User)
 admin.site.register(User, UserAdmin)
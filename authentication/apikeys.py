@@ -0,0 +1,157 @@
+# authentication/apikeys.py
+"""Autenticación de dispositivos por clave de API.
+
+Las claves tienen la forma `ck_<prefijo>_<secreto>`. En la base de datos solo
+se guarda el SHA-256 de la clave; cada clave válida se guarda en una caché
+LRU en memoria con TTL, de modo que en régimen estable autenticar una
+petición no consulta la base de datos. Las claves rechazadas van a otra caché
+más chica: una ráfaga de claves inventadas no desplaza a las válidas. Una
+revocación, o desactivar al propietario, tarda como mucho
+DEVICE_KEY_CACHE_TTL segundos en aplicarse en todos los procesos.
+"""
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from functools import wraps
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+
+KEY_PREFIX = 'ck'
+
+DevicePrincipal = namedtuple('DevicePrincipal', 'key_id name owner_id unit_ids')
+
+
+def hash_key(raw_key):
+    return hashlib.sha256(raw_key.encode('utf-8')).hexdigest()
+
+
+def generate_key():
+    """Devuelve (prefijo, clave completa, hash) para una clave nueva"""
+    prefix = secrets.token_hex(6)
+    raw_key = f'{KEY_PREFIX}_{prefix}_{secrets.token_urlsafe(32)}'
+    return prefix, raw_key, hash_key(raw_key)
+
+
+def issue_key(owner, name, compost_unit=None):
+    """Crea una DeviceKey y devuelve (objeto, clave completa)"""
+    from .models import DeviceKey
+
+    prefix, raw_key, key_hash = generate_key()
+    device_key = DeviceKey.objects.create(
+        owner=owner, compost_unit=compost_unit, name=name,
+        prefix=prefix, key_hash=key_hash,
+    )
+    return device_key, raw_key
+
+
+class KeyCache:
+    """Caché LRU con TTL, segura entre hilos"""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return item
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+key_cache = KeyCache(
+    maxsize=getattr(settings, 'DEVICE_KEY_CACHE_SIZE', 1024),
+    ttl=getattr(settings, 'DEVICE_KEY_CACHE_TTL', 60),
+)
+# Claves rechazadas, aparte: un dispositivo mal configurado no consulta la base
+# en cada intento, y las claves al azar solo se desplazan entre sí
+rejected_cache = KeyCache(
+    maxsize=getattr(settings, 'DEVICE_KEY_REJECTED_CACHE_SIZE', 256),
+    ttl=getattr(settings, 'DEVICE_KEY_CACHE_TTL', 60),
+)
+
+
+def _load_principal(raw_key, digest):
+    from .models import CompostUnit, DeviceKey
+
+    try:
+        _, prefix, _ = raw_key.split('_', 2)
+    except ValueError:
+        return None
+    device_key = (
+        # Las claves de gateway no tienen unidad: el LEFT JOIN las deja pasar
+        DeviceKey.objects.filter(prefix=prefix, revoked_at__isnull=True, owner__is_active=True,
+                                 compost_unit__deleted_at__isnull=True)
+        .only('id', 'name', 'owner_id', 'compost_unit_id', 'key_hash')
+        .first()
+    )
+    if device_key is None or not hmac.compare_digest(device_key.key_hash, digest):
+        return None
+    if device_key.compost_unit_id:
+        unit_ids = frozenset([device_key.compost_unit_id])
+    else:
+        unit_ids = frozenset(
+            CompostUnit.objects.filter(owner_id=device_key.owner_id).values_list('id', flat=True)
+        )
+    return DevicePrincipal(device_key.pk, device_key.name, device_key.owner_id, unit_ids)
+
+
+def verify_key(raw_key):
+    """Devuelve el DevicePrincipal de una clave válida, o None"""
+    if not raw_key or not raw_key.startswith(KEY_PREFIX + '_'):
+        return None
+    digest = hash_key(raw_key)
+    cached = key_cache.get(digest)
+    if cached is not None:
+        return cached[1]
+    if rejected_cache.get(digest) is not None:
+        return None
+    principal = _load_principal(raw_key, digest)
+    if principal is None:
+        rejected_cache.set(digest, None)
+    else:
+        key_cache.set(digest, principal)
+    return principal
+
+
+def get_request_key(request):
+    auth = request.headers.get('Authorization', '')
+    if auth.lower().startswith('bearer '):
+        return auth[7:].strip()
+    return request.headers.get('X-Device-Key', '').strip()
+
+
+def device_key_required(view_func):
+    """Decorador: exige una clave de dispositivo válida y la deja en request.device"""
+    @csrf_exempt
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        principal = verify_key(get_request_key(request))
+        if principal is None:
+            return JsonResponse({'error': 'Clave de dispositivo inválida o revocada.'}, status=401)
+        request.device = principal
+        return view_func(request, *args, **kwargs)
+    return wrapper
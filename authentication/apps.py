@@ -13,4 +13,5 @@ class AuthenticationConfig(AppConfig):
     name = 'authentication'
 
     def ready(self):
-        import authentication.signals
\ No newline at end of file
+        import authentication.signals
+        import authentication.assets  # registra el chequeo de librerías locales
@@ -0,0 +1,142 @@
+# authentication/assets.py
+"""Archivos estáticos propios: librerías locales, nombres con hash y compresión.
+
+Las librerías, íconos y fuentes de terceros se guardan versionados en
+authentication/static/authentication/vendor (ver el comando `vendor_assets`)
+y nunca se sirven desde un CDN público: si falta alguno, la verificación
+authentication.E001 falla. Al correr
+collectstatic cada archivo recibe un nombre con el hash de su contenido y se
+escriben a su lado variantes .gz y .br ya comprimidas; `serve_static` elige la
+variante según Accept-Encoding y marca los nombres con hash como inmutables.
+"""
+import gzip
+import mimetypes
+import os
+import re
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.checks import Error, register
+
+try:
+    import brotli
+except ImportError:  # sin brotli solo se generan variantes gzip
+    brotli = None
+
+VENDOR_DIR = os.path.join(os.path.dirname(__file__), 'static', 'authentication', 'vendor')
+
+FONT_AWESOME = 'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/'
+FONTSOURCE = 'https://cdn.jsdelivr.net/npm/@fontsource/'
+
+# ruta local (relativa a VENDOR_DIR) -> URL de la versión fijada
+VENDOR_ASSETS = {
+    'chart.umd.js': 'https://cdn.jsdelivr.net/npm/chart.js@4.4.1/dist/chart.umd.js',
+    'jquery-3.6.0.min.js': 'https://code.jquery.com/jquery-3.6.0.min.js',
+    'sweetalert2.all.min.js': 'https://cdn.jsdelivr.net/npm/sweetalert2@11.10.5/dist/sweetalert2.all.min.js',
+    # all.min.css referencia ../webfonts/: se conserva la misma estructura
+    'fontawesome/css/all.min.css': FONT_AWESOME + 'css/all.min.css',
+    **{
+        f'fontawesome/webfonts/{font}.{ext}': f'{FONT_AWESOME}webfonts/{font}.{ext}'
+        for font in ('fa-brands-400', 'fa-regular-400', 'fa-solid-900', 'fa-v4compatibility')
+        for ext in ('woff2', 'ttf')
+    },
+    # Las declara css/fonts.css
+    'fonts/raleway-latin-700-normal.woff2':
+        FONTSOURCE + 'raleway@5.0.8/files/raleway-latin-700-normal.woff2',
+    'fonts/montserrat-latin-400-normal.woff2':
+        FONTSOURCE + 'montserrat@5.0.8/files/montserrat-latin-400-normal.woff2',
+}
+
+# Extensiones que vale la pena comprimir (las imágenes y PDF ya lo están)
+COMPRESSIBLE = {'.js', '.css', '.svg', '.json', '.html', '.txt', '.map', '.xml'}
+# (codificación, sufijo) en orden de preferencia
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+# Nombre con el hash de ManifestStaticFilesStorage: archivo.0123456789ab.ext
+HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+def compress_file(path):
+    """Escribe path.gz (y path.br si hay brotli) cuando comprimir ahorra espacio"""
+    if os.path.splitext(path)[1].lower() not in COMPRESSIBLE:
+        return []
+    with open(path, 'rb') as source:
+        data = source.read()
+    variants = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append(('.br', brotli.compress(data, quality=11)))
+    written = []
+    for suffix, compressed in variants:
+        if len(compressed) < len(data) * 0.95:
+            with open(path + suffix, 'wb') as target:
+                target.write(compressed)
+            written.append(path + suffix)
+    return written
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Nombres con hash de contenido más variantes precomprimidas de cada archivo"""
+
+    def post_process(self, paths, dry_run=False, **options):
+        names = set()
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if hashed_name and not isinstance(processed, Exception):
+                names.update((name, hashed_name))
+            yield name, hashed_name, processed
+        if dry_run:
+            return
+        for name in sorted(names):
+            compress_file(self.path(name))
+
+
+def accepted_encodings(header):
+    """Codificaciones aceptadas en un encabezado Accept-Encoding (ignora q=0)"""
+    accepted = set()
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        quality = params.strip()
+        if quality.startswith('q=') and quality[2:].strip() in ('0', '0.0', '0.00', '0.000'):
+            continue
+        if coding:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def pick_variant(path, header):
+    """(ruta a servir, codificación o None) para `path` según Accept-Encoding"""
+    accepted = accepted_encodings(header)
+    for encoding, suffix in ENCODINGS:
+        if (encoding in accepted or '*' in accepted) and os.path.isfile(path + suffix):
+            return path + suffix, encoding
+    return path, None
+
+
+def content_type(path):
+    content, _ = mimetypes.guess_type(path)
+    return content or 'application/octet-stream'
+
+
+def vendor_url(name):
+    """URL estática de la copia local de una librería fijada en VENDOR_ASSETS"""
+    from django.templatetags.static import static
+
+    if name not in VENDOR_ASSETS:
+        raise KeyError(f'{name} no está en VENDOR_ASSETS')
+    return static('authentication/vendor/' + name)
+
+
+def missing_vendor_assets():
+    return [name for name in VENDOR_ASSETS if not os.path.isfile(os.path.join(VENDOR_DIR, name))]
+
+
+@register()
+def check_vendor_assets(app_configs, **kwargs):
+    missing = missing_vendor_assets()
+    if not missing:
+        return []
+    return [Error(
+        'Faltan librerías locales: ' + ', '.join(missing),
+        hint='Ejecute "python manage.py vendor_assets" donde haya conexión y versione los '
+             'archivos de authentication/static/authentication/vendor.',
+        id='authentication.E001',
+    )]
@@ -0,0 +1,181 @@
+# authentication/balance.py
+"""Balance carbono/nitrógeno de las unidades de compostaje.
+
+CompostBalance guarda por unidad la masa de material verde, marrón y otro y
+la suma de cantidad × C/N. Cada alta, edición o baja de una CompostEntry
+aplica solo su diferencia con F(), así que consultar el balance o simular
+nuevas entradas no depende de cuántas entradas tenga la unidad.
+`rebuild_balances` recalcula los acumulados desde cero (bulk_create y
+QuerySet.update no envían señales).
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+from django.utils import timezone
+
+from .catalog import catalog
+
+MASS_FIELDS = {'green': 'green_kg', 'brown': 'brown_kg', 'other': 'other_kg'}
+
+
+def _material_info(material_id):
+    """(tipo, C/N) del material, desde el catálogo en memoria si es posible"""
+    material = catalog.get(material_id)
+    if material is None:
+        from .models import CompostMaterial
+
+        material = CompostMaterial.objects.filter(pk=material_id).only(
+            'material_type', 'carbon_nitrogen_ratio'
+        ).first()
+        if material is None:
+            return None
+    return material.material_type, Decimal(material.carbon_nitrogen_ratio)
+
+
+def apply_entry(unit_id, material_id, quantity, sign=1):
+    """Suma (sign=1) o resta (sign=-1) una entrada al balance de la unidad.
+
+    Devuelve el número de filas actualizadas (0 si la unidad aún no tiene
+    balance).
+    """
+    from .models import CompostBalance
+
+    info = _material_info(material_id)
+    if info is None or unit_id is None or quantity is None:
+        return 0
+    material_type, cn_ratio = info
+    quantity = Decimal(str(quantity)) * sign
+    mass_field = MASS_FIELDS.get(material_type, 'other_kg')
+    return CompostBalance.objects.filter(pk=unit_id).update(**{
+        mass_field: F(mass_field) + quantity,
+        'cn_mass': F('cn_mass') + quantity * cn_ratio,
+        'entry_count': F('entry_count') + sign,
+        'updated_at': timezone.now(),
+    })
+
+
+def apply_entries(entries):
+    """Suma al balance un lote de entradas con un UPDATE por unidad y tipo"""
+    from .models import CompostBalance
+
+    deltas = defaultdict(lambda: [Decimal(0), Decimal(0), 0])
+    for entry in entries:
+        info = _material_info(entry.material_id)
+        if info is None:
+            continue
+        material_type, cn_ratio = info
+        quantity = Decimal(str(entry.quantity))
+        delta = deltas[entry.compost_unit_id, MASS_FIELDS.get(material_type, 'other_kg')]
+        delta[0] += quantity
+        delta[1] += quantity * cn_ratio
+        delta[2] += 1
+    missing = set()
+    for (unit_id, mass_field), (mass, weighted, count) in deltas.items():
+        updated = CompostBalance.objects.filter(pk=unit_id).update(**{
+            mass_field: F(mass_field) + mass,
+            'cn_mass': F('cn_mass') + weighted,
+            'entry_count': F('entry_count') + count,
+            'updated_at': timezone.now(),
+        })
+        if not updated:
+            missing.add(unit_id)
+    if missing:
+        rebuild_balances(missing)
+
+
+def rebuild_balances(unit_ids=None):
+    """Recalcula los balances desde las entradas; devuelve cuántos se escribieron"""
+    from .models import CompostBalance, CompostEntry, CompostUnit
+
+    units = CompostUnit.objects.all()
+    entries = CompostEntry.objects.all()
+    if unit_ids is not None:
+        units = units.filter(pk__in=unit_ids)
+        entries = entries.filter(compost_unit__in=unit_ids)
+
+    cn_mass = ExpressionWrapper(
+        F('quantity') * F('material__carbon_nitrogen_ratio'),
+        output_field=DecimalField(max_digits=16, decimal_places=4),
+    )
+    totals = {}
+    grouped = (
+        entries.order_by()
+        .values('compost_unit', 'material__material_type')
+        .annotate(mass=Sum('quantity'), weighted=Sum(cn_mass), entries=Count('id'))
+    )
+    for row in grouped:
+        balance = totals.setdefault(row['compost_unit'], CompostBalance(
+            compost_unit_id=row['compost_unit'], updated_at=timezone.now(),
+        ))
+        mass_field = MASS_FIELDS.get(row['material__material_type'], 'other_kg')
+        setattr(balance, mass_field, getattr(balance, mass_field) + row['mass'])
+        balance.cn_mass += row['weighted'] or 0
+        balance.entry_count += row['entries']
+
+    unit_pks = list(units.values_list('pk', flat=True))
+    with transaction.atomic():
+        CompostBalance.objects.filter(pk__in=unit_pks).delete()
+        CompostBalance.objects.bulk_create(
+            [totals.get(pk) or CompostBalance(compost_unit_id=pk) for pk in unit_pks],
+            batch_size=500,
+        )
+    return len(unit_pks)
+
+
+def summarize(green_kg, brown_kg, other_kg, cn_mass):
+    """Resumen serializable de un balance (real o simulado)"""
+    from .models import CompostBalance
+
+    total = green_kg + brown_kg + other_kg
+    ratio = float(cn_mass / total) if total > 0 else None
+    low, high = CompostBalance.TARGET_CN
+    if ratio is None:
+        status = 'sin datos'
+    elif ratio < low:
+        status = 'exceso de nitrógeno'
+    elif ratio > high:
+        status = 'exceso de carbono'
+    else:
+        status = 'equilibrado'
+    return {
+        'green_kg': float(green_kg),
+        'brown_kg': float(brown_kg),
+        'other_kg': float(other_kg),
+        'total_kg': float(total),
+        'cn_ratio': round(ratio, 2) if ratio is not None else None,
+        'brown_green_ratio': round(float(brown_kg / green_kg), 2) if green_kg > 0 else None,
+        'status': status,
+    }
+
+
+def what_if(balance, additions):
+    """Balance actual y el que resultaría de agregar `additions`.
+
+    `balance` es un CompostBalance (o None si la unidad no tiene entradas) y
+    `additions` una lista de (material_id, cantidad). El costo depende solo
+    del número de adiciones, no del historial de la unidad.
+    """
+    zero = Decimal(0)
+    masses = {
+        'green': balance.green_kg if balance else zero,
+        'brown': balance.brown_kg if balance else zero,
+        'other': balance.other_kg if balance else zero,
+    }
+    current = summarize(masses['green'], masses['brown'], masses['other'],
+                        balance.cn_mass if balance else zero)
+    cn_mass = balance.cn_mass if balance else zero
+    for material_id, quantity in additions:
+        info = _material_info(material_id)
+        if info is None:
+            raise ValueError(f'material desconocido: {material_id}')
+        material_type, cn_ratio = info
+        quantity = Decimal(str(quantity))
+        if quantity <= 0:
+            raise ValueError('la cantidad debe ser positiva')
+        key = material_type if material_type in masses else 'other'
+        masses[key] += quantity
+        cn_mass += quantity * cn_ratio
+    projected = summarize(masses['green'], masses['brown'], masses['other'], cn_mass)
+    return {'current': current, 'projected': projected}
@@ -0,0 +1,128 @@
+# authentication/bundles.py
+"""Exportación masiva de lecturas: un PDF/CSV por unidad dentro de un ZIP.
+
+Cada unidad se exporta en un proceso aparte del pool, que lee sus lecturas
+de la base en bloques y escribe su archivo en un directorio temporal. A
+medida que terminan, los archivos se copian por partes al ZIP y se borran,
+así que la memoria no depende de la cantidad de unidades ni de lecturas y
+el tiempo total escala con los núcleos disponibles.
+"""
+import csv
+import multiprocessing
+import os
+import shutil
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+from django.utils.text import slugify
+
+FORMATS = ('pdf', 'csv')
+# Procesos por exportación; el trabajo ya corre en un proceso del pool de run_jobs
+MAX_WORKERS = min(os.cpu_count() or 1, 8)
+CSV_HEADER = ('timestamp', 'temperature', 'ph', 'humidity', 'oxygen')
+
+
+def parse_day(value):
+    """date a partir de 'AAAA-MM-DD' (None si está vacío); ValueError si no es válida"""
+    return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+
+
+def unit_readings(unit_id, start=None, end=None):
+    """Lecturas de una unidad entre los días `start` y `end` inclusive (zona activa)"""
+    from .models import SensorReading
+
+    readings = SensorReading.objects.filter(compost_unit_id=unit_id).order_by('timestamp')
+    tz = timezone.get_current_timezone()
+    if start:
+        readings = readings.filter(timestamp__gte=datetime.combine(start, time.min, tzinfo=tz))
+    if end:
+        readings = readings.filter(
+            timestamp__lt=datetime.combine(end + timedelta(days=1), time.min, tzinfo=tz)
+        )
+    return readings
+
+
+def bundle_name(unit, fmt):
+    """Nombre del archivo de una unidad dentro del ZIP (único aunque se repitan nombres)"""
+    return f'{slugify(unit.name) or "unidad"}-{str(unit.pk)[:8]}.{fmt}'
+
+
+def export_unit(unit_id, fmt, directory, start=None, end=None):
+    """Escribe el archivo de una unidad en `directory`; corre en un proceso del pool.
+
+    Devuelve (nombre en el ZIP, ruta, filas escritas).
+    """
+    from django.db import close_old_connections
+    from .models import CompostUnit
+    from .reports import readings_rows, write_readings_pdf
+
+    close_old_connections()
+    unit = CompostUnit.objects.filter(pk=unit_id).first()
+    if unit is None:
+        # Borrada después de encolar la exportación
+        return None, None, 0
+    readings = unit_readings(unit.pk, start, end)
+    name = bundle_name(unit, fmt)
+    path = os.path.join(directory, name)
+    written = 0
+
+    if fmt == 'csv':
+        with open(path, 'w', newline='', encoding='utf-8') as output:
+            writer = csv.writer(output)
+            writer.writerow(CSV_HEADER)
+            for ts, *values in readings.values_list(*CSV_HEADER).iterator(chunk_size=2000):
+                writer.writerow([ts.isoformat(), *('' if v is None else v for v in values)])
+                written += 1
+    else:
+        def counted(rows):
+            nonlocal written
+            for row in rows:
+                written += 1
+                yield row
+
+        with open(path, 'wb') as output:
+            write_readings_pdf(output, unit, counted(readings_rows(readings)))
+    return name, path, written
+
+
+def build_bundle(unit_ids, output, formats=FORMATS, start=None, end=None, workers=None,
+                 progress=None):
+    """Exporta las unidades en paralelo y arma el ZIP en `output` (ruta).
+
+    `progress(hechas, total)` se llama al terminar cada archivo. Devuelve
+    una lista de (unit_id, nombre, filas) en el orden en que se agregaron.
+    """
+    from .jobs import init_worker
+
+    tasks = [(unit_id, fmt) for unit_id in unit_ids for fmt in formats]
+    workers = max(1, min(workers or MAX_WORKERS, len(tasks) or 1))
+    directory = tempfile.mkdtemp(prefix='bundle-', dir=os.path.dirname(output))
+    summary = []
+    try:
+        with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_DEFLATED) as bundle, \
+                ProcessPoolExecutor(max_workers=workers,
+                                    mp_context=multiprocessing.get_context('spawn'),
+                                    initializer=init_worker) as pool:
+            futures = {
+                pool.submit(export_unit, unit_id, fmt, directory, start, end): unit_id
+                for unit_id, fmt in tasks
+            }
+            for done, future in enumerate(as_completed(futures), 1):
+                name, path, written = future.result()
+                if progress:
+                    progress(done, len(tasks))
+                if name is None:
+                    continue
+                # ZipFile.write copia por bloques: el archivo no se carga entero en memoria
+                bundle.write(path, arcname=name)
+                os.remove(path)
+                summary.append((futures[future], name, written))
+
+            index = '\n'.join(f'{name},{written}' for _, name, written in summary)
+            bundle.writestr('resumen.csv', 'archivo,lecturas\n' + index + '\n')
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return summary
@@ -0,0 +1,98 @@
+# authentication/catalog.py
+"""Catálogo de materiales de compostaje en memoria del proceso.
+
+CompostMaterial es una tabla pequeña y casi estática, así que se carga una
+sola vez por proceso. Cada edición de un material actualiza un sello de
+versión en RUNTIME_DIR; comprobarlo es un stat() del archivo, sin consultas,
+y cuando cambia el catálogo se vuelve a cargar en todos los procesos.
+"""
+import os
+import threading
+import time
+
+from django.conf import settings
+
+
+def _stamp_path():
+    runtime_dir = getattr(settings, 'RUNTIME_DIR', settings.BASE_DIR / 'var')
+    return os.path.join(runtime_dir, 'catalog.version')
+
+
+def current_version():
+    try:
+        return os.stat(_stamp_path()).st_mtime_ns
+    except OSError:
+        return 0
+
+
+def bump_version():
+    """Invalida el catálogo en todos los procesos"""
+    path = _stamp_path()
+    previous = current_version()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as stamp:
+        stamp.write(str(time.time_ns()))
+    # Garantiza un mtime distinto aunque dos cambios caigan en el mismo tick
+    now = time.time_ns()
+    os.utime(path, ns=(now, max(now, previous + 1)))
+
+
+class MaterialCatalog:
+    """Materiales indexados por id con arreglos precalculados de tipo y C/N"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._by_id = {}
+        self.ids = ()
+        self.types = ()
+        self.cn_ratios = ()
+        self.recommended_ids = ()
+
+    def _refresh(self):
+        version = current_version()
+        if version == self._version:
+            return
+        with self._lock:
+            if version == self._version:
+                return
+            from .models import CompostMaterial
+
+            # Siempre de la principal: la réplica puede estar atrasada y la
+            # versión nueva quedaría fijada con datos viejos
+            materials = list(CompostMaterial.objects.using('default').order_by('name'))
+            self._by_id = {material.pk: material for material in materials}
+            self.ids = tuple(material.pk for material in materials)
+            self.types = tuple(material.material_type for material in materials)
+            self.cn_ratios = tuple(float(material.carbon_nitrogen_ratio) for material in materials)
+            self.recommended_ids = tuple(m.pk for m in materials if m.is_recommended)
+            self._version = version
+
+    @property
+    def version(self):
+        self._refresh()
+        return self._version
+
+    def get(self, material_id):
+        """Material por id (None si no existe). Las instancias son compartidas: no modificarlas."""
+        self._refresh()
+        return self._by_id.get(material_id)
+
+    def all(self):
+        self._refresh()
+        return [self._by_id[pk] for pk in self.ids]
+
+    def recommended(self):
+        self._refresh()
+        return [self._by_id[pk] for pk in self.recommended_ids]
+
+    def recommended_chart(self):
+        """(nombres, relaciones C/N) de los materiales recomendados"""
+        materials = self.recommended()
+        return (
+            [material.name for material in materials],
+            [float(material.carbon_nitrogen_ratio) for material in materials],
+        )
+
+
+catalog = MaterialCatalog()
@@ -0,0 +1,169 @@
+# authentication/deletion.py
+"""Borrado de unidades y usuarios con historiales grandes.
+
+`unit.delete()` hace que Django cargue en memoria cada lectura, registro,
+entrada y cosecha de la unidad para borrarlas en una sola transacción. Aquí
+el borrado tiene dos fases:
+
+1. `soft_delete_units` / `soft_delete_users` marcan la unidad como borrada
+   (o desactivan al usuario) en una escritura corta: desaparece al instante
+   de las vistas, del mapa y de las claves de dispositivo.
+2. Un trabajo en segundo plano (`purge_unit` / `purge_user`) vacía las tablas
+   hijas en lotes de PURGE_BATCH filas con DELETE directos (sin cargar
+   instancias ni enviar señales), cada lote en su propia transacción corta,
+   y al final borra la fila de la unidad.
+
+Las señales que se omiten solo ajustan acumulados de la propia unidad, que
+también se borran.
+"""
+from django.utils import timezone
+
+from .writer import run_write
+
+PURGE_BATCH = 2000
+# Menor prioridad que los trabajos que espera un usuario
+PURGE_PRIORITY = -5
+
+
+def _unit_children():
+    """(modelo, campo) de las tablas que cuelgan de una unidad, en orden de purga"""
+    from .models import (
+        CompostBalance, CompostEntry, CompostHarvest, DeviceKey, MonitoringLog,
+        ReadingSketch, SensorReading, UnitSparkline, YieldSummary,
+    )
+
+    return [
+        (SensorReading, 'compost_unit'),
+        (MonitoringLog, 'compost_unit'),
+        (CompostEntry, 'compost_unit'),
+        (CompostHarvest, 'compost_unit'),
+        (ReadingSketch, 'compost_unit'),
+        (YieldSummary, 'compost_unit'),
+        (CompostBalance, 'compost_unit'),
+        (UnitSparkline, 'compost_unit'),
+        (DeviceKey, 'compost_unit'),
+    ]
+
+
+def _mark_units(units, now):
+    """Marca las unidades como borradas; debe correr dentro de run_write"""
+    from .apikeys import key_cache
+    from .models import DeviceKey
+
+    for unit in units:
+        unit.deleted_at = now
+        # save() y no update(): la señal de post_save la quita del mapa público
+        unit.save(update_fields=['deleted_at', 'updated_at'])
+    # Las claves de la unidad dejan de valer ya; las de propietario se recalculan
+    DeviceKey.objects.filter(compost_unit__in=[unit.pk for unit in units]).delete()
+    key_cache.clear()
+
+
+def _enqueue_purge(kind, params, dedup_key, owner=None):
+    from .jobs import enqueue
+
+    return enqueue(kind, params, owner=owner, priority=PURGE_PRIORITY, dedup_key=dedup_key)
+
+
+def soft_delete_units(units, owner=None):
+    """Marca las unidades como borradas y encola la purga de cada una.
+
+    Devuelve los trabajos encolados.
+    """
+    units = [unit for unit in units if unit.deleted_at is None]
+
+    def mark():
+        _mark_units(units, timezone.now())
+        return [
+            _enqueue_purge('purge_unit', {'unit_id': str(unit.pk)}, f'purge_unit:{unit.pk}', owner)
+            for unit in units
+        ]
+
+    return run_write(mark) if units else []
+
+
+def soft_delete_users(users):
+    """Desactiva a los usuarios, marca sus unidades y encola la purga de cada usuario"""
+    from django.contrib.auth.models import User
+    from .models import CompostUnit, DeviceKey
+
+    user_ids = [user.pk for user in users]
+
+    def mark():
+        User.objects.filter(pk__in=user_ids).update(is_active=False)
+        DeviceKey.objects.filter(owner__in=user_ids).delete()
+        _mark_units(list(CompostUnit.objects.filter(owner__in=user_ids)), timezone.now())
+        # Sin propietario: el trabajo no debe borrarse junto con el usuario
+        return [
+            _enqueue_purge('purge_user', {'user_id': user_id}, f'purge_user:{user_id}')
+            for user_id in user_ids
+        ]
+
+    return run_write(mark) if user_ids else []
+
+
+def _purge_rows(queryset, batch_size, removed=None):
+    """Borra las filas de `queryset` por lotes de claves; devuelve cuántas borró"""
+    total = 0
+    while True:
+        pks = list(queryset.order_by().values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return total
+        model = queryset.model
+        total += run_write(
+            lambda: model._base_manager.filter(pk__in=pks)._raw_delete(model._base_manager.db)
+        )
+        if removed:
+            removed(len(pks))
+
+
+def purge_unit(unit_id, batch_size=PURGE_BATCH, removed=None):
+    """Vacía el historial de una unidad marcada como borrada y borra la unidad.
+
+    `removed(n)`, si se pasa, se llama después de cada lote. Devuelve las
+    filas hijas borradas (None si la unidad no existe o no está marcada).
+    """
+    from .models import CompostUnit
+
+    unit = CompostUnit.all_objects.filter(pk=unit_id).only('pk', 'deleted_at').first()
+    if unit is None or unit.deleted_at is None:
+        return None
+    total = 0
+    for model, field in _unit_children():
+        total += _purge_rows(model._base_manager.filter(**{field: unit.pk}), batch_size, removed)
+    # Sin hijos, la fila de la unidad se borra sin recorrer relaciones
+    run_write(lambda: CompostUnit.all_objects.filter(pk=unit.pk)._raw_delete(
+        CompostUnit.all_objects.db
+    ))
+    return total
+
+
+def purge_user(user_id, batch_size=PURGE_BATCH, removed=None):
+    """Purga las unidades de un usuario desactivado y después borra al usuario.
+
+    Lo que queda (perfil, trabajos, entradas o registros en unidades ajenas)
+    es poco y se borra con el delete() normal, con sus señales. Devuelve las
+    filas borradas o None si el usuario no existe o fue reactivado.
+    """
+    from django.contrib.auth.models import User
+    from .models import CompostUnit
+
+    user = User.objects.filter(pk=user_id).first()
+    if user is None or user.is_active:
+        return None
+    pending = list(CompostUnit.objects.filter(owner=user))
+    if pending:
+        # Unidades creadas después de la desactivación
+        run_write(_mark_units, pending, timezone.now())
+    total = 0
+    for unit_id in list(CompostUnit.all_objects.filter(owner=user).values_list('pk', flat=True)):
+        total += purge_unit(unit_id, batch_size, removed) or 0
+    run_write(user.delete)
+    return total
+
+
+def units_to_purge():
+    """Ids de las unidades marcadas como borradas que siguen en la base"""
+    from .models import CompostUnit
+
+    return list(CompostUnit.all_objects.filter(deleted_at__isnull=False).values_list('pk', flat=True))
@@ -0,0 +1,238 @@
+# authentication/geo.py
+"""Geohash y agregados por celda para el mapa público de unidades.
+
+Cada unidad guarda el geohash de su posición en una columna indexada. Para
+cada precisión de agrupamiento se mantiene una fila MapCell por celda con la
+cantidad de unidades públicas y la suma de sus coordenadas, así que una
+consulta de mapa lee solo las celdas visibles en lugar de cada unidad.
+"""
+from collections import defaultdict
+from math import ceil, floor
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+# Precisión guardada en CompostUnit.geohash (~5 m)
+UNIT_PRECISION = 9
+# Precisiones para las que se mantienen agregados (celda de ~5000 km a ~1 km)
+CLUSTER_PRECISIONS = range(1, 7)
+# Máximo de celdas por consulta; si el área pide más se usa una precisión menor
+MAX_CELLS = 512
+
+
+def encode(latitude, longitude, precision=UNIT_PRECISION):
+    """Geohash de una coordenada"""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    latitude, longitude = float(latitude), float(longitude)
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        target, bounds = (longitude, lon_range) if even else (latitude, lat_range)
+        middle = (bounds[0] + bounds[1]) / 2
+        value <<= 1
+        if target >= middle:
+            value |= 1
+            bounds[0] = middle
+        else:
+            bounds[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits, value = 0, 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """(alto, ancho) en grados de una celda de la precisión dada"""
+    lon_bits = ceil(5 * precision / 2)
+    lat_bits = floor(5 * precision / 2)
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+
+def decode_bounds(geohash):
+    """(sur, oeste, norte, este) de una celda"""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = BASE32.index(char)
+        for shift in range(4, -1, -1):
+            bounds = lon_range if even else lat_range
+            middle = (bounds[0] + bounds[1]) / 2
+            if value >> shift & 1:
+                bounds[0] = middle
+            else:
+                bounds[1] = middle
+            even = not even
+    return lat_range[0], lon_range[0], lat_range[1], lon_range[1]
+
+
+def prefix_range(prefix):
+    """Rango [desde, hasta) de geohashes que empiezan por `prefix` (usa el índice)"""
+    return prefix, prefix + '~'
+
+
+def merge_ranges(cells):
+    """Rangos [desde, hasta) que cubren celdas de igual precisión, uniendo las contiguas"""
+    ranges = []
+    previous = None
+    for cell in sorted(cells):
+        value = int(''.join(f'{BASE32.index(char):05b}' for char in cell), 2)
+        if ranges and value == previous + 1:
+            ranges[-1][1] = prefix_range(cell)[1]
+        else:
+            ranges.append(list(prefix_range(cell)))
+        previous = value
+    return [tuple(item) for item in ranges]
+
+
+def cover(south, west, north, east, precision):
+    """Celdas de la precisión dada que cubren el rectángulo (None si son más de MAX_CELLS)"""
+    height, width = cell_size(precision)
+    south, north = max(south, -90.0), min(north, 90.0)
+    # Un rectángulo que cruza el antimeridiano se divide en dos
+    spans = [(west, east)] if west <= east else [(west, 180.0), (-180.0, east)]
+    rows = floor((north + 90) / height) - floor((south + 90) / height) + 1
+    columns = sum(floor((e + 180) / width) - floor((w + 180) / width) + 1 for w, e in spans)
+    if rows * columns > MAX_CELLS:
+        return None
+    cells = set()
+    for row in range(rows):
+        lat = min((floor((south + 90) / height) + row + 0.5) * height - 90, 90 - height / 2)
+        for w, e in spans:
+            first = floor((w + 180) / width)
+            for column in range(floor((e + 180) / width) - first + 1):
+                lon = min((first + column + 0.5) * width - 180, 180 - width / 2)
+                cells.add(encode(lat, lon, precision))
+    return sorted(cells)
+
+
+def cluster_precision(zoom):
+    """Precisión de agrupamiento para un nivel de zoom de mapa web (None = puntos)"""
+    if zoom >= 15:
+        return None
+    return max(min(int(zoom * 0.42) + 1, CLUSTER_PRECISIONS[-1]), CLUSTER_PRECISIONS[0])
+
+
+def prefixes(geohash):
+    """Prefijos de `geohash` para cada precisión de agrupamiento"""
+    return [geohash[:p] for p in CLUSTER_PRECISIONS if len(geohash) >= p]
+
+
+def apply_unit(state, sign=1):
+    """Suma (sign=1) o resta (sign=-1) una unidad pública a las celdas de su geohash.
+
+    `state` es el resultado de CompostUnit.map_state().
+    """
+    from .models import MapCell
+
+    if state is None:
+        return
+    geohash, latitude, longitude = state
+    latitude, longitude = float(latitude), float(longitude)
+    for cell in prefixes(geohash):
+        rows = MapCell.objects.filter(cell=cell)
+        deltas = {
+            'unit_count': F('unit_count') + sign,
+            'latitude_sum': F('latitude_sum') + sign * latitude,
+            'longitude_sum': F('longitude_sum') + sign * longitude,
+        }
+        if rows.update(**deltas) or sign < 0:
+            continue
+        try:
+            with transaction.atomic():
+                MapCell.objects.create(cell=cell, precision=len(cell), unit_count=1,
+                                       latitude_sum=latitude, longitude_sum=longitude)
+        except IntegrityError:
+            rows.update(**deltas)
+
+
+def rebuild_map_cells():
+    """Recalcula todas las celdas desde las unidades públicas; devuelve cuántas escribió"""
+    from .models import CompostUnit, MapCell
+
+    totals = defaultdict(lambda: [0, 0.0, 0.0])
+    units = (
+        CompostUnit.objects.filter(is_public=True).exclude(geohash='')
+        .values_list('geohash', 'latitude', 'longitude').iterator(chunk_size=5000)
+    )
+    for geohash, latitude, longitude in units:
+        for cell in prefixes(geohash):
+            total = totals[cell]
+            total[0] += 1
+            total[1] += float(latitude)
+            total[2] += float(longitude)
+    with transaction.atomic():
+        MapCell.objects.all().delete()
+        MapCell.objects.bulk_create(
+            (MapCell(cell=cell, precision=len(cell), unit_count=count,
+                     latitude_sum=lat_sum, longitude_sum=lon_sum)
+             for cell, (count, lat_sum, lon_sum) in totals.items()),
+            batch_size=2000,
+        )
+    return len(totals)
+
+
+def map_clusters(south, west, north, east, zoom):
+    """Agrupaciones de unidades públicas visibles en el rectángulo.
+
+    Devuelve (precisión, celdas) donde cada celda es un dict con su
+    centroide, cantidad y límites; precisión None significa que el zoom es
+    suficiente para mostrar unidades individuales (ver `map_points`).
+    """
+    from .models import MapCell
+
+    precision = cluster_precision(zoom)
+    if precision is None:
+        return None, []
+    cells = cover(south, west, north, east, precision)
+    while cells is None and precision > CLUSTER_PRECISIONS[0]:
+        precision -= 1
+        cells = cover(south, west, north, east, precision)
+    rows = MapCell.objects.filter(cell__in=cells or [], unit_count__gt=0).values_list(
+        'cell', 'unit_count', 'latitude_sum', 'longitude_sum'
+    )
+    clusters = []
+    for cell, count, lat_sum, lon_sum in rows:
+        s, w, n, e = decode_bounds(cell)
+        clusters.append({
+            'cell': cell,
+            'count': count,
+            'latitude': round(lat_sum / count, 6),
+            'longitude': round(lon_sum / count, 6),
+            'bounds': [s, w, n, e],
+        })
+    return precision, clusters
+
+
+def map_points(south, west, north, east, limit=1000):
+    """Unidades públicas dentro del rectángulo, buscadas por rangos de geohash indexados"""
+    from .models import CompostUnit
+
+    precision = CLUSTER_PRECISIONS[-1]
+    cells = cover(south, west, north, east, precision)
+    while cells is None and precision > CLUSTER_PRECISIONS[0]:
+        precision -= 1
+        cells = cover(south, west, north, east, precision)
+    condition = Q()
+    for low, high in merge_ranges(cells or []):
+        condition |= Q(geohash__gte=low, geohash__lt=high)
+    if not condition:
+        return []
+    # is_public coincide con la condición del índice parcial sobre geohash
+    units = (
+        CompostUnit.objects.filter(condition, is_public=True)
+        .filter(latitude__gte=south, latitude__lte=north)
+        .order_by()
+        .values('id', 'name', 'unit_type', 'status', 'latitude', 'longitude')
+    )
+    if west <= east:
+        units = units.filter(longitude__gte=west, longitude__lte=east)
+    else:
+        units = units.filter(Q(longitude__gte=west) | Q(longitude__lte=east))
+    return [
+        {'id': str(u['id']), 'name': u['name'], 'unit_type': u['unit_type'],
+         'status': u['status'], 'latitude': float(u['latitude']),
+         'longitude': float(u['longitude'])}
+        for u in units[:limit]
+    ]
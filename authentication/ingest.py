@@ -0,0 +1,178 @@
+# authentication/ingest.py
+"""Ingreso masivo de lecturas de sensores.
+
+El análisis de filas (`parse_chunk`) no toca la base de datos para poder
+ejecutarse en procesos separados; la escritura (`store_readings`) la hace un
+único proceso en transacciones grandes.
+"""
+import csv
+import json
+from collections import defaultdict
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+METRICS = ('temperature', 'ph', 'humidity', 'oxygen')
+UNIT_KEYS = ('compost_unit', 'unit', 'unit_id', 'unit_name')
+
+
+@lru_cache(maxsize=None)
+def reading_limits():
+    """Límites de cada métrica según los campos y validadores del modelo"""
+    from django.core.validators import MaxValueValidator, MinValueValidator
+    from .models import SensorReading
+
+    limits = {}
+    for name in METRICS:
+        field = SensorReading._meta.get_field(name)
+        low = high = None
+        places = None
+        if field.get_internal_type() == 'DecimalField':
+            places = field.decimal_places
+            high = Decimal(10) ** (field.max_digits - field.decimal_places) - Decimal(1).scaleb(-places)
+            low = -high
+        elif field.get_internal_type().startswith('Positive'):
+            low = 0
+        for validator in field.validators:
+            if isinstance(validator, MinValueValidator):
+                low = validator.limit_value if low is None else max(low, validator.limit_value)
+            elif isinstance(validator, MaxValueValidator):
+                high = validator.limit_value if high is None else min(high, validator.limit_value)
+        limits[name] = {'low': low, 'high': high, 'places': places}
+    return limits
+
+
+def _parse_timestamp(value):
+    if value in (None, ''):
+        raise ValueError('falta timestamp')
+    if isinstance(value, (int, float)) or str(value).replace('.', '', 1).isdigit():
+        try:
+            return datetime.fromtimestamp(float(value), tz=dt_timezone.utc)
+        except (ArithmeticError, OSError, ValueError):
+            # Épocas fuera del rango de datetime, infinitas o NaN
+            raise ValueError(f'timestamp fuera de rango: {value!r}')
+    parsed = parse_datetime(str(value).strip())
+    if parsed is None:
+        raise ValueError(f'timestamp inválido: {value!r}')
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, dt_timezone.utc)
+    return parsed
+
+
+def _parse_metric(name, value, limit):
+    if value is None or (isinstance(value, str) and value.strip() in ('', '-', 'null')):
+        return None
+    try:
+        number = Decimal(str(value).strip())
+    except InvalidOperation:
+        raise ValueError(f'{name} no es numérico: {value!r}')
+    if not number.is_finite():
+        raise ValueError(f'{name} debe ser un número finito: {value!r}')
+    try:
+        if limit['places'] is not None:
+            number = number.quantize(Decimal(1).scaleb(-limit['places']))
+        else:
+            number = int(number.to_integral_value())
+    except ArithmeticError:
+        # quantize excede la precisión del contexto (p. ej. 1e400)
+        raise ValueError(f'{name}={value} fuera de rango')
+    if limit['low'] is not None and number < limit['low']:
+        raise ValueError(f'{name}={value} menor que {limit["low"]}')
+    if limit['high'] is not None and number > limit['high']:
+        raise ValueError(f'{name}={value} mayor que {limit["high"]}')
+    return number
+
+
+def parse_record(record, limits):
+    """Convierte un dict de entrada en (unidad, timestamp, métricas...)"""
+    unit_ref = next((record[k] for k in UNIT_KEYS if record.get(k) not in (None, '')), None)
+    if unit_ref is None:
+        raise ValueError('falta la unidad')
+    values = tuple(_parse_metric(name, record.get(name), limits[name]) for name in METRICS)
+    if all(v is None for v in values):
+        raise ValueError('la fila no tiene ninguna métrica')
+    return (str(unit_ref).strip(), _parse_timestamp(record.get('timestamp'))) + values
+
+
+def parse_chunk(fmt, fieldnames, lines, limits, first_line_number):
+    """Analiza un bloque de líneas crudas; devuelve (filas, errores).
+
+    Es una función de módulo sin acceso a la base de datos para poder
+    enviarse a un ProcessPoolExecutor.
+    """
+    records = csv.DictReader(lines, fieldnames=fieldnames) if fmt == 'csv' else lines
+    rows, errors = [], []
+    for line_number, record in enumerate(records, start=first_line_number):
+        try:
+            if fmt != 'csv':
+                if not record.strip():
+                    continue
+                record = json.loads(record)
+            rows.append(parse_record(record, limits))
+        # Una fila inválida (JSON roto, desbordes, épocas fuera de rango) se
+        # rechaza sola: no debe cortar la importación completa
+        except (ValueError, TypeError, AttributeError, ArithmeticError, OSError) as exc:
+            errors.append((line_number, str(exc)))
+    return rows, errors
+
+
+def store_readings(rows):
+    """Inserta lecturas ya validadas omitiendo duplicados (unidad, timestamp).
+
+    `rows` son tuplas (unit_id, timestamp, temperature, ph, humidity, oxygen).
+    Debe llamarse dentro de una transacción; devuelve (insertadas, duplicadas,
+    omitidas). Se omiten las filas de unidades borradas: otro proceso puede
+    seguir aceptando una clave de la unidad hasta que venza su caché, y una
+    lectura nueva impediría purgar la unidad.
+    """
+    from django.db.models import F
+    from .models import CompostUnit, SensorReading
+    from .sketches import apply_readings
+    from .sparklines import apply_readings as apply_sparklines
+
+    by_unit = defaultdict(dict)
+    for row in rows:
+        # Dentro del bloque gana la última fila con la misma clave
+        by_unit[row[0]][row[1]] = row
+    # Dentro de la transacción de escritura: una unidad no puede borrarse entre
+    # esta consulta y el INSERT
+    active = set(CompostUnit.objects.filter(pk__in=list(by_unit)).values_list('pk', flat=True))
+    skipped = sum(1 for row in rows if row[0] not in active)
+    by_unit = {unit_id: unit_rows for unit_id, unit_rows in by_unit.items() if unit_id in active}
+
+    to_create = []
+    duplicates = len(rows) - skipped
+    for unit_id, unit_rows in by_unit.items():
+        existing = set(
+            SensorReading.objects.filter(
+                compost_unit_id=unit_id,
+                timestamp__range=(min(unit_rows), max(unit_rows)),
+            ).values_list('timestamp', flat=True)
+        )
+        for ts, (_, _, temperature, ph, humidity, oxygen) in unit_rows.items():
+            if ts in existing:
+                continue
+            to_create.append(SensorReading(
+                compost_unit_id=unit_id, timestamp=ts, temperature=temperature,
+                ph=ph, humidity=humidity, oxygen=oxygen,
+            ))
+    duplicates -= len(to_create)
+
+    SensorReading.objects.bulk_create(to_create, batch_size=2000)
+
+    # bulk_create no envía señales: los contadores se actualizan por unidad
+    added = defaultdict(int)
+    for reading in to_create:
+        added[reading.compost_unit_id] += 1
+    for unit_id, count in added.items():
+        CompostUnit.objects.filter(pk=unit_id).update(reading_count=F('reading_count') + count)
+    added_rows = [
+        (r.compost_unit_id, r.timestamp, r.temperature, r.ph, r.humidity, r.oxygen)
+        for r in to_create
+    ]
+    apply_readings(added_rows)
+    apply_sparklines(added_rows)
+    return len(to_create), duplicates, skipped
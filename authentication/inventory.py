@@ -0,0 +1,84 @@
+# authentication/inventory.py
+"""Carga actual de las unidades de compostaje.
+
+`CompostUnit.current_load` es el saldo del libro de movimientos: suma de
+entradas menos suma de cosechas. Cada movimiento lo ajusta con un UPDATE
+atómico `current_load = current_load + delta`, sin leer el valor ni bloquear
+la fila en Python, dentro de la misma transacción que el movimiento.
+`reconcile_loads` recalcula el saldo desde el libro para detectar desvíos.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Sum
+
+
+def apply_load(unit_id, delta):
+    """Suma `delta` kg (negativo para restar) a la carga de la unidad"""
+    from .models import CompostUnit
+
+    if unit_id is None or not delta:
+        return 0
+    return CompostUnit.objects.filter(pk=unit_id).update(
+        current_load=F('current_load') + Decimal(str(delta))
+    )
+
+
+def apply_loads(deltas):
+    """Aplica un dict {unit_id: delta} con un UPDATE por unidad"""
+    for unit_id, delta in deltas.items():
+        apply_load(unit_id, delta)
+
+
+def add_entries(entries, batch_size=1000):
+    """Inserta muchas CompostEntry de una vez manteniendo los acumulados.
+
+    bulk_create no envía señales: la carga y el balance C/N se ajustan con
+    un único delta sumado por unidad. Devuelve las entradas creadas.
+    """
+    from .balance import apply_entries
+    from .models import CompostEntry
+
+    entries = list(entries)
+    deltas = defaultdict(Decimal)
+    for entry in entries:
+        deltas[entry.compost_unit_id] += Decimal(str(entry.quantity))
+    with transaction.atomic():
+        created = CompostEntry.objects.bulk_create(entries, batch_size=batch_size)
+        apply_loads(deltas)
+        apply_entries(created)
+    return created
+
+
+def ledger_loads(unit_ids):
+    """Carga según el libro (entradas - cosechas) de cada unidad en `unit_ids`"""
+    from .models import CompostEntry, CompostHarvest
+
+    loads = dict.fromkeys(unit_ids, Decimal(0))
+    for model, sign in ((CompostEntry, 1), (CompostHarvest, -1)):
+        totals = (
+            model.objects.filter(compost_unit__in=unit_ids)
+            .order_by().values('compost_unit').annotate(total=Sum('quantity'))
+        )
+        for row in totals:
+            loads[row['compost_unit']] += sign * row['total']
+    return {pk: load.quantize(Decimal('0.01')) for pk, load in loads.items()}
+
+
+def reconcile_loads(unit_ids, fix=False):
+    """Compara la carga guardada con la del libro.
+
+    Devuelve una lista de (unit_id, guardada, según el libro) con las
+    unidades desviadas; con `fix=True` además corrige el valor guardado.
+    """
+    from .models import CompostUnit
+
+    with transaction.atomic():
+        expected = ledger_loads(unit_ids)
+        stored = CompostUnit.objects.filter(pk__in=unit_ids).values_list('pk', 'current_load')
+        drift = [(pk, load, expected[pk]) for pk, load in stored if load != expected[pk]]
+        if fix:
+            for pk, _, actual in drift:
+                CompostUnit.objects.filter(pk=pk).update(current_load=actual)
+    return drift
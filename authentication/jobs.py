@@ -0,0 +1,256 @@
+# authentication/jobs.py
+"""Trabajos en segundo plano sobre una tabla de la propia base.
+
+Las vistas encolan un Job con `enqueue` y consultan su estado; el comando
+`run_jobs` toma los trabajos en cola (mayor prioridad primero) y los ejecuta
+en un pool de procesos. Cada tipo de trabajo es una función registrada con
+`@register('tipo')` que recibe un JobContext para informar el progreso y
+escribir archivos de resultado en RUNTIME_DIR/jobs/<id>/.
+
+Un fallo se reintenta con espera exponencial hasta `max_attempts`; un
+trabajo cuyo proceso murió (sin latido reciente) vuelve a la cola.
+"""
+import os
+import shutil
+import socket
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .writer import run_write
+
+HANDLERS = {}
+
+# Espera antes del reintento n: RETRY_BASE * 2**(n - 1) segundos
+RETRY_BASE = 30
+# Un trabajo en ejecución sin latido en este tiempo se considera abandonado
+STALE_AFTER = timedelta(minutes=10)
+# El progreso se escribe como mucho cada tantos segundos
+PROGRESS_INTERVAL = 1.0
+
+
+class JobError(Exception):
+    """Error definitivo: el trabajo falla sin reintentos"""
+
+
+def register(kind):
+    """Registra la función que ejecuta los trabajos de tipo `kind`"""
+    def decorator(func):
+        HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+def handlers():
+    from . import tasks  # noqa: F401  registra los tipos de trabajo
+
+    return HANDLERS
+
+
+def jobs_dir():
+    runtime_dir = getattr(settings, 'RUNTIME_DIR', settings.BASE_DIR / 'var')
+    return os.path.join(runtime_dir, 'jobs')
+
+
+def result_path(job):
+    """Ruta absoluta del archivo de resultado (None si no tiene)"""
+    if not job.result_file:
+        return None
+    return os.path.join(jobs_dir(), job.result_file)
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def enqueue(kind, params=None, owner=None, priority=0, dedup_key='', max_attempts=3):
+    """Encola un trabajo; si hay uno activo con la misma `dedup_key` lo devuelve.
+
+    Escribe en la base: llamar a través de run_write desde las vistas.
+    """
+    from .models import Job
+
+    if kind not in handlers():
+        raise ValueError(f'tipo de trabajo desconocido: {kind!r}')
+    if dedup_key:
+        existing = Job.objects.filter(dedup_key=dedup_key, status__in=Job.ACTIVE_STATUSES).first()
+        if existing:
+            return existing
+    try:
+        with transaction.atomic():
+            return Job.objects.create(
+                kind=kind, params=params or {}, owner=owner, priority=priority,
+                dedup_key=dedup_key, max_attempts=max_attempts,
+            )
+    except IntegrityError:
+        # Otro proceso encoló la misma clave entre la consulta y el INSERT
+        return Job.objects.get(dedup_key=dedup_key, status__in=Job.ACTIVE_STATUSES)
+
+
+def claim(kinds=None, worker=None):
+    """Toma el siguiente trabajo listo y lo marca en ejecución (None si no hay)"""
+    from .models import Job
+
+    def take():
+        now = timezone.now()
+        ready = Job.objects.filter(status='queued', run_after__lte=now)
+        if kinds:
+            ready = ready.filter(kind__in=kinds)
+        for pk in ready.order_by('-priority', 'id').values_list('pk', flat=True)[:5]:
+            # Compara y marca: si otro proceso lo tomó primero, se prueba el siguiente
+            taken = Job.objects.filter(pk=pk, status='queued').update(
+                status='running', worker=worker or worker_name(), started_at=now,
+                heartbeat_at=now, attempts=F('attempts') + 1,
+            )
+            if taken:
+                return Job.objects.get(pk=pk)
+        return None
+
+    return run_write(take)
+
+
+class JobContext:
+    """Lo que recibe la función de un trabajo: progreso y archivos de resultado"""
+
+    def __init__(self, job):
+        self.job = job
+        self.params = job.params
+        self._last_progress = 0.0
+
+    def progress(self, fraction, message='', force=False):
+        """Informa el avance (0 a 1); también sirve de latido"""
+        from .models import Job
+
+        now = timezone.now().timestamp()
+        if not force and now - self._last_progress < PROGRESS_INTERVAL:
+            return
+        self._last_progress = now
+        fraction = min(max(float(fraction), 0.0), 1.0)
+        run_write(lambda: Job.objects.filter(pk=self.job.pk).update(
+            progress=fraction, progress_message=message[:200], heartbeat_at=timezone.now(),
+        ))
+
+    def output_path(self, filename):
+        """Ruta donde escribir un archivo de resultado; queda como result_file del trabajo"""
+        directory = os.path.join(jobs_dir(), str(self.job.pk))
+        os.makedirs(directory, exist_ok=True)
+        self.job.result_file = os.path.join(str(self.job.pk), os.path.basename(filename))
+        return os.path.join(jobs_dir(), self.job.result_file)
+
+
+def execute(job_id):
+    """Ejecuta un trabajo ya tomado y guarda su resultado o su error.
+
+    Corre dentro de un proceso del pool; devuelve el estado final.
+    """
+    from django.db import close_old_connections
+    from .models import Job
+
+    close_old_connections()
+    job = Job.objects.get(pk=job_id)
+    context = JobContext(job)
+    try:
+        handler = handlers().get(job.kind)
+        if handler is None:
+            raise JobError(f'tipo de trabajo desconocido: {job.kind!r}')
+        result = handler(context, **job.params)
+    except Exception as exc:
+        return run_write(_record_failure, job, exc, traceback.format_exc())
+
+    def finish():
+        # Un trabajo cancelado mientras corría conserva su estado
+        updated = Job.objects.filter(pk=job.pk, status='running').update(
+            status='done', progress=1.0, result=result, result_file=job.result_file,
+            error='', finished_at=timezone.now(), heartbeat_at=timezone.now(),
+        )
+        return 'done' if updated else 'cancelled'
+
+    return run_write(finish)
+
+
+def _record_failure(job, exc, details):
+    from .models import Job
+
+    now = timezone.now()
+    job.refresh_from_db(fields=['attempts', 'max_attempts', 'status'])
+    if job.status == 'cancelled':
+        return 'cancelled'
+    if isinstance(exc, JobError) or job.attempts >= job.max_attempts:
+        Job.objects.filter(pk=job.pk).update(status='failed', error=details, finished_at=now)
+        return 'failed'
+    delay = timedelta(seconds=RETRY_BASE * 2 ** (job.attempts - 1))
+    Job.objects.filter(pk=job.pk).update(
+        status='queued', error=details, run_after=now + delay, worker='', progress=0,
+    )
+    return 'queued'
+
+
+def fail_abandoned(job_id, reason):
+    """Registra la caída del proceso que ejecutaba un trabajo (reintenta si quedan intentos)"""
+    from .models import Job
+
+    job = Job.objects.filter(pk=job_id).first()
+    if job is None or job.status != 'running':
+        return None
+    return run_write(_record_failure, job, RuntimeError(reason), reason)
+
+
+def init_worker():
+    """Inicializador de los procesos del pool (arrancan limpios con spawn)"""
+    import django
+
+    django.setup()
+
+
+def touch(job_ids):
+    """Renueva el latido de trabajos que siguen en ejecución"""
+    from .models import Job
+
+    if job_ids:
+        run_write(lambda: Job.objects.filter(pk__in=list(job_ids), status='running').update(
+            heartbeat_at=timezone.now()
+        ))
+
+
+def requeue_stale(older_than=STALE_AFTER):
+    """Devuelve a la cola los trabajos en ejecución sin latido reciente"""
+    from .models import Job
+
+    cutoff = timezone.now() - older_than
+    stale = list(Job.objects.filter(status='running', heartbeat_at__lt=cutoff).values_list('pk', flat=True))
+    for pk in stale:
+        fail_abandoned(pk, 'El proceso que ejecutaba el trabajo dejó de responder.')
+    return len(stale)
+
+
+def cancel(job):
+    """Cancela un trabajo en cola; uno en ejecución termina pero su resultado se descarta"""
+    from .models import Job
+
+    return run_write(lambda: Job.objects.filter(
+        pk=job.pk, status__in=Job.ACTIVE_STATUSES
+    ).update(status='cancelled', finished_at=timezone.now()))
+
+
+def purge_finished(older_than=timedelta(days=7)):
+    """Borra trabajos terminados hace más de `older_than` junto con sus archivos"""
+    from .models import Job
+
+    cutoff = timezone.now() - older_than
+    old = Job.objects.filter(
+        status__in=('done', 'failed', 'cancelled'), finished_at__lt=cutoff
+    ).values_list('pk', flat=True)
+    removed = 0
+    while True:
+        pks = list(old[:500])
+        if not pks:
+            break
+        for pk in pks:
+            shutil.rmtree(os.path.join(jobs_dir(), str(pk)), ignore_errors=True)
+        run_write(lambda: Job.objects.filter(pk__in=pks).delete())
+        removed += len(pks)
+    return removed
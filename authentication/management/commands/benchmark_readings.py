@@ -0,0 +1,129 @@
+import gc
+import time
+import tracemalloc
+from datetime import timedelta
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from authentication.deletion import purge_user
+from authentication.ingest import METRICS
+from authentication.models import CompostUnit, SensorReading
+from authentication.series import read_columns
+
+
+def _instances(readings):
+    """Camino anterior: una instancia del modelo por lectura y conversión campo a campo"""
+    rows = [
+        (r.timestamp.timestamp(), *(None if getattr(r, m) is None else float(getattr(r, m))
+                                    for m in METRICS))
+        for r in readings.iterator()
+    ]
+    ts = np.array([row[0] for row in rows], dtype=np.float64)
+    return ts, np.array([row[1:] for row in rows], dtype=np.float64)
+
+
+def _tuples(readings):
+    """values_list: sin instancias pero con datetime y Decimal por lectura"""
+    rows = list(readings.values_list('timestamp', *METRICS))
+    ts = np.fromiter((row[0].timestamp() for row in rows), dtype=np.float64, count=len(rows))
+    return ts, np.array([row[1:] for row in rows], dtype=np.float64)
+
+
+# Resultado con --rows 1000000 --repeat 3 (SQLite 3.40, Python 3.11), dos corridas:
+#   modelos   16.1 s       342 MiB máx.
+#   tuplas     7.6-9.2 s   497 MiB máx.
+#   columnas   1.7-1.9 s    27 MiB máx.
+# Columnas usa 12.5x menos memoria que modelos, pero es 8.6-9.6x más rápido: no
+# llega a 10x en tiempo. El piso es el módulo sqlite3, que arma una tupla por
+# fila: solo recorrer el cursor ya cuesta ~1.2 s por millón de lecturas.
+
+
+class Command(BaseCommand):
+    help = ('Compara tiempo y memoria máxima al cargar las lecturas de una unidad '
+            'como modelos, como tuplas y como columnas (read_columns)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000,
+                            help='Lecturas sintéticas a generar (por defecto 1000000)')
+        parser.add_argument('--unit', help='Medir una unidad existente en lugar de datos sintéticos')
+        parser.add_argument('--skip-instances', action='store_true',
+                            help='No medir el camino con instancias del modelo (el más lento)')
+        parser.add_argument('--repeat', type=int, default=3,
+                            help='Repeticiones por camino; se informa la más rápida (por defecto 3)')
+
+    def handle(self, *args, **options):
+        if options['unit']:
+            self._run(SensorReading.objects.filter(compost_unit_id=options['unit']), options)
+            return
+        # Los datos sintéticos se confirman (leer un millón de filas sin confirmar
+        # desde la transacción no es lo que pasa en producción) y se purgan al final
+        unit = self._synthetic_unit(options['rows'])
+        try:
+            self._run(SensorReading.objects.filter(compost_unit=unit), options)
+        finally:
+            User.objects.filter(pk=unit.owner_id).update(is_active=False)
+            purge_user(unit.owner_id)
+
+    def _synthetic_unit(self, count):
+        owner = User.objects.create(username=f'benchmark-{time.time_ns()}')
+        unit = CompostUnit.objects.create(owner=owner, name='Benchmark', location='-', capacity=100)
+        rng = np.random.default_rng(0)
+        start = timezone.now() - timedelta(seconds=60 * count)
+        batch = 10000
+        for offset in range(0, count, batch):
+            size = min(batch, count - offset)
+            temperature = np.round(rng.uniform(15, 65, size), 2).tolist()
+            ph = np.round(rng.uniform(5, 9, size), 2).tolist()
+            humidity = rng.integers(30, 90, size).tolist()
+            oxygen = rng.integers(5, 30, size).tolist()
+            SensorReading.objects.bulk_create(
+                SensorReading(
+                    compost_unit=unit, timestamp=start + timedelta(seconds=60 * (offset + i)),
+                    temperature=temperature[i], ph=ph[i], humidity=humidity[i],
+                    # Un 10 % sin oxígeno para medir también los nulos
+                    oxygen=None if i % 10 == 0 else oxygen[i],
+                )
+                for i in range(size)
+            )
+        self.stdout.write(f'{count} lecturas sintéticas generadas.')
+        return unit
+
+    def _measure(self, label, load, readings, repeat):
+        # El tiempo se mide sin tracemalloc, que vuelve lenta cada asignación;
+        # la mejor de varias corridas descarta la caché fría del primer recorrido
+        elapsed = float('inf')
+        for _ in range(max(repeat, 1)):
+            gc.collect()
+            began = time.perf_counter()
+            ts, values = load(readings)
+            elapsed = min(elapsed, time.perf_counter() - began)
+            del ts, values
+        gc.collect()
+        tracemalloc.start()
+        ts, values = load(readings)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.stdout.write(
+            f'{label:<12} {len(ts):>9} filas  {elapsed:8.2f} s  {peak / 2 ** 20:9.1f} MiB máx.'
+        )
+        return elapsed, peak
+
+    def _run(self, readings, options):
+        readings = readings.order_by('timestamp')
+        repeat = options['repeat']
+        results = {}
+        if not options['skip_instances']:
+            results['modelos'] = self._measure('modelos', _instances, readings, repeat)
+        results['tuplas'] = self._measure('tuplas', _tuples, readings, repeat)
+        results['columnas'] = self._measure('columnas', read_columns, readings, repeat)
+
+        elapsed, peak = results['columnas']
+        for label, (other_elapsed, other_peak) in results.items():
+            if label != 'columnas':
+                self.stdout.write(self.style.SUCCESS(
+                    f'columnas frente a {label}: {other_elapsed / max(elapsed, 1e-9):.1f}x más '
+                    f'rápido, {other_peak / max(peak, 1):.1f}x menos memoria'
+                ))
@@ -0,0 +1,33 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from authentication.jobs import enqueue, handlers
+from authentication.writer import run_write
+
+
+class Command(BaseCommand):
+    help = 'Encola un trabajo en segundo plano (lo ejecuta run_jobs)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', help='Tipo de trabajo')
+        parser.add_argument('--params', default='{}', help='Parámetros en JSON')
+        parser.add_argument('--priority', type=int, default=0)
+        parser.add_argument('--dedup-key', default='',
+                            help='No encolar si ya hay un trabajo activo con esta clave')
+        parser.add_argument('--max-attempts', type=int, default=3)
+
+    def handle(self, *args, **options):
+        if options['kind'] not in handlers():
+            raise CommandError(
+                f'Tipo desconocido. Disponibles: {", ".join(sorted(handlers()))}'
+            )
+        try:
+            params = json.loads(options['params'])
+        except ValueError as exc:
+            raise CommandError(f'--params no es JSON válido: {exc}')
+        job = run_write(
+            enqueue, options['kind'], params, priority=options['priority'],
+            dedup_key=options['dedup_key'], max_attempts=options['max_attempts'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'Trabajo {job.pk} ({job.kind}): {job.status}'))
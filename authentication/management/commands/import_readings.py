@@ -0,0 +1,148 @@
+import csv
+import io
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from authentication.ingest import parse_chunk, reading_limits, store_readings
+from authentication.models import CompostUnit
+from authentication.writer import process_write_lock
+
+
+def read_chunks(path, fmt, chunk_size):
+    """Lee el archivo en bloques de líneas crudas sin cargarlo completo"""
+    with open(path, newline='', encoding='utf-8-sig') as handle:
+        fieldnames = None
+        line_number = 1
+        if fmt == 'csv':
+            header = handle.readline()
+            fieldnames = [name.strip().lower() for name in next(csv.reader(io.StringIO(header)))]
+            line_number = 2
+        while True:
+            lines = list(islice(handle, chunk_size))
+            if not lines:
+                break
+            yield fieldnames, lines, line_number
+            line_number += len(lines)
+
+
+class Command(BaseCommand):
+    help = ('Importa lecturas históricas desde archivos CSV o NDJSON. Cada fila '
+            'indica la unidad (id o nombre), timestamp y las métricas '
+            'temperature, ph, humidity y oxygen.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='+', help='Archivos .csv, .ndjson o .jsonl')
+        parser.add_argument('--format', choices=['csv', 'ndjson'],
+                            help='Formato (por defecto se deduce de la extensión)')
+        parser.add_argument('--owner',
+                            help='Usuario propietario; limita la búsqueda de unidades por nombre')
+        parser.add_argument('--chunk-size', type=int, default=20000,
+                            help='Filas por transacción (por defecto 20000)')
+        parser.add_argument('--workers', type=int, default=0,
+                            help='Procesos para analizar las filas en paralelo (0 = sin pool)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Validar sin escribir en la base de datos')
+        parser.add_argument('--max-errors', type=int, default=20,
+                            help='Errores de fila a mostrar por archivo')
+
+    def handle(self, *args, **options):
+        units = CompostUnit.objects.all()
+        if options['owner']:
+            units = units.filter(owner__username=options['owner'])
+        self.unit_lookup = {}
+        ambiguous = set()
+        for unit_id, name in units.values_list('id', 'name'):
+            self.unit_lookup[str(unit_id)] = unit_id
+            self.unit_lookup[unit_id.hex] = unit_id
+            if name in self.unit_lookup:
+                ambiguous.add(name)
+            self.unit_lookup[name] = unit_id
+        for name in ambiguous:
+            # Un nombre repetido entre propietarios no identifica una unidad
+            del self.unit_lookup[name]
+
+        limits = reading_limits()
+        pool = ProcessPoolExecutor(options['workers']) if options['workers'] > 0 else None
+        try:
+            for path in options['files']:
+                fmt = options['format'] or self._guess_format(path)
+                self._import_file(path, fmt, limits, pool, options)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+    def _guess_format(self, path):
+        lowered = path.lower()
+        if lowered.endswith('.csv'):
+            return 'csv'
+        if lowered.endswith(('.ndjson', '.jsonl', '.json')):
+            return 'ndjson'
+        raise CommandError(f'No se puede deducir el formato de {path}; use --format.')
+
+    def _import_file(self, path, fmt, limits, pool, options):
+        chunks = read_chunks(path, fmt, options['chunk_size'])
+        args = ((fmt, fieldnames, lines, limits, first) for fieldnames, lines, first in chunks)
+        if pool is not None:
+            # El pool analiza los bloques siguientes mientras este proceso escribe
+            futures = (pool.submit(parse_chunk, *a) for a in args)
+            parsed = self._prefetch(futures, depth=options['workers'] * 2)
+        else:
+            parsed = (parse_chunk(*a) for a in args)
+
+        started = time.monotonic()
+        totals = {'rows': 0, 'inserted': 0, 'duplicates': 0, 'errors': 0}
+        shown_errors = 0
+        for rows, errors in parsed:
+            resolved = []
+            for row in rows:
+                unit_id = self.unit_lookup.get(row[0])
+                if unit_id is None:
+                    errors.append((None, f'unidad desconocida: {row[0]!r}'))
+                    continue
+                resolved.append((unit_id,) + row[1:])
+
+            totals['rows'] += len(rows) + len([e for e in errors if e[0] is not None])
+            totals['errors'] += len(errors)
+            for line_number, message in errors:
+                if shown_errors < options['max_errors']:
+                    where = f'línea {line_number}' if line_number else 'fila'
+                    self.stderr.write(f'{path}: {where}: {message}')
+                shown_errors += 1
+
+            if resolved and not options['dry_run']:
+                with process_write_lock(), transaction.atomic():
+                    inserted, duplicates, skipped = store_readings(resolved)
+                totals['inserted'] += inserted
+                totals['duplicates'] += duplicates
+                if skipped:
+                    totals['errors'] += skipped
+                    self.stderr.write(f'{path}: {skipped} filas de unidades borradas omitidas')
+
+            elapsed = time.monotonic() - started
+            rate = totals['rows'] / elapsed if elapsed else 0
+            self.stdout.write(
+                f"{path}: {totals['rows']} filas, {totals['inserted']} insertadas, "
+                f"{totals['duplicates']} duplicadas, {totals['errors']} con error "
+                f"({rate:,.0f} filas/s)"
+            )
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"{path}: terminado en {elapsed:.1f}s — {totals['inserted']} lecturas insertadas"
+            + (' (simulación, sin escribir)' if options['dry_run'] else '')
+        ))
+
+    @staticmethod
+    def _prefetch(futures, depth):
+        """Mantiene hasta `depth` bloques en análisis y los entrega en orden"""
+        pending = []
+        for future in futures:
+            pending.append(future)
+            if len(pending) >= depth:
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from authentication.deletion import PURGE_BATCH, purge_unit, units_to_purge
+
+
+class Command(BaseCommand):
+    help = ('Borra por lotes el historial de las unidades marcadas como borradas '
+            '(lo mismo que los trabajos purge_unit, sin pasar por la cola).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=PURGE_BATCH,
+                            help=f'Filas por transacción (por defecto {PURGE_BATCH})')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        unit_ids = units_to_purge()
+        rows = 0
+        for unit_id in unit_ids:
+            rows += purge_unit(unit_id, options['batch_size']) or 0
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(unit_ids)} unidades purgadas ({rows} filas) '
+            f'en {time.monotonic() - started:.1f}s'
+        ))
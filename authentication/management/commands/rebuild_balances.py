@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from authentication.balance import rebuild_balances
+from authentication.models import CompostUnit
+from authentication.writer import process_write_lock
+
+
+class Command(BaseCommand):
+    help = ('Recalcula el balance C/N acumulado de las unidades a partir de sus '
+            'entradas de material (p. ej. después de cargas con bulk_create).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('units', nargs='*', help='Ids de unidad (por defecto todas)')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Unidades por transacción (por defecto 500)')
+
+    def handle(self, *args, **options):
+        unit_ids = options['units'] or list(
+            CompostUnit.objects.order_by('pk').values_list('pk', flat=True)
+        )
+        started = time.monotonic()
+        rebuilt = 0
+        batch_size = options['batch_size']
+        for start in range(0, len(unit_ids), batch_size):
+            with process_write_lock():
+                rebuilt += rebuild_balances(unit_ids[start:start + batch_size])
+        self.stdout.write(self.style.SUCCESS(
+            f'{rebuilt} balances recalculados en {time.monotonic() - started:.1f}s'
+        ))
@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from authentication.geo import rebuild_map_cells
+from authentication.writer import process_write_lock
+
+
+class Command(BaseCommand):
+    help = ('Recalcula las celdas agregadas del mapa público a partir del geohash '
+            'de las unidades públicas.')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        with process_write_lock():
+            cells = rebuild_map_cells()
+        self.stdout.write(self.style.SUCCESS(
+            f'{cells} celdas recalculadas en {time.monotonic() - started:.1f}s'
+        ))
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from authentication.search import KINDS, available, rebuild_indexes
+
+
+class Command(BaseCommand):
+    help = ('Vuelve a llenar los índices de texto completo desde las tablas '
+            '(p. ej. después de un VACUUM o de restaurar una copia).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('kinds', nargs='*',
+                            help=f'Índices a reconstruir (por defecto todos: {", ".join(KINDS)})')
+
+    def handle(self, *args, **options):
+        if not available():
+            raise CommandError('La búsqueda de texto completo requiere SQLite (FTS5).')
+        kinds = options['kinds'] or KINDS
+        unknown = set(kinds) - set(KINDS)
+        if unknown:
+            raise CommandError(f'Índices desconocidos: {", ".join(sorted(unknown))}')
+        started = time.monotonic()
+        rebuild_indexes(kinds)
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(kinds)} índices reconstruidos en {time.monotonic() - started:.1f}s'
+        ))
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from authentication.models import CompostUnit
+from authentication.sparklines import rebuild_sparklines
+from authentication.writer import process_write_lock
+
+
+class Command(BaseCommand):
+    help = ('Recalcula los minigráficos de 24 horas y 7 días desde las lecturas '
+            '(p. ej. después de borrar lecturas o de migrar datos).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('units', nargs='*', help='Ids de unidad (por defecto todas)')
+        parser.add_argument('--batch-size', type=int, default=200,
+                            help='Unidades por transacción (por defecto 200)')
+
+    def handle(self, *args, **options):
+        unit_ids = options['units'] or list(
+            CompostUnit.objects.order_by('pk').values_list('pk', flat=True)
+        )
+        started = time.monotonic()
+        rows = 0
+        batch_size = options['batch_size']
+        for start in range(0, len(unit_ids), batch_size):
+            with process_write_lock():
+                rows += rebuild_sparklines(unit_ids[start:start + batch_size])
+        self.stdout.write(self.style.SUCCESS(
+            f'{rows} minigráficos recalculados para {len(unit_ids)} unidades '
+            f'en {time.monotonic() - started:.1f}s'
+        ))
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from authentication.models import CompostUnit
+from authentication.writer import process_write_lock
+from authentication.yields import rebuild_yield_summaries
+
+
+class Command(BaseCommand):
+    help = ('Recalcula los resúmenes mensuales de rendimiento desde las cosechas '
+            'y entradas de material (p. ej. después de cargas masivas).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('units', nargs='*', help='Ids de unidad (por defecto todas)')
+        parser.add_argument('--batch-size', type=int, default=200,
+                            help='Unidades por transacción (por defecto 200)')
+
+    def handle(self, *args, **options):
+        unit_ids = options['units'] or list(
+            CompostUnit.objects.order_by('pk').values_list('pk', flat=True)
+        )
+        started = time.monotonic()
+        rows = 0
+        batch_size = options['batch_size']
+        for start in range(0, len(unit_ids), batch_size):
+            with process_write_lock():
+                rows += rebuild_yield_summaries(unit_ids[start:start + batch_size])
+        self.stdout.write(self.style.SUCCESS(
+            f'{rows} resúmenes mensuales recalculados para {len(unit_ids)} unidades '
+            f'en {time.monotonic() - started:.1f}s'
+        ))
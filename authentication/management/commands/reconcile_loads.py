@@ -0,0 +1,52 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+
+from authentication.inventory import reconcile_loads
+from authentication.models import CompostUnit
+from authentication.writer import process_write_lock
+
+
+class Command(BaseCommand):
+    help = ('Recalcula la carga de las unidades desde el libro de entradas y '
+            'cosechas e informa las diferencias con la carga guardada.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('units', nargs='*', help='Ids de unidad (por defecto todas)')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Unidades por transacción (por defecto 500)')
+        parser.add_argument('--fix', action='store_true',
+                            help='Corregir la carga guardada de las unidades desviadas')
+
+    def handle(self, *args, **options):
+        try:
+            unit_ids = [uuid.UUID(value) for value in options['units']]
+        except ValueError as exc:
+            raise CommandError(f'Id de unidad inválido: {exc}')
+        unit_ids = unit_ids or list(
+            CompostUnit.objects.order_by('pk').values_list('pk', flat=True)
+        )
+        started = time.monotonic()
+        batch_size = options['batch_size']
+        drifted = 0
+        for start in range(0, len(unit_ids), batch_size):
+            batch = unit_ids[start:start + batch_size]
+            if options['fix']:
+                with process_write_lock():
+                    drift = reconcile_loads(batch, fix=True)
+            else:
+                drift = reconcile_loads(batch)
+            for unit_id, stored, actual in drift:
+                self.stdout.write(
+                    f'{unit_id}: guardada {stored} kg, según el libro {actual} kg '
+                    f'(diferencia {stored - actual:+} kg)'
+                )
+            drifted += len(drift)
+
+        summary = (f'{len(unit_ids)} unidades revisadas en {time.monotonic() - started:.1f}s, '
+                   f'{drifted} con diferencias')
+        if drifted and options['fix']:
+            summary += ' (corregidas)'
+        style = self.style.WARNING if drifted and not options['fix'] else self.style.SUCCESS
+        self.stdout.write(style(summary))
@@ -0,0 +1,103 @@
+import multiprocessing
+import signal
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from authentication.jobs import (
+    claim, execute, fail_abandoned, handlers, init_worker, purge_finished, requeue_stale, touch,
+)
+
+# Cada cuánto (segundos) renovar latidos, rescatar abandonados y purgar viejos
+HEARTBEAT_EVERY = 30
+PURGE_EVERY = 3600
+
+
+class Command(BaseCommand):
+    help = ('Ejecuta los trabajos en segundo plano encolados en la base con un pool '
+            'de procesos (mayor prioridad primero).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2,
+                            help='Procesos del pool (por defecto 2)')
+        parser.add_argument('--poll', type=float, default=2.0,
+                            help='Segundos entre consultas a la cola cuando está vacía')
+        parser.add_argument('--kind', action='append', dest='kinds',
+                            help='Ejecutar solo estos tipos (se puede repetir)')
+        parser.add_argument('--once', action='store_true',
+                            help='Salir cuando la cola quede vacía')
+        parser.add_argument('--keep-days', type=int, default=7,
+                            help='Días que se conservan los trabajos terminados y sus archivos')
+
+    def handle(self, *args, **options):
+        kinds = options['kinds']
+        unknown = set(kinds or ()) - set(handlers())
+        if unknown:
+            raise CommandError(f'Tipos desconocidos: {", ".join(sorted(unknown))}')
+        workers = max(options['workers'], 1)
+
+        stopping = []
+        signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+
+        pool = self._pool(workers)
+        running = {}
+        last_heartbeat = last_purge = 0.0
+        self.stdout.write(f'Procesando trabajos con {workers} procesos')
+        try:
+            while True:
+                for future in [f for f in running if f.done()]:
+                    job_id = running.pop(future)
+                    try:
+                        status = future.result()
+                    except BrokenProcessPool:
+                        status = fail_abandoned(job_id, 'El proceso del trabajo terminó de forma inesperada.')
+                        pool = self._restart(pool, workers, running)
+                    except Exception as exc:
+                        status = fail_abandoned(job_id, repr(exc))
+                    self.stdout.write(f'Trabajo {job_id}: {status}')
+
+                while not stopping and len(running) < workers:
+                    job = claim(kinds)
+                    if job is None:
+                        break
+                    self.stdout.write(f'Trabajo {job.pk} ({job.kind}) iniciado, intento {job.attempts}')
+                    running[pool.submit(execute, job.pk)] = job.pk
+
+                now = time.monotonic()
+                if now - last_heartbeat >= HEARTBEAT_EVERY:
+                    touch(running.values())
+                    requeue_stale()
+                    last_heartbeat = now
+                if now - last_purge >= PURGE_EVERY:
+                    purge_finished(timedelta(days=options['keep_days']))
+                    last_purge = now
+
+                if not running and (stopping or options['once']):
+                    break
+                if running:
+                    wait(running, timeout=options['poll'], return_when=FIRST_COMPLETED)
+                else:
+                    time.sleep(options['poll'])
+        except KeyboardInterrupt:
+            self.stdout.write('Interrumpido: los trabajos en curso volverán a la cola al vencer su latido')
+        finally:
+            pool.shutdown(wait=not running, cancel_futures=True)
+
+    def _pool(self, workers):
+        # spawn: procesos limpios, sin conexiones SQLite heredadas del padre
+        return ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=init_worker,
+        )
+
+    def _restart(self, pool, workers, running):
+        """Un pool roto falla todos sus trabajos pendientes: se registran y se crea otro"""
+        pool.shutdown(wait=False, cancel_futures=True)
+        for future, job_id in list(running.items()):
+            running.pop(future)
+            fail_abandoned(job_id, 'El proceso del trabajo terminó de forma inesperada.')
+        return self._pool(workers)
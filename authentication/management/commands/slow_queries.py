@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from authentication.models import SlowQuery
+
+
+class Command(BaseCommand):
+    help = 'Muestra las consultas lentas registradas ordenadas por tiempo total'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=20,
+                            help='Número de consultas a mostrar (por defecto 20)')
+        parser.add_argument('--full-scans', action='store_true',
+                            help='Mostrar solo consultas con recorrido completo de tabla')
+        parser.add_argument('--plans', action='store_true',
+                            help='Incluir el EXPLAIN QUERY PLAN de cada consulta')
+        parser.add_argument('--reset', action='store_true',
+                            help='Borrar el registro después de mostrarlo')
+
+    def handle(self, *args, **options):
+        queries = SlowQuery.objects.order_by('-total_time_ms')
+        if options['full_scans']:
+            queries = queries.filter(full_scan=True)
+
+        rows = list(queries[:options['limit']])
+        if not rows:
+            self.stdout.write('No hay consultas lentas registradas.')
+        for rank, query in enumerate(rows, start=1):
+            flag = ' [SCAN]' if query.full_scan else ''
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"#{rank} total={query.total_time_ms:.1f}ms llamadas={query.calls} "
+                f"media={query.avg_time_ms:.1f}ms max={query.max_time_ms:.1f}ms{flag}"
+            ))
+            self.stdout.write(f"  vista: {query.view or '-'}")
+            self.stdout.write(f"  sql:   {query.normalized_sql}")
+            if options['plans'] and query.plan:
+                for line in query.plan.splitlines():
+                    self.stdout.write(f"         {line}")
+
+        if options['reset']:
+            deleted, _ = SlowQuery.objects.all().delete()
+            self.stdout.write(self.style.SUCCESS(f'Registro borrado ({deleted} consultas).'))
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from authentication.routers import replica_path, take_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Refresca la réplica de solo lectura con una copia en caliente de la base principal'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=int, default=0,
+                            help='Repetir la copia cada N segundos (0 = una sola vez)')
+
+    def handle(self, *args, **options):
+        if not replica_path():
+            raise CommandError("No hay una base de datos 'replica' configurada.")
+
+        interval = options['interval']
+        while True:
+            started = time.monotonic()
+            take_snapshot()
+            elapsed = time.monotonic() - started
+            self.stdout.write(self.style.SUCCESS(
+                f'Réplica actualizada en {elapsed:.2f}s ({replica_path()})'
+            ))
+            if not interval:
+                break
+            time.sleep(max(interval - elapsed, 0))
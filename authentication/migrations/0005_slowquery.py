@@ -0,0 +1,37 @@
+# Generated by Django 5.2.1 on 2026-10-19 07:08
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0004_alter_monitoringlog_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint', models.CharField(max_length=40, unique=True, verbose_name='Huella')),
+                ('normalized_sql', models.TextField(verbose_name='SQL normalizado')),
+                ('sample_sql', models.TextField(verbose_name='SQL de ejemplo')),
+                ('sample_params', models.TextField(blank=True, verbose_name='Parámetros de ejemplo')),
+                ('view', models.CharField(blank=True, max_length=200, verbose_name='Vista')),
+                ('plan', models.TextField(blank=True, verbose_name='Plan de consulta')),
+                ('full_scan', models.BooleanField(default=False, verbose_name='Recorrido completo')),
+                ('calls', models.PositiveIntegerField(default=0, verbose_name='Llamadas')),
+                ('total_time_ms', models.FloatField(default=0, verbose_name='Tiempo total (ms)')),
+                ('max_time_ms', models.FloatField(default=0, verbose_name='Tiempo máximo (ms)')),
+                ('first_seen', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Primera vez')),
+                ('last_seen', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Última vez')),
+            ],
+            options={
+                'verbose_name': 'Consulta Lenta',
+                'verbose_name_plural': 'Consultas Lentas',
+                'ordering': ['-total_time_ms'],
+            },
+        ),
+    ]
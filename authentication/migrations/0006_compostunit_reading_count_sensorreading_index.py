@@ -0,0 +1,39 @@
+# Generated by Django 5.2.1 on 2026-10-19 07:11
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_reading_count(apps, schema_editor):
+    CompostUnit = apps.get_model('authentication', 'CompostUnit')
+    SensorReading = apps.get_model('authentication', 'SensorReading')
+    counts = (
+        SensorReading.objects.using(schema_editor.connection.alias)
+        .filter(compost_unit__isnull=False)
+        .values('compost_unit')
+        .annotate(total=Count('id'))
+    )
+    for row in counts:
+        CompostUnit.objects.using(schema_editor.connection.alias).filter(
+            pk=row['compost_unit']
+        ).update(reading_count=row['total'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0005_slowquery'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='compostunit',
+            name='reading_count',
+            field=models.PositiveBigIntegerField(default=0, editable=False, verbose_name='Lecturas (aprox.)'),
+        ),
+        migrations.RunPython(fill_reading_count, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='sensorreading',
+            index=models.Index(fields=['compost_unit', 'timestamp', 'id'], name='sensorreading_unit_ts_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.1 on 2026-10-19 07:14
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0007_alter_sensorreading_timestamp'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeviceKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='Nombre')),
+                ('prefix', models.CharField(editable=False, max_length=16, unique=True, verbose_name='Prefijo')),
+                ('key_hash', models.CharField(editable=False, max_length=64, verbose_name='Hash de la clave')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')),
+                ('revoked_at', models.DateTimeField(blank=True, null=True, verbose_name='Revocada el')),
+                ('compost_unit', models.ForeignKey(blank=True, help_text='Vacío = clave de gateway para todas las unidades del propietario', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='device_keys', to='authentication.compostunit', verbose_name='Unidad de compostaje')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='device_keys', to=settings.AUTH_USER_MODEL, verbose_name='Propietario')),
+            ],
+            options={
+                'verbose_name': 'Clave de Dispositivo',
+                'verbose_name_plural': 'Claves de Dispositivo',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.1 on 2026-10-19 07:18
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+
+
+def fill_balances(apps, schema_editor):
+    alias = schema_editor.connection.alias
+    CompostUnit = apps.get_model('authentication', 'CompostUnit')
+    CompostEntry = apps.get_model('authentication', 'CompostEntry')
+    CompostBalance = apps.get_model('authentication', 'CompostBalance')
+    mass_fields = {'green': 'green_kg', 'brown': 'brown_kg'}
+    balances = {
+        pk: CompostBalance(compost_unit_id=pk)
+        for pk in CompostUnit.objects.using(alias).values_list('pk', flat=True)
+    }
+    grouped = (
+        CompostEntry.objects.using(alias).order_by()
+        .values('compost_unit', 'material__material_type')
+        .annotate(
+            mass=Sum('quantity'),
+            weighted=Sum(ExpressionWrapper(
+                F('quantity') * F('material__carbon_nitrogen_ratio'),
+                output_field=DecimalField(max_digits=16, decimal_places=4),
+            )),
+            entries=Count('id'),
+        )
+    )
+    for row in grouped:
+        balance = balances[row['compost_unit']]
+        field = mass_fields.get(row['material__material_type'], 'other_kg')
+        setattr(balance, field, getattr(balance, field) + row['mass'])
+        balance.cn_mass += row['weighted'] or 0
+        balance.entry_count += row['entries']
+    CompostBalance.objects.using(alias).bulk_create(balances.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0008_devicekey'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompostBalance',
+            fields=[
+                ('compost_unit', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='balance', serialize=False, to='authentication.compostunit', verbose_name='Unidad de compostaje')),
+                ('green_kg', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Material verde (kg)')),
+                ('brown_kg', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Material marrón (kg)')),
+                ('other_kg', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Otros materiales (kg)')),
+                ('cn_mass', models.DecimalField(decimal_places=4, default=0, max_digits=16, verbose_name='Masa ponderada por C/N')),
+                ('entry_count', models.PositiveIntegerField(default=0, verbose_name='Entradas')),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Última actualización')),
+            ],
+            options={
+                'verbose_name': 'Balance C/N',
+                'verbose_name_plural': 'Balances C/N',
+            },
+        ),
+        migrations.RunPython(fill_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.1 on 2026-10-19 07:20
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def fill_current_load(apps, schema_editor):
+    alias = schema_editor.connection.alias
+    CompostUnit = apps.get_model('authentication', 'CompostUnit')
+    loads = {}
+    for model_name, sign in (('CompostEntry', 1), ('CompostHarvest', -1)):
+        model = apps.get_model('authentication', model_name)
+        totals = (
+            model.objects.using(alias).order_by()
+            .values('compost_unit').annotate(total=Sum('quantity'))
+        )
+        for row in totals:
+            loads[row['compost_unit']] = loads.get(row['compost_unit'], 0) + sign * row['total']
+    CompostUnit.objects.using(alias).update(current_load=0)
+    for unit_id, load in loads.items():
+        CompostUnit.objects.using(alias).filter(pk=unit_id).update(current_load=load)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0009_compostbalance'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='compostunit',
+            name='current_load',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12, verbose_name='Carga actual (kg)'),
+        ),
+        migrations.RunPython(fill_current_load, migrations.RunPython.noop),
+    ]
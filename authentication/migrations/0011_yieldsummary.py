@@ -0,0 +1,80 @@
+# Generated by Django 5.2.1 on 2026-10-19 07:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncMonth
+
+
+def fill_yield_summaries(apps, schema_editor):
+    alias = schema_editor.connection.alias
+    CompostHarvest = apps.get_model('authentication', 'CompostHarvest')
+    CompostEntry = apps.get_model('authentication', 'CompostEntry')
+    YieldSummary = apps.get_model('authentication', 'YieldSummary')
+    rows = {}
+
+    def row(unit_id, period):
+        month = period.date().replace(day=1)
+        if (unit_id, month) not in rows:
+            rows[unit_id, month] = YieldSummary(compost_unit_id=unit_id, month=month)
+        return rows[unit_id, month]
+
+    harvests = (
+        CompostHarvest.objects.using(alias).order_by()
+        .annotate(period=TruncMonth('harvest_date'))
+        .values('compost_unit', 'period')
+        .annotate(
+            kg=Sum('quantity'), count=Count('id'), age=Sum('compost_age_days'),
+            **{'grade_' + g: Count('id', filter=Q(quality_grade=g.upper())) for g in 'abcd'}
+        )
+    )
+    for values in harvests:
+        summary = row(values['compost_unit'], values['period'])
+        summary.harvested_kg = values['kg']
+        summary.harvest_count = values['count']
+        summary.age_days_total = values['age'] or 0
+        for g in 'abcd':
+            setattr(summary, 'grade_' + g, values['grade_' + g])
+
+    entries = (
+        CompostEntry.objects.using(alias).order_by()
+        .annotate(period=TruncMonth('date_added'))
+        .values('compost_unit', 'period')
+        .annotate(kg=Sum('quantity'))
+    )
+    for values in entries:
+        row(values['compost_unit'], values['period']).input_kg = values['kg']
+    YieldSummary.objects.using(alias).bulk_create(rows.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0010_compostunit_current_load_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='YieldSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(verbose_name='Mes')),
+                ('harvested_kg', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Cosechado (kg)')),
+                ('harvest_count', models.PositiveIntegerField(default=0, verbose_name='Cosechas')),
+                ('grade_a', models.PositiveIntegerField(default=0, verbose_name='Calidad A')),
+                ('grade_b', models.PositiveIntegerField(default=0, verbose_name='Calidad B')),
+                ('grade_c', models.PositiveIntegerField(default=0, verbose_name='Calidad C')),
+                ('grade_d', models.PositiveIntegerField(default=0, verbose_name='Calidad D')),
+                ('age_days_total', models.PositiveBigIntegerField(default=0, verbose_name='Días acumulados')),
+                ('input_kg', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Material ingresado (kg)')),
+                ('compost_unit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='yield_summaries', to='authentication.compostunit', verbose_name='Unidad de compostaje')),
+            ],
+            options={
+                'verbose_name': 'Resumen de Rendimiento',
+                'verbose_name_plural': 'Resúmenes de Rendimiento',
+                'ordering': ['compost_unit', 'month'],
+                'constraints': [models.UniqueConstraint(fields=('compost_unit', 'month'), name='yieldsummary_unit_month_uniq')],
+            },
+        ),
+        migrations.RunPython(fill_yield_summaries, migrations.RunPython.noop),
+    ]
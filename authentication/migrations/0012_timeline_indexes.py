@@ -0,0 +1,27 @@
+# Generated by Django 5.2.1 on 2026-10-19 07:23
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0011_yieldsummary'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='compostentry',
+            index=models.Index(fields=['compost_unit', 'date_added', 'id'], name='compostentry_unit_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='compostharvest',
+            index=models.Index(fields=['compost_unit', 'harvest_date', 'id'], name='compostharvest_unit_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='monitoringlog',
+            index=models.Index(fields=['compost_unit', 'date_recorded', 'id'], name='monitoringlog_unit_date_idx'),
+        ),
+    ]
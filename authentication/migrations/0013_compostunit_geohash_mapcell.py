@@ -0,0 +1,97 @@
+# Generated by Django 5.2.1 on 2026-10-19 07:27
+
+from django.conf import settings
+from collections import defaultdict
+
+from django.db import migrations, models
+
+# Copia fija de authentication.geo: la migración no debe cambiar si cambia la app
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+UNIT_PRECISION = 9
+CLUSTER_PRECISIONS = range(1, 7)
+
+
+def encode(latitude, longitude, precision=UNIT_PRECISION):
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    latitude, longitude = float(latitude), float(longitude)
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        target, bounds = (longitude, lon_range) if even else (latitude, lat_range)
+        middle = (bounds[0] + bounds[1]) / 2
+        value <<= 1
+        if target >= middle:
+            value |= 1
+            bounds[0] = middle
+        else:
+            bounds[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits, value = 0, 0
+    return ''.join(chars)
+
+
+def prefixes(geohash):
+    return [geohash[:p] for p in CLUSTER_PRECISIONS if len(geohash) >= p]
+
+
+def fill_geohash(apps, schema_editor):
+    alias = schema_editor.connection.alias
+    CompostUnit = apps.get_model('authentication', 'CompostUnit')
+    MapCell = apps.get_model('authentication', 'MapCell')
+    totals = defaultdict(lambda: [0, 0.0, 0.0])
+    units = CompostUnit.objects.using(alias).filter(
+        latitude__isnull=False, longitude__isnull=False
+    ).values_list('pk', 'latitude', 'longitude', 'is_public')
+    for pk, latitude, longitude, is_public in units:
+        geohash = encode(latitude, longitude)
+        CompostUnit.objects.using(alias).filter(pk=pk).update(geohash=geohash)
+        if is_public:
+            for cell in prefixes(geohash):
+                total = totals[cell]
+                total[0] += 1
+                total[1] += float(latitude)
+                total[2] += float(longitude)
+    MapCell.objects.using(alias).bulk_create(
+        [MapCell(cell=cell, precision=len(cell), unit_count=count,
+                 latitude_sum=lat_sum, longitude_sum=lon_sum)
+         for cell, (count, lat_sum, lon_sum) in totals.items()],
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0012_timeline_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MapCell',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cell', models.CharField(max_length=12, unique=True, verbose_name='Celda')),
+                ('precision', models.PositiveSmallIntegerField(verbose_name='Precisión')),
+                ('unit_count', models.IntegerField(default=0, verbose_name='Unidades')),
+                ('latitude_sum', models.FloatField(default=0, verbose_name='Suma de latitudes')),
+                ('longitude_sum', models.FloatField(default=0, verbose_name='Suma de longitudes')),
+            ],
+            options={
+                'verbose_name': 'Celda del Mapa',
+                'verbose_name_plural': 'Celdas del Mapa',
+            },
+        ),
+        migrations.AddField(
+            model_name='compostunit',
+            name='geohash',
+            field=models.CharField(blank=True, editable=False, max_length=12, verbose_name='Geohash'),
+        ),
+        migrations.AddIndex(
+            model_name='compostunit',
+            index=models.Index(condition=models.Q(('is_public', True)), fields=['geohash'], name='compostunit_public_geo_idx'),
+        ),
+        migrations.RunPython(fill_geohash, migrations.RunPython.noop),
+    ]
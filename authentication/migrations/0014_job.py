@@ -0,0 +1,49 @@
+# Generated by Django 5.2.1 on 2026-10-19 07:33
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0013_compostunit_geohash_mapcell'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=50, verbose_name='Tipo')),
+                ('params', models.JSONField(blank=True, default=dict, verbose_name='Parámetros')),
+                ('status', models.CharField(choices=[('queued', 'En cola'), ('running', 'En ejecución'), ('done', 'Terminado'), ('failed', 'Fallido'), ('cancelled', 'Cancelado')], default='queued', max_length=20, verbose_name='Estado')),
+                ('priority', models.SmallIntegerField(default=0, verbose_name='Prioridad')),
+                ('dedup_key', models.CharField(blank=True, max_length=200, verbose_name='Clave de deduplicación')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Intentos')),
+                ('max_attempts', models.PositiveSmallIntegerField(default=3, verbose_name='Intentos máximos')),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Ejecutar desde')),
+                ('progress', models.FloatField(default=0, verbose_name='Progreso')),
+                ('progress_message', models.CharField(blank=True, max_length=200, verbose_name='Etapa')),
+                ('result', models.JSONField(blank=True, null=True, verbose_name='Resultado')),
+                ('result_file', models.CharField(blank=True, max_length=255, verbose_name='Archivo')),
+                ('error', models.TextField(blank=True, verbose_name='Error')),
+                ('worker', models.CharField(blank=True, max_length=100, verbose_name='Proceso')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Creado')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Iniciado')),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True, verbose_name='Último latido')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Terminado')),
+                ('owner', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='jobs', to=settings.AUTH_USER_MODEL, verbose_name='Solicitado por')),
+            ],
+            options={
+                'verbose_name': 'Trabajo',
+                'verbose_name_plural': 'Trabajos',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', '-priority', 'id'], name='job_claim_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('status__in', ('queued', 'running')), models.Q(('dedup_key', ''), _negated=True)), fields=('dedup_key',), name='job_active_dedup_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 5.2.1 on 2026-10-19 07:47
+
+from collections import defaultdict
+from datetime import datetime
+
+import django.db.models.deletion
+import numpy as np
+from django.db import migrations, models
+from django.utils import timezone
+
+# Copia fija de authentication.sketches: la migración no debe cambiar si cambia la app
+METRICS = ('temperature', 'ph', 'humidity', 'oxygen')
+DELTA = 100
+
+
+def compress(means, weights, delta=DELTA):
+    means = np.asarray(means, dtype=np.float64)
+    weights = np.asarray(weights, dtype=np.float64)
+    order = np.argsort(means)
+    means, weights = means[order], weights[order]
+    q = (np.cumsum(weights) - weights / 2) / weights.sum()
+    k = delta / (2 * np.pi) * np.arcsin(2 * q - 1)
+    cluster = np.floor(k - k[0]).astype(np.int64)
+    groups = np.concatenate(([0], np.cumsum(cluster[1:] != cluster[:-1])))
+    totals = np.bincount(groups, weights=weights)
+    return np.bincount(groups, weights=weights * means) / totals, totals
+
+
+def pack(means, weights):
+    return np.column_stack((means, weights)).astype('<f4').tobytes()
+
+
+def fill_sketches(apps, schema_editor):
+    alias = schema_editor.connection.alias
+    CompostUnit = apps.get_model('authentication', 'CompostUnit')
+    SensorReading = apps.get_model('authentication', 'SensorReading')
+    ReadingSketch = apps.get_model('authentication', 'ReadingSketch')
+    tz = timezone.get_current_timezone()
+    # Una unidad por vez: solo sus lecturas están en memoria
+    for unit_id in CompostUnit.objects.using(alias).order_by('pk').values_list('pk', flat=True):
+        days = defaultdict(lambda: defaultdict(list))
+        readings = SensorReading.objects.using(alias).filter(compost_unit_id=unit_id)
+        for ts, *values in readings.values_list('timestamp', *METRICS).iterator(chunk_size=2000):
+            # Día local del segundo entero, como en el ingreso
+            day = datetime.fromtimestamp(int(ts.timestamp()), tz=tz).date()
+            for metric, value in zip(METRICS, values):
+                if value is not None:
+                    days[day][metric].append(float(value))
+        rows = []
+        for day, metrics in days.items():
+            for metric, values in metrics.items():
+                data = np.array(values, dtype=np.float32)
+                rows.append(ReadingSketch(
+                    compost_unit_id=unit_id, metric=metric, day=day, count=len(data),
+                    minimum=float(data.min()), maximum=float(data.max()),
+                    centroids=pack(*compress(data, np.ones(len(data)))),
+                ))
+        ReadingSketch.objects.using(alias).bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0014_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReadingSketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(choices=[('temperature', 'Temperatura'), ('ph', 'pH'), ('humidity', 'Humedad'), ('oxygen', 'Oxígeno')], max_length=20, verbose_name='Métrica')),
+                ('day', models.DateField(verbose_name='Día')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Lecturas')),
+                ('minimum', models.FloatField(verbose_name='Mínimo')),
+                ('maximum', models.FloatField(verbose_name='Máximo')),
+                ('centroids', models.BinaryField(verbose_name='Centroides')),
+                ('compost_unit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sketches', to='authentication.compostunit', verbose_name='Unidad de compostaje')),
+            ],
+            options={
+                'verbose_name': 'Resumen de Percentiles',
+                'verbose_name_plural': 'Resúmenes de Percentiles',
+                'ordering': ['compost_unit', 'metric', 'day'],
+                'constraints': [models.UniqueConstraint(fields=('compost_unit', 'metric', 'day'), name='readingsketch_unit_metric_day_uniq')],
+            },
+        ),
+        migrations.RunPython(fill_sketches, migrations.RunPython.noop),
+    ]
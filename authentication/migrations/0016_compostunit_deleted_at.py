@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-19 07:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0015_readingsketch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='compostunit',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Borrada el'),
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.1 on 2026-10-19 09:12
+
+from django.db import migrations
+
+# Copia fija de authentication.search: la migración no debe cambiar si cambia la app
+INDEXES = {
+    'unit': ('authentication_compostunit', ('name', 'description', 'location'), 'rowid'),
+    'material': ('authentication_compostmaterial', ('name', 'description'), 'id'),
+    'log': ('authentication_monitoringlog', ('notes',), 'id'),
+    'entry': ('authentication_compostentry', ('notes',), 'id'),
+    'harvest': ('authentication_compostharvest', ('notes',), 'id'),
+}
+TOKENIZE = "unicode61 remove_diacritics 2"
+PREFIXES = '2 3'
+
+
+def index_sql(kind):
+    table, columns, key = INDEXES[kind]
+    fts = f'search_{kind}'
+    names = ', '.join(columns)
+    new = ', '.join(f'new.{column}' for column in columns)
+    old = ', '.join(f'old.{column}' for column in columns)
+    delete = f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.{key}, {old});"
+    insert = f"INSERT INTO {fts}(rowid, {names}) VALUES (new.{key}, {new});"
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({names}, content='{table}', "
+        f"content_rowid='{key}', tokenize='{TOKENIZE}', prefix='{PREFIXES}')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN {insert} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN {delete} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {names} ON {table} "
+        f"BEGIN {delete} {insert} END",
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+def drop_sql(kind):
+    fts = f'search_{kind}'
+    return [f'DROP TRIGGER IF EXISTS {fts}_{suffix}' for suffix in ('ai', 'ad', 'au')] + [
+        f'DROP TABLE IF EXISTS {fts}'
+    ]
+
+
+def create_search_indexes(apps, schema_editor):
+    # Solo SQLite tiene FTS5; en otros motores la búsqueda no usa índice
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for kind in INDEXES:
+        for statement in index_sql(kind):
+            schema_editor.execute(statement)
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for kind in INDEXES:
+        for statement in drop_sql(kind):
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0016_compostunit_deleted_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 5.2.1 on 2026-10-19 07:58
+
+from datetime import timedelta
+
+import django.db.models.deletion
+import numpy as np
+from django.db import migrations, models
+from django.utils import timezone
+
+# Copia fija de authentication.sparklines: la migración no debe cambiar si cambia la app
+METRICS = ('temperature', 'ph', 'humidity', 'oxygen')
+BUCKETS = 48
+WINDOWS = (1800, 12600)
+SHAPE = (len(WINDOWS), 2, len(METRICS), BUCKETS)
+
+
+def add(array, end, ts, values):
+    for position, step in enumerate(WINDOWS):
+        index = BUCKETS - 1 - (end // step - ts // step)
+        inside = (index >= 0) & (index < BUCKETS)
+        for column in range(len(METRICS)):
+            data = values[:, column]
+            keep = inside & ~np.isnan(data)
+            np.add.at(array[position, 0, column], index[keep], data[keep])
+            np.add.at(array[position, 1, column], index[keep], 1)
+    return array
+
+
+def fill_sparklines(apps, schema_editor):
+    alias = schema_editor.connection.alias
+    CompostUnit = apps.get_model('authentication', 'CompostUnit')
+    SensorReading = apps.get_model('authentication', 'SensorReading')
+    UnitSparkline = apps.get_model('authentication', 'UnitSparkline')
+    end = int(timezone.now().timestamp())
+    # Solo los últimos 7 días: lo que cubre la ventana más larga
+    start = timezone.now() - timedelta(seconds=BUCKETS * max(WINDOWS))
+    rows = []
+    for unit_id in CompostUnit.objects.using(alias).order_by('pk').values_list('pk', flat=True):
+        readings = list(
+            SensorReading.objects.using(alias)
+            .filter(compost_unit_id=unit_id, timestamp__gte=start)
+            .values_list('timestamp', *METRICS)
+        )
+        if not readings:
+            continue
+        ts = np.array([int(row[0].timestamp()) for row in readings], dtype=np.int64)
+        values = np.array([[np.nan if value is None else float(value) for value in row[1:]]
+                           for row in readings], dtype=np.float32)
+        array = add(np.zeros(SHAPE, dtype=np.float32), end, ts, values)
+        rows.append(UnitSparkline(compost_unit_id=unit_id, end=end,
+                                  buckets=array.astype('<f4').tobytes()))
+    UnitSparkline.objects.using(alias).bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0017_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnitSparkline',
+            fields=[
+                ('compost_unit', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='sparkline', serialize=False, to='authentication.compostunit', verbose_name='Unidad de compostaje')),
+                ('end', models.BigIntegerField(verbose_name='Referencia')),
+                ('buckets', models.BinaryField(verbose_name='Celdas')),
+            ],
+            options={
+                'verbose_name': 'Minigráfico de Unidad',
+                'verbose_name_plural': 'Minigráficos de Unidades',
+            },
+        ),
+        migrations.RunPython(fill_sparklines, migrations.RunPython.noop),
+    ]
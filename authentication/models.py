@@ -1,13 +1,44 @@
 # authentication/models.py
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
 from django.urls import reverse
 import uuid
+from decimal import Decimal
 from django.contrib import admin
 
 
+class LedgerModel(models.Model):
+    """Movimiento que alimenta acumulados de su unidad (carga, balance C/N...).
+
+    Guarda los valores leídos de la base en `_saved_state` para que las
+    señales apliquen solo la diferencia al editar, y escribe la fila y sus
+    acumulados en la misma transacción.
+    """
+    tracked_fields = ()
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_state = instance.tracked_state()
+        return instance
+
+    def tracked_state(self):
+        return {name: self.__dict__.get(name) for name in self.tracked_fields}
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
+
+
 class UserProfile(models.Model):
     user = models.OneToOneField(
         User, 
@@ -63,6 +94,13 @@ class UserProfile(models.Model):
         return self.user.get_full_name() or self.user.username
 
 
+class ActiveUnitManager(models.Manager):
+    """Excluye las unidades marcadas como borradas (ver authentication/deletion.py)"""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class CompostUnit(models.Model):
     """Modelo para unidades de compostaje"""
     
@@ -122,8 +160,12 @@ class CompostUnit(models.Model):
         validators=[MinValueValidator(1)],
         verbose_name='Capacidad (kg)'
     )
-    current_load = models.PositiveIntegerField(
+    # Entradas menos cosechas; se actualiza con F() en cada movimiento
+    current_load = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
         default=0,
+        editable=False,
         verbose_name='Carga actual (kg)'
     )
     unit_type = models.CharField(
@@ -170,7 +212,33 @@ class CompostUnit(models.Model):
         validators=[MinValueValidator(0), MaxValueValidator(100)],
         verbose_name='Nivel de humedad (%)'
     )
-    
+    # Contador aproximado de lecturas: se incrementa al ingresar lecturas y
+    # evita COUNT(*) sobre el historial completo al paginar
+    reading_count = models.PositiveBigIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Lecturas (aprox.)'
+    )
+    # Geohash de latitud/longitud, recalculado en save(); indexado para el mapa
+    geohash = models.CharField(
+        max_length=12,
+        blank=True,
+        editable=False,
+        verbose_name='Geohash'
+    )
+    # Borrado lógico: la unidad desaparece al instante y un trabajo en segundo
+    # plano vacía su historial por lotes antes de borrar la fila
+    deleted_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='Borrada el'
+    )
+
+    objects = ActiveUnitManager()
+    # Incluye las unidades borradas pendientes de purga
+    all_objects = models.Manager()
+
     def get_latest_reading(self):
         """Devuelve la última lectura de sensores asociada a esta unidad de compostaje."""
         return self.readings.order_by('-timestamp').first()
@@ -179,9 +247,49 @@ class CompostUnit(models.Model):
         verbose_name = 'Unidad de Compostaje'
         verbose_name_plural = 'Unidades de Compostaje'
         ordering = ['-created_at']
+        indexes = [
+            # Unidades públicas por prefijo de geohash (mapa por área visible)
+            models.Index(fields=['geohash'], name='compostunit_public_geo_idx',
+                         condition=models.Q(is_public=True)),
+        ]
         
+    # Acumulados mantenidos con F(); un save() completo los pisaría con el
+    # valor leído al cargar la instancia
+    COUNTER_FIELDS = ('current_load', 'reading_count')
+
     def __str__(self):
         return f"{self.name} - {self.owner.username}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_map_state = instance.map_state()
+        return instance
+
+    def map_state(self):
+        """(geohash, latitud, longitud) si la unidad aparece en el mapa público, si no None"""
+        data = self.__dict__
+        if not data.get('is_public') or not data.get('geohash') or data.get('deleted_at'):
+            return None
+        return data['geohash'], data.get('latitude'), data.get('longitude')
+
+    def save(self, *args, **kwargs):
+        from .geo import encode
+
+        if self.latitude is not None and self.longitude is not None:
+            self.geohash = encode(self.latitude, self.longitude)
+        else:
+            self.geohash = ''
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'geohash'}
+        if (not self._state.adding and update_fields is None
+                and not kwargs.get('force_insert')):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
     
     def get_absolute_url(self):
         return reverse('compost_unit_detail', kwargs={'pk': self.pk})
@@ -192,7 +300,7 @@ class CompostUnit(models.Model):
     
     def can_add_material(self, amount):
         """Verifica si se puede agregar cierta cantidad de material"""
-        return (self.current_load + amount) <= self.capacity
+        return (self.current_load + Decimal(str(amount))) <= self.capacity
 
     def get_capacity_percentage(self):
         """Calcula el porcentaje de capacidad utilizada"""
@@ -245,8 +353,10 @@ class CompostMaterial(models.Model):
         return self.name
 
 
-class CompostEntry(models.Model):
+class CompostEntry(LedgerModel):
     """Entradas de material en las unidades de compostaje"""
+
+    tracked_fields = ('compost_unit_id', 'material_id', 'quantity', 'date_added')
     
     compost_unit = models.ForeignKey(
         CompostUnit, 
@@ -283,13 +393,26 @@ class CompostEntry(models.Model):
         verbose_name = 'Entrada de Material'
         verbose_name_plural = 'Entradas de Material'
         ordering = ['-date_added']
+        indexes = [
+            # Línea de tiempo por unidad (paginación por cursor)
+            models.Index(fields=['compost_unit', 'date_added', 'id'],
+                         name='compostentry_unit_date_idx'),
+        ]
         
     def __str__(self):
-        return f"{self.quantity}kg de {self.material.name} - {self.date_added.date()}"
+        from .catalog import catalog
+
+        # Resuelve el material desde el catálogo en memoria, sin consulta por fila
+        material = catalog.get(self.material_id) or self.material
+        return f"{self.quantity}kg de {material.name} - {self.date_added.date()}"
 
 
-class CompostHarvest(models.Model):
+class CompostHarvest(LedgerModel):
     """Cosechas de compost terminado"""
+
+    tracked_fields = (
+        'compost_unit_id', 'quantity', 'quality_grade', 'compost_age_days', 'harvest_date',
+    )
     
     QUALITY_GRADES = [
         ('A', 'Excelente'),
@@ -336,6 +459,10 @@ class CompostHarvest(models.Model):
         verbose_name = 'Cosecha de Compost'
         verbose_name_plural = 'Cosechas de Compost'
         ordering = ['-harvest_date']
+        indexes = [
+            models.Index(fields=['compost_unit', 'harvest_date', 'id'],
+                         name='compostharvest_unit_date_idx'),
+        ]
         
     def __str__(self):
         return f"Cosecha {self.quantity}kg - {self.harvest_date.date()}"
@@ -355,10 +482,28 @@ class MonitoringLog(models.Model):
     date_recorded = models.DateTimeField(default=timezone.now)
     notes = models.TextField(blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['compost_unit', 'date_recorded', 'id'],
+                         name='monitoringlog_unit_date_idx'),
+        ]
+
     def __str__(self):
         return f"Monitoreo {self.compost_unit.name} - {self.date_recorded.strftime('%Y-%m-%d %H:%M')}"
 
 
+def compost_phase(temperature):
+    """Fase del compost según la temperatura (°C); None si la lectura no la trae"""
+    if temperature is None:
+        return None
+    if temperature > 50:
+        return "Fase Termófila"
+    elif temperature > 30:
+        return "Fase Mesófila"
+    else:
+        return "Fase de Enfriamiento"
+
+
 class SensorReading(models.Model):
     compost_unit = models.ForeignKey(
         CompostUnit,
@@ -367,7 +512,8 @@ class SensorReading(models.Model):
         null=True,
         blank=True
     )
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # default en lugar de auto_now_add: las importaciones conservan la fecha original
+    timestamp = models.DateTimeField(default=timezone.now)
     temperature = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
     ph = models.DecimalField(max_digits=4, decimal_places=2, null=True, blank=True)
     humidity = models.PositiveIntegerField(null=True, blank=True, validators=[
@@ -381,14 +527,327 @@ class SensorReading(models.Model):
         verbose_name = 'Lectura de Sensor'
         verbose_name_plural = 'Lecturas de Sensor'
         ordering = ['-timestamp']
+        indexes = [
+            # Historial por unidad en orden cronológico (paginación por cursor)
+            models.Index(fields=['compost_unit', 'timestamp', 'id'],
+                         name='sensorreading_unit_ts_idx'),
+        ]
 
     def __str__(self):
         return f"{self.compost_unit.name if self.compost_unit else 'Unidad desconocida'} - {self.timestamp.strftime('%Y-%m-%d %H:%M:%S')}"
     def get_compost_phase(self):
-        # lógica para determinar la fase del compost según los datos
-        if self.temperature > 50:
-            return "Fase Termófila"
-        elif self.temperature > 30:
-            return "Fase Mesófila"
-        else:
-            return "Fase de Enfriamiento"
+        return compost_phase(self.temperature)
+
+
+class SlowQuery(models.Model):
+    """Consultas lentas agrupadas por SQL normalizado"""
+
+    fingerprint = models.CharField(
+        max_length=40,
+        unique=True,
+        verbose_name='Huella'
+    )
+    normalized_sql = models.TextField(verbose_name='SQL normalizado')
+    sample_sql = models.TextField(verbose_name='SQL de ejemplo')
+    sample_params = models.TextField(blank=True, verbose_name='Parámetros de ejemplo')
+    view = models.CharField(max_length=200, blank=True, verbose_name='Vista')
+    plan = models.TextField(blank=True, verbose_name='Plan de consulta')
+    full_scan = models.BooleanField(default=False, verbose_name='Recorrido completo')
+    calls = models.PositiveIntegerField(default=0, verbose_name='Llamadas')
+    total_time_ms = models.FloatField(default=0, verbose_name='Tiempo total (ms)')
+    max_time_ms = models.FloatField(default=0, verbose_name='Tiempo máximo (ms)')
+    first_seen = models.DateTimeField(default=timezone.now, verbose_name='Primera vez')
+    last_seen = models.DateTimeField(default=timezone.now, verbose_name='Última vez')
+
+    class Meta:
+        verbose_name = 'Consulta Lenta'
+        verbose_name_plural = 'Consultas Lentas'
+        ordering = ['-total_time_ms']
+
+    def __str__(self):
+        return f"{self.normalized_sql[:80]} ({self.total_time_ms:.0f} ms)"
+
+    @property
+    def avg_time_ms(self):
+        return self.total_time_ms / self.calls if self.calls else 0.0
+
+
+class DeviceKey(models.Model):
+    """Claves de API para sensores y gateways (sin sesión ni CSRF)"""
+
+    owner = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='device_keys',
+        verbose_name='Propietario'
+    )
+    compost_unit = models.ForeignKey(
+        CompostUnit,
+        on_delete=models.CASCADE,
+        related_name='device_keys',
+        null=True,
+        blank=True,
+        help_text='Vacío = clave de gateway para todas las unidades del propietario',
+        verbose_name='Unidad de compostaje'
+    )
+    name = models.CharField(max_length=100, verbose_name='Nombre')
+    prefix = models.CharField(
+        max_length=16,
+        unique=True,
+        editable=False,
+        verbose_name='Prefijo'
+    )
+    # Solo se guarda el SHA-256 de la clave; la clave completa se muestra una vez
+    key_hash = models.CharField(max_length=64, editable=False, verbose_name='Hash de la clave')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')
+    revoked_at = models.DateTimeField(null=True, blank=True, verbose_name='Revocada el')
+
+    class Meta:
+        verbose_name = 'Clave de Dispositivo'
+        verbose_name_plural = 'Claves de Dispositivo'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.name} ({self.prefix})"
+
+    @property
+    def is_active(self):
+        return self.revoked_at is None
+
+
+class CompostBalance(models.Model):
+    """Balance C/N acumulado de una unidad, actualizado con cada entrada"""
+
+    # Rango de relación C/N recomendado para un compostaje activo
+    TARGET_CN = (25, 30)
+
+    compost_unit = models.OneToOneField(
+        CompostUnit,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='balance',
+        verbose_name='Unidad de compostaje'
+    )
+    green_kg = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0, verbose_name='Material verde (kg)'
+    )
+    brown_kg = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0, verbose_name='Material marrón (kg)'
+    )
+    other_kg = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0, verbose_name='Otros materiales (kg)'
+    )
+    # Σ cantidad × C/N de cada entrada; dividido por la masa total da la relación ponderada
+    cn_mass = models.DecimalField(
+        max_digits=16, decimal_places=4, default=0, verbose_name='Masa ponderada por C/N'
+    )
+    entry_count = models.PositiveIntegerField(default=0, verbose_name='Entradas')
+    updated_at = models.DateTimeField(default=timezone.now, verbose_name='Última actualización')
+
+    class Meta:
+        verbose_name = 'Balance C/N'
+        verbose_name_plural = 'Balances C/N'
+
+    def __str__(self):
+        ratio = self.cn_ratio
+        return f"{self.compost_unit_id}: C/N {ratio:.1f}" if ratio is not None else f"{self.compost_unit_id}: sin entradas"
+
+    @property
+    def total_kg(self):
+        return self.green_kg + self.brown_kg + self.other_kg
+
+    @property
+    def cn_ratio(self):
+        """Relación C/N ponderada por masa (None sin entradas)"""
+        total = self.total_kg
+        return float(self.cn_mass / total) if total > 0 else None
+
+    @property
+    def brown_green_ratio(self):
+        """kg de material marrón por kg de verde (None sin material verde)"""
+        return float(self.brown_kg / self.green_kg) if self.green_kg > 0 else None
+
+
+class YieldSummary(models.Model):
+    """Resumen mensual materializado de cosechas y entradas de una unidad"""
+
+    compost_unit = models.ForeignKey(
+        CompostUnit,
+        on_delete=models.CASCADE,
+        related_name='yield_summaries',
+        verbose_name='Unidad de compostaje'
+    )
+    month = models.DateField(verbose_name='Mes')
+    harvested_kg = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0, verbose_name='Cosechado (kg)'
+    )
+    harvest_count = models.PositiveIntegerField(default=0, verbose_name='Cosechas')
+    grade_a = models.PositiveIntegerField(default=0, verbose_name='Calidad A')
+    grade_b = models.PositiveIntegerField(default=0, verbose_name='Calidad B')
+    grade_c = models.PositiveIntegerField(default=0, verbose_name='Calidad C')
+    grade_d = models.PositiveIntegerField(default=0, verbose_name='Calidad D')
+    # Suma de compost_age_days; dividida por harvest_count da la edad media
+    age_days_total = models.PositiveBigIntegerField(default=0, verbose_name='Días acumulados')
+    input_kg = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0, verbose_name='Material ingresado (kg)'
+    )
+
+    class Meta:
+        verbose_name = 'Resumen de Rendimiento'
+        verbose_name_plural = 'Resúmenes de Rendimiento'
+        ordering = ['compost_unit', 'month']
+        constraints = [
+            models.UniqueConstraint(fields=['compost_unit', 'month'],
+                                    name='yieldsummary_unit_month_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.compost_unit_id} {self.month:%Y-%m}: {self.harvested_kg} kg"
+
+
+class ReadingSketch(models.Model):
+    """t-digest de una métrica de una unidad en un día (ver authentication/sketches.py)"""
+
+    METRIC_CHOICES = [
+        ('temperature', 'Temperatura'),
+        ('ph', 'pH'),
+        ('humidity', 'Humedad'),
+        ('oxygen', 'Oxígeno'),
+    ]
+
+    compost_unit = models.ForeignKey(
+        CompostUnit,
+        on_delete=models.CASCADE,
+        related_name='sketches',
+        verbose_name='Unidad de compostaje'
+    )
+    metric = models.CharField(max_length=20, choices=METRIC_CHOICES, verbose_name='Métrica')
+    day = models.DateField(verbose_name='Día')
+    count = models.PositiveIntegerField(default=0, verbose_name='Lecturas')
+    minimum = models.FloatField(verbose_name='Mínimo')
+    maximum = models.FloatField(verbose_name='Máximo')
+    # Pares float32 (media, peso) de los centroides
+    centroids = models.BinaryField(verbose_name='Centroides')
+
+    class Meta:
+        verbose_name = 'Resumen de Percentiles'
+        verbose_name_plural = 'Resúmenes de Percentiles'
+        ordering = ['compost_unit', 'metric', 'day']
+        constraints = [
+            models.UniqueConstraint(fields=['compost_unit', 'metric', 'day'],
+                                    name='readingsketch_unit_metric_day_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.compost_unit_id} {self.metric} {self.day}: {self.count} lecturas"
+
+
+class UnitSparkline(models.Model):
+    """Minigráficos de 24 horas y 7 días de una unidad (ver authentication/sparklines.py)"""
+
+    compost_unit = models.OneToOneField(
+        CompostUnit,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='sparkline',
+        verbose_name='Unidad de compostaje'
+    )
+    # Segundos Unix hasta los que están desplazadas las celdas
+    end = models.BigIntegerField(verbose_name='Referencia')
+    # float32 (ventana, suma/lecturas, métrica, celda)
+    buckets = models.BinaryField(verbose_name='Celdas')
+
+    class Meta:
+        verbose_name = 'Minigráfico de Unidad'
+        verbose_name_plural = 'Minigráficos de Unidades'
+
+    def __str__(self):
+        return f"{self.compost_unit_id}: minigráficos"
+
+
+class MapCell(models.Model):
+    """Unidades públicas agregadas por celda de geohash (una fila por celda y precisión)"""
+
+    cell = models.CharField(max_length=12, unique=True, verbose_name='Celda')
+    precision = models.PositiveSmallIntegerField(verbose_name='Precisión')
+    unit_count = models.IntegerField(default=0, verbose_name='Unidades')
+    latitude_sum = models.FloatField(default=0, verbose_name='Suma de latitudes')
+    longitude_sum = models.FloatField(default=0, verbose_name='Suma de longitudes')
+
+    class Meta:
+        verbose_name = 'Celda del Mapa'
+        verbose_name_plural = 'Celdas del Mapa'
+
+    def __str__(self):
+        return f"{self.cell}: {self.unit_count}"
+
+
+class Job(models.Model):
+    """Trabajo en segundo plano encolado en la base (ver authentication/jobs.py)"""
+
+    STATUS_CHOICES = [
+        ('queued', 'En cola'),
+        ('running', 'En ejecución'),
+        ('done', 'Terminado'),
+        ('failed', 'Fallido'),
+        ('cancelled', 'Cancelado'),
+    ]
+    ACTIVE_STATUSES = ('queued', 'running')
+
+    kind = models.CharField(max_length=50, verbose_name='Tipo')
+    params = models.JSONField(default=dict, blank=True, verbose_name='Parámetros')
+    owner = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='jobs',
+        null=True,
+        blank=True,
+        verbose_name='Solicitado por'
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='queued',
+        verbose_name='Estado'
+    )
+    # Mayor prioridad se ejecuta antes; a igual prioridad, el más antiguo
+    priority = models.SmallIntegerField(default=0, verbose_name='Prioridad')
+    # Un trabajo activo por clave: encolar de nuevo devuelve el existente
+    dedup_key = models.CharField(max_length=200, blank=True, verbose_name='Clave de deduplicación')
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name='Intentos')
+    max_attempts = models.PositiveSmallIntegerField(default=3, verbose_name='Intentos máximos')
+    run_after = models.DateTimeField(default=timezone.now, verbose_name='Ejecutar desde')
+    progress = models.FloatField(default=0, verbose_name='Progreso')
+    progress_message = models.CharField(max_length=200, blank=True, verbose_name='Etapa')
+    result = models.JSONField(null=True, blank=True, verbose_name='Resultado')
+    # Ruta relativa a RUNTIME_DIR/jobs del archivo producido, si lo hay
+    result_file = models.CharField(max_length=255, blank=True, verbose_name='Archivo')
+    error = models.TextField(blank=True, verbose_name='Error')
+    worker = models.CharField(max_length=100, blank=True, verbose_name='Proceso')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Creado')
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name='Iniciado')
+    heartbeat_at = models.DateTimeField(null=True, blank=True, verbose_name='Último latido')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='Terminado')
+
+    class Meta:
+        verbose_name = 'Trabajo'
+        verbose_name_plural = 'Trabajos'
+        ordering = ['-created_at']
+        indexes = [
+            # Siguiente trabajo a tomar: en cola, por prioridad y antigüedad
+            models.Index(fields=['status', '-priority', 'id'], name='job_claim_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['dedup_key'],
+                condition=models.Q(status__in=('queued', 'running')) & ~models.Q(dedup_key=''),
+                name='job_active_dedup_uniq',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.get_status_display()})"
+
+    @property
+    def is_active(self):
+        return self.status in self.ACTIVE_STATUSES
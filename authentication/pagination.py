@@ -0,0 +1,149 @@
+# authentication/pagination.py
+"""Paginación por cursor (keyset) para historiales largos.
+
+En lugar de COUNT(*) + OFFSET, cada página se obtiene buscando en el índice a
+partir de la última fila vista, por lo que el costo es el mismo en la primera
+página que en la página diez mil.
+"""
+import base64
+import json
+
+from django.core.paginator import Paginator
+from django.db.models import Max, Min, Q
+from django.utils.functional import cached_property
+from django.utils.dateparse import parse_datetime
+
+
+def encode_cursor(payload):
+    """Serializa un cursor como token opaco apto para URLs"""
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """Inverso de encode_cursor; lanza ValueError si el token no es válido"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (TypeError, ValueError, UnicodeError) as exc:
+        raise ValueError('Cursor inválido') from exc
+
+
+def _dump_value(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def _load_value(value):
+    if isinstance(value, str):
+        parsed = parse_datetime(value)
+        if parsed is not None:
+            return parsed
+    return value
+
+
+class KeysetPage:
+    """Página de resultados con tokens para la página siguiente y anterior"""
+
+    def __init__(self, object_list, next_cursor, previous_cursor, approx_total=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.approx_total = approx_total
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+def _after(fields, values, descending):
+    """Condición "estrictamente después de `values`" en el orden de `fields`"""
+    first, *rest = fields
+    strict = '__lt' if descending else '__gt'
+    if not rest:
+        return Q(**{first + strict: values[0]})
+    return Q(**{first + strict: values[0]}) | (
+        Q(**{first: values[0]}) & _after(rest, values[1:], descending)
+    )
+
+
+def keyset_paginate(queryset, cursor=None, per_page=20,
+                    fields=('timestamp', 'id'), descending=True, approx_total=None):
+    """Devuelve una KeysetPage de `queryset` ordenado por `fields`.
+
+    `fields` debe identificar cada fila de forma única (por eso termina en
+    `id`) y estar cubierto por un índice junto con los filtros del queryset.
+    """
+    direction = 'next'
+    key = None
+    if cursor:
+        try:
+            payload = decode_cursor(cursor)
+            direction = payload['d']
+            key = [_load_value(v) for v in payload['k']]
+            if direction not in ('next', 'prev') or len(key) != len(fields):
+                raise ValueError
+        except (ValueError, KeyError, TypeError):
+            direction, key = 'next', None
+
+    # Hacia atrás se recorre el índice en sentido contrario y se invierte
+    backwards = direction == 'prev'
+    scan_descending = descending != backwards
+    order = [('-' if scan_descending else '') + f for f in fields]
+
+    qs = queryset.order_by(*order)
+    if key is not None:
+        # La cota sobre el primer campo permite a SQLite buscar directamente
+        # en el índice en lugar de recorrerlo desde el principio
+        bound = fields[0] + ('__lte' if scan_descending else '__gte')
+        qs = qs.filter(Q(**{bound: key[0]}) & _after(list(fields), key, scan_descending))
+    rows = list(qs[:per_page + 1])
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    def token(row, d):
+        return encode_cursor({'d': d, 'k': [_dump_value(getattr(row, f)) for f in fields]})
+
+    next_cursor = previous_cursor = None
+    if rows:
+        if has_more or backwards:
+            next_cursor = token(rows[-1], 'next')
+        if key is not None and (has_more or not backwards):
+            previous_cursor = token(rows[0], 'prev')
+    return KeysetPage(rows, next_cursor, previous_cursor, approx_total)
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator que nunca cuenta la tabla completa.
+
+    Sin filtros estima el total con MIN/MAX de la clave primaria (dos búsquedas
+    en el índice); con filtros cuenta como mucho `count_limit` filas.
+    """
+    count_limit = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list.order_by()
+        pk = queryset.model._meta.pk
+        if not queryset.query.has_filters() and pk.get_internal_type() in (
+            'AutoField', 'BigAutoField', 'SmallAutoField',
+        ):
+            # Consultas separadas: SQLite solo optimiza un MIN o MAX por consulta
+            highest = queryset.aggregate(value=Max('pk'))['value']
+            if highest is None:
+                return 0
+            lowest = queryset.aggregate(value=Min('pk'))['value']
+            return highest - lowest + 1
+        return queryset[:self.count_limit].count()
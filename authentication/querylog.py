@@ -0,0 +1,181 @@
+# authentication/querylog.py
+"""Registro de consultas lentas con captura de EXPLAIN QUERY PLAN."""
+import hashlib
+import logging
+import re
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, connection
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .writer import run_write
+
+logger = logging.getLogger('authentication.slow_queries')
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST_RE = re.compile(r'\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)')
+_SPACE_RE = re.compile(r'\s+')
+
+# Huellas ya explicadas en este proceso; evita repetir EXPLAIN en cada request
+_explained = set()
+
+
+def get_threshold_ms():
+    """Umbral configurado en milisegundos, o None si el registro está desactivado"""
+    return getattr(settings, 'SLOW_QUERY_THRESHOLD_MS', None)
+
+
+def normalize_sql(sql):
+    """Normaliza el SQL para agrupar consultas que solo difieren en sus valores"""
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = _IN_LIST_RE.sub('(...)', sql)
+    return _SPACE_RE.sub(' ', sql).strip()
+
+
+def fingerprint(normalized_sql):
+    return hashlib.sha1(normalized_sql.encode('utf-8')).hexdigest()
+
+
+def explain_query_plan(sql, params):
+    """Devuelve la salida de EXPLAIN QUERY PLAN de SQLite como texto"""
+    if connection.vendor != 'sqlite':
+        return ''
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            rows = cursor.fetchall()
+    except Exception as exc:
+        return f'(sin plan: {exc})'
+    # Cada fila es (id, parent, notused, detail)
+    depth = {0: -1}
+    lines = []
+    for node_id, parent, _unused, detail in rows:
+        depth[node_id] = depth.get(parent, -1) + 1
+        lines.append('  ' * depth[node_id] + detail)
+    return '\n'.join(lines)
+
+
+def is_full_scan(plan):
+    """Detecta recorridos completos de tabla (SCAN sin índice)"""
+    for line in plan.splitlines():
+        line = line.strip()
+        if line.startswith('SCAN ') and 'USING' not in line:
+            return True
+    return False
+
+
+class SlowQueryRecorder:
+    """Wrapper de ejecución que acumula las consultas que superan el umbral"""
+
+    def __init__(self, threshold_ms):
+        self.threshold_ms = threshold_ms
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            if duration_ms >= self.threshold_ms:
+                self.queries.append((sql, params, many, duration_ms))
+
+
+def record_slow_queries(queries, view_name):
+    """Persiste las consultas lentas agrupadas por SQL normalizado"""
+    from .models import SlowQuery
+
+    grouped = {}
+    for sql, params, many, duration_ms in queries:
+        normalized = normalize_sql(sql)
+        fp = fingerprint(normalized)
+        entry = grouped.setdefault(fp, {
+            'normalized_sql': normalized,
+            'sql': sql,
+            'params': params,
+            'many': many,
+            'calls': 0,
+            'total': 0.0,
+            'max': 0.0,
+        })
+        entry['calls'] += 1
+        entry['total'] += duration_ms
+        if duration_ms > entry['max']:
+            entry['max'] = duration_ms
+            entry['sql'], entry['params'], entry['many'] = sql, params, many
+
+    now = timezone.now()
+    for fp, entry in grouped.items():
+        logger.warning(
+            'Consulta lenta (%.1f ms, %d llamadas) en %s: %s',
+            entry['max'], entry['calls'], view_name, entry['normalized_sql'],
+        )
+        updates = {
+            'calls': F('calls') + entry['calls'],
+            'total_time_ms': F('total_time_ms') + entry['total'],
+            'max_time_ms': Greatest(F('max_time_ms'), entry['max']),
+            'last_seen': now,
+            'view': view_name,
+        }
+        if fp not in _explained and not entry['many']:
+            plan = explain_query_plan(entry['sql'], entry['params'])
+            updates.update({
+                'plan': plan,
+                'full_scan': is_full_scan(plan),
+                'sample_sql': entry['sql'],
+                'sample_params': repr(entry['params']),
+            })
+            _explained.add(fp)
+
+        if SlowQuery.objects.filter(fingerprint=fp).update(**updates):
+            continue
+        try:
+            plan = updates.get('plan', '')
+            SlowQuery.objects.create(
+                fingerprint=fp,
+                normalized_sql=entry['normalized_sql'],
+                sample_sql=entry['sql'],
+                sample_params=repr(entry['params']),
+                view=view_name,
+                plan=plan,
+                full_scan=is_full_scan(plan),
+                calls=entry['calls'],
+                total_time_ms=entry['total'],
+                max_time_ms=entry['max'],
+                first_seen=now,
+                last_seen=now,
+            )
+        except IntegrityError:
+            # Otro proceso insertó la misma huella entre el update y el create
+            SlowQuery.objects.filter(fingerprint=fp).update(**updates)
+
+
+class SlowQueryMiddleware:
+    """Instrumenta cada request y registra sus consultas lentas al terminar"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        threshold_ms = get_threshold_ms()
+        if threshold_ms is None:
+            return self.get_response(request)
+
+        recorder = SlowQueryRecorder(threshold_ms)
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+
+        if recorder.queries:
+            match = getattr(request, 'resolver_match', None)
+            view_name = match.view_name if match else request.path
+            try:
+                run_write(record_slow_queries, recorder.queries, view_name)
+            except Exception:
+                logger.exception('No se pudo registrar las consultas lentas')
+        return response
@@ -0,0 +1,416 @@
+# authentication/reports.py
+"""Informes en PDF generados en el servidor.
+
+Las gráficas se dibujan como vectores con reportlab.graphics (no capturas de
+pantalla), y el PDF resultante se guarda en la caché 'reports' bajo una
+clave que incluye la versión de los datos del usuario: mientras no lleguen
+lecturas nuevas ni cambien sus unidades o el catálogo, una descarga repetida
+sale de la caché sin consultar las lecturas ni volver a dibujar.
+
+`write_readings_pdf` escribe la tabla de lecturas de una unidad; la usan la
+descarga directa y el trabajo en segundo plano de exportación.
+"""
+import hashlib
+from io import BytesIO
+
+from django.core.cache import caches
+from django.db.models import Avg, Count, OuterRef, Subquery
+from django.utils import timezone
+from reportlab.graphics.charts.barcharts import VerticalBarChart
+from reportlab.graphics.charts.legends import Legend
+from reportlab.graphics.charts.linecharts import HorizontalLineChart
+from reportlab.graphics.shapes import Drawing, String
+from reportlab.graphics.widgets.markers import makeMarker
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import landscape, letter
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import cm
+from reportlab.pdfgen import canvas
+from reportlab.platypus import PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from .catalog import catalog
+from .ingest import METRICS
+from .series import AGGREGATIONS, FILLS, auto_step, load_columns, parse_step, resample, to_lists
+from .singleflight import single_flight
+from .sketches import QUANTILES, recent_window, sketch_summary
+
+REPORT_CACHE = 'reports'
+# Cambiar al modificar el diseño del informe para no servir PDF viejos
+REPORT_FORMAT = 2
+# Métricas de la tabla de percentiles: (nombre, unidad)
+METRIC_LABELS = {
+    'temperature': ('Temperatura', '°C'),
+    'ph': ('pH', ''),
+    'humidity': ('Humedad', '%'),
+    'oxygen': ('Oxígeno', '%'),
+}
+# Máximo de etiquetas visibles en el eje de categorías
+MAX_AXIS_LABELS = 12
+
+CHART_WIDTH, CHART_HEIGHT = 24 * cm, 13 * cm
+SERIES_COLORS = {
+    'temperature': colors.HexColor('#e74c3c'),
+    'ph': colors.HexColor('#3498db'),
+    'humidity': colors.HexColor('#2ecc71'),
+    'oxygen': colors.HexColor('#9b59b6'),
+    'materials': colors.HexColor('#f39c12'),
+}
+
+
+def prepare_chart_data(readings, step=None, agg='mean', fill='none'):
+    """Series de las métricas sobre una grilla regular, listas para Chart.js.
+
+    Sin `step` se elige un intervalo que deje como mucho ~200 puntos. Los
+    intervalos sin lecturas quedan en None para que la gráfica muestre el hueco.
+    """
+    ts, values = load_columns(readings)
+    if not len(ts):
+        return {'labels': [], 'temperature': [], 'ph': [], 'humidity': [], 'oxygen': []}
+    step = step or auto_step(ts[-1] - ts[0])
+    labels, columns = to_lists(*resample(ts, values, step, agg=agg, fill=fill))
+    chart = dict(zip(METRICS, columns))
+    chart['labels'] = labels
+    return chart
+
+
+def statistics_data(user):
+    """Datos de la página y del informe PDF de estadísticas"""
+    from .models import CompostUnit, SensorReading
+
+    user_units = CompostUnit.objects.filter(owner=user)
+    total_readings = SensorReading.objects.filter(
+        compost_unit__owner=user, compost_unit__deleted_at__isnull=True
+    ).count()
+
+    unit_stats = []
+    for unit in user_units:
+        readings = SensorReading.objects.filter(compost_unit=unit)
+        if readings.exists():
+            stats = readings.aggregate(
+                avg_temp=Avg('temperature'),
+                avg_ph=Avg('ph'),
+                avg_humidity=Avg('humidity'),
+                avg_oxygen=Avg('oxygen'),
+                count=Count('id')
+            )
+            stats.update({
+                'unit': unit,
+                'latest': readings.order_by('-timestamp').first()
+            })
+            unit_stats.append(stats)
+
+    # Percentiles de los últimos días combinando los t-digest diarios
+    start, end = recent_window()
+    fleet, per_unit = sketch_summary([stat['unit'].pk for stat in unit_stats], start, end)
+    for stat in unit_stats:
+        stat['percentiles'] = per_unit.get(stat['unit'].pk, {})
+
+    recent_readings = SensorReading.objects.filter(
+        compost_unit__owner=user, compost_unit__deleted_at__isnull=True
+    ).order_by('-timestamp')[:100]
+
+    return {
+        'total_readings': total_readings,
+        'unit_stats': unit_stats,
+        'percentiles': {
+            'start': start,
+            'end': end,
+            'rows': [
+                dict(fleet[metric], metric=metric, label=label, unit=unit)
+                for metric, (label, unit) in METRIC_LABELS.items()
+            ],
+        },
+        'chart': prepare_chart_data(recent_readings),
+        'materials': catalog.recommended_chart(),
+    }
+
+
+def units_version(user, *extra):
+    """Huella de las unidades del usuario y sus lecturas, más los valores de `extra`.
+
+    Una sola consulta: por unidad, su última modificación, el contador de
+    lecturas y la última lectura (búsqueda en el índice unidad/fecha/id).
+    Editar o borrar una lectura actualiza updated_at de su unidad (ver
+    signals.py), así que también cambia la huella.
+    """
+    from .models import CompostUnit, SensorReading
+
+    latest = SensorReading.objects.filter(compost_unit=OuterRef('pk')).order_by('-timestamp', '-id')
+    units = (
+        CompostUnit.objects.filter(owner=user).order_by('pk')
+        .annotate(latest_id=Subquery(latest.values('id')[:1]))
+        .values_list('pk', 'updated_at', 'reading_count', 'latest_id')
+    )
+    digest = hashlib.sha1(repr(extra).encode())
+    for row in units:
+        digest.update(repr(row).encode())
+    return digest.hexdigest()
+
+
+def statistics_version(user):
+    """Huella de los datos que muestra el informe de estadísticas del usuario"""
+    # El día entra en la huella porque la ventana de percentiles avanza con él
+    return units_version(user, REPORT_FORMAT, catalog.version, recent_window())
+
+
+def shared_statistics_data(user, version=None):
+    """statistics_data coalescido: peticiones simultáneas del mismo usuario lo calculan una vez"""
+    version = version or statistics_version(user)
+    return single_flight(('statistics', user.pk, version), lambda: statistics_data(user))
+
+
+def cached_report(name, user, version, build, timeout=24 * 3600):
+    """(PDF, desde_caché) del informe `name`; `build()` solo se llama si no está en caché"""
+    cache = caches[REPORT_CACHE]
+    key = f'{name}:{user.pk}:{version}'
+    pdf = cache.get(key)
+    if pdf is not None:
+        return pdf, True
+    # Descargas simultáneas del mismo informe esperan a un único render
+    pdf = single_flight(('report', name, user.pk, version), build)
+    cache.set(key, pdf, timeout)
+    return pdf, False
+
+
+def _axis_labels(labels):
+    """Deja visibles como mucho MAX_AXIS_LABELS etiquetas repartidas en el eje"""
+    every = max(1, -(-len(labels) // MAX_AXIS_LABELS))
+    return [label if i % every == 0 else '' for i, label in enumerate(labels)]
+
+
+def line_chart(labels, series, value_min=None, value_max=None):
+    """Gráfica de líneas vectorial; `series` es una lista de (nombre, clave de color, valores)"""
+    drawing = Drawing(CHART_WIDTH, CHART_HEIGHT)
+    chart = HorizontalLineChart()
+    chart.x, chart.y = 50, 60
+    chart.width, chart.height = CHART_WIDTH - 80, CHART_HEIGHT - 100
+    # None deja un hueco en la línea, igual que en la página
+    chart.data = [values or [None] for _, _, values in series]
+    # Cada serie elige abajo si se dibuja como línea o como punto
+    chart.joinedLines = 0
+    chart.categoryAxis.categoryNames = _axis_labels(labels) or ['']
+    chart.categoryAxis.labels.angle = 30
+    chart.categoryAxis.labels.boxAnchor = 'ne'
+    chart.categoryAxis.labels.fontSize = 7
+    chart.valueAxis.labels.fontSize = 8
+    chart.valueAxis.visibleGrid = 1
+    chart.valueAxis.gridStrokeColor = colors.lightgrey
+    if value_min is not None:
+        chart.valueAxis.valueMin = value_min
+    if value_max is not None:
+        chart.valueAxis.valueMax = value_max
+    for index, (_, color, values) in enumerate(series):
+        line = chart.lines[index]
+        line.strokeColor = SERIES_COLORS[color]
+        line.strokeWidth = 1.5
+        if sum(value is not None for value in values) >= 2:
+            line.lineStyle = 'joinedLine'
+        else:
+            # Con un solo punto no hay línea (reportlab no admite polilíneas de un punto)
+            line.symbol = makeMarker('FilledCircle', size=4)
+    drawing.add(chart)
+
+    legend = Legend()
+    legend.x, legend.y = 50, CHART_HEIGHT - 15
+    legend.alignment = 'right'
+    legend.columnMaximum = 1
+    legend.fontSize = 8
+    legend.colorNamePairs = [(SERIES_COLORS[color], name) for name, color, _ in series]
+    drawing.add(legend)
+    if not labels:
+        drawing.add(String(CHART_WIDTH / 2, CHART_HEIGHT / 2, 'Sin lecturas',
+                           textAnchor='middle', fontSize=12, fillColor=colors.grey))
+    return drawing
+
+
+def bar_chart(labels, values, name, color):
+    drawing = Drawing(CHART_WIDTH, CHART_HEIGHT)
+    chart = VerticalBarChart()
+    chart.x, chart.y = 50, 70
+    chart.width, chart.height = CHART_WIDTH - 80, CHART_HEIGHT - 100
+    chart.data = [values or [0]]
+    chart.categoryAxis.categoryNames = labels or ['']
+    chart.categoryAxis.labels.angle = 30
+    chart.categoryAxis.labels.boxAnchor = 'ne'
+    chart.categoryAxis.labels.fontSize = 8
+    chart.valueAxis.valueMin = 0
+    chart.valueAxis.visibleGrid = 1
+    chart.valueAxis.gridStrokeColor = colors.lightgrey
+    chart.bars[0].fillColor = SERIES_COLORS[color]
+    chart.bars[0].strokeColor = None
+    drawing.add(chart)
+    drawing.add(String(50, CHART_HEIGHT - 15, name, fontSize=8))
+    return drawing
+
+
+def _number(value, digits=1):
+    return '—' if value is None else f'{float(value):.{digits}f}'
+
+
+def _table(rows, last_numeric=-2):
+    table = Table(rows, repeatRows=1)
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2c3e50')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 9),
+        ('GRID', (0, 0), (-1, -1), 0.25, colors.grey),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f4f6f7')]),
+        ('ALIGN', (1, 1), (last_numeric, -1), 'RIGHT'),
+    ]))
+    return table
+
+
+def render_statistics_pdf(user, total_readings, unit_stats, chart, materials, percentiles):
+    """PDF del informe de estadísticas.
+
+    `unit_stats`, `chart` y `percentiles` tienen la forma que usa la vista de
+    estadísticas; `materials` es (nombres, relaciones C/N).
+    """
+    styles = getSampleStyleSheet()
+    buffer = BytesIO()
+    document = SimpleDocTemplate(
+        buffer, pagesize=landscape(letter), title='Estadísticas de Compostaje',
+        leftMargin=1.5 * cm, rightMargin=1.5 * cm, topMargin=1.5 * cm, bottomMargin=1.5 * cm,
+    )
+    story = [
+        Paragraph('Estadísticas de Compostaje', styles['Title']),
+        Paragraph(
+            f'{user.get_username()} — {timezone.localtime():%d/%m/%Y %H:%M} — '
+            f'{total_readings} lecturas en {len(unit_stats)} unidades con datos',
+            styles['Normal'],
+        ),
+        Spacer(1, 0.5 * cm),
+    ]
+
+    rows = [['Unidad', 'Lecturas', 'Temp. media (°C)', 'pH medio', 'Humedad media (%)',
+             'Oxígeno medio (%)', 'Última lectura']]
+    for stat in unit_stats:
+        latest = stat['latest']
+        rows.append([
+            stat['unit'].name, stat['count'], _number(stat['avg_temp']), _number(stat['avg_ph'], 2),
+            _number(stat['avg_humidity']), _number(stat['avg_oxygen']),
+            timezone.localtime(latest.timestamp).strftime('%d/%m/%Y %H:%M') if latest else '—',
+        ])
+    story.append(_table(rows))
+
+    story += [
+        Spacer(1, 0.5 * cm),
+        Paragraph(
+            f'Percentiles de la flota del {percentiles["start"]:%d/%m/%Y} al '
+            f'{percentiles["end"]:%d/%m/%Y} (aproximados)', styles['Heading3'],
+        ),
+    ]
+    rows = [['Métrica', 'Lecturas', 'Mínimo', *(f'p{q}' for q in QUANTILES), 'Máximo']]
+    for row in percentiles['rows']:
+        digits = 2 if row['metric'] == 'ph' else 1
+        rows.append([
+            f'{row["label"]} ({row["unit"]})' if row['unit'] else row['label'], row['count'],
+            _number(row['min'], digits), *(_number(row[f'p{q}'], digits) for q in QUANTILES),
+            _number(row['max'], digits),
+        ])
+    story.append(_table(rows, last_numeric=-1))
+
+    labels = chart['labels']
+    pages = (
+        ('Temperatura vs Tiempo (Últimas 100 lecturas)',
+         line_chart(labels, [('Temperatura (°C)', 'temperature', chart['temperature'])])),
+        ('pH vs Tiempo',
+         line_chart(labels, [('pH', 'ph', chart['ph'])], value_min=0, value_max=14)),
+        ('Humedad y Oxígeno',
+         line_chart(labels, [('Humedad (%)', 'humidity', chart['humidity']),
+                             ('Oxígeno (%)', 'oxygen', chart['oxygen'])],
+                    value_min=0, value_max=100)),
+        ('Materiales Recomendados y su Relación C/N',
+         bar_chart(materials[0], materials[1], 'Relación C/N', 'materials')),
+    )
+    for title, drawing in pages:
+        story += [PageBreak(), Paragraph(title, styles['Heading2']), Spacer(1, 0.3 * cm), drawing]
+
+    document.build(story)
+    return buffer.getvalue()
+
+
+def readings_rows(readings, step=None, agg='mean', fill='none'):
+    """Filas (fecha, temperatura, humedad, pH, oxígeno) para exportar.
+
+    Con `step` la serie se remuestrea con `agg`/`fill`; sin él se recorren las
+    lecturas una a una. Lanza ValueError con parámetros inválidos.
+    """
+    if step:
+        seconds = parse_step(step)
+        if agg not in AGGREGATIONS or fill not in FILLS:
+            raise ValueError('agregación o relleno inválido')
+        labels, columns = to_lists(
+            *resample(*load_columns(readings), seconds, agg=agg, fill=fill),
+            label_format='%Y-%m-%d %H:%M:%S',
+        )
+        by_metric = dict(zip(METRICS, columns))
+        return zip(labels, by_metric['temperature'], by_metric['humidity'],
+                   by_metric['ph'], by_metric['oxygen'])
+    # Tuplas en lugar de instancias del modelo: la exportación solo necesita los valores
+    return (
+        (ts.strftime('%Y-%m-%d %H:%M:%S'), temperature, humidity, ph, oxygen)
+        for ts, temperature, humidity, ph, oxygen in readings.values_list(
+            'timestamp', 'temperature', 'humidity', 'ph', 'oxygen'
+        ).iterator(chunk_size=2000)
+    )
+
+
+def write_readings_pdf(output, unit, rows, progress=None):
+    """Tabla de lecturas de una unidad en PDF escrita sobre `output`.
+
+    `progress`, si se pasa, recibe cada tanto la cantidad de filas escritas.
+    """
+    # Crear el objeto PDF
+    p = canvas.Canvas(output, pagesize=letter)
+    width, height = letter
+
+    # Título
+    p.setFont("Helvetica-Bold", 16)
+    p.drawString(72, height - 72, f"Registros de sensores - Unidad: {unit.name}")
+
+    # Encabezados de tabla
+    p.setFont("Helvetica-Bold", 12)
+    y = height - 100
+    p.drawString(72, y, "Fecha y hora")
+    p.drawString(180, y, "Temperatura (°C)")
+    p.drawString(320, y, "Humedad (%)")
+    p.drawString(420, y, "pH")
+    p.drawString(470, y, "Oxígeno (%)")
+
+    # Contenido
+    p.setFont("Helvetica", 10)
+    y -= 20
+    line_height = 15
+    max_lines_per_page = 40
+    lines_written = 0
+
+    for index, (label, temperature, humidity, ph, oxygen) in enumerate(rows):
+        if progress and index % 1000 == 0:
+            progress(index)
+        if y < 72:  # Nueva página si llegamos al final
+            p.showPage()
+            y = height - 72
+            lines_written = 0
+            # Repetir encabezados en nueva página
+            p.setFont("Helvetica-Bold", 12)
+            p.drawString(72, y, "Fecha y hora")
+            p.drawString(180, y, "Temperatura (°C)")
+            p.drawString(320, y, "Humedad (%)")
+            p.drawString(420, y, "pH")
+            p.drawString(470, y, "Oxígeno (%)")
+            p.setFont("Helvetica", 10)
+            y -= 20
+
+        p.drawString(72, y, label)
+        p.drawString(180, y, str(temperature if temperature is not None else '-'))
+        p.drawString(320, y, str(humidity if humidity is not None else '-'))
+        p.drawString(420, y, str(ph if ph is not None else '-'))
+        p.drawString(470, y, str(oxygen if oxygen is not None else '-'))
+
+        y -= line_height
+        lines_written += 1
+
+    p.showPage()
+    p.save()
@@ -0,0 +1,184 @@
+# authentication/routers.py
+"""Enrutado de lecturas analíticas hacia la réplica de solo lectura.
+
+La réplica ('replica' en DATABASES) es una copia de la base principal que se
+refresca periódicamente con la API de backup de SQLite (comando
+`snapshot_replica`). Solo las vistas que lo piden explícitamente leen de ella,
+y nunca si la copia supera REPLICA_MAX_STALENESS o si el usuario acaba de
+escribir datos que la copia todavía no contiene.
+"""
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+
+REPLICA_ALIAS = 'replica'
+PRIMARY_PIN_COOKIE = 'primary_pin'
+
+_state = threading.local()
+_freshness = {'checked_at': 0.0, 'snapshot_at': None}
+
+
+def get_max_staleness():
+    return getattr(settings, 'REPLICA_MAX_STALENESS', 300)
+
+
+def replica_path():
+    config = settings.DATABASES.get(REPLICA_ALIAS)
+    return str(config['NAME']) if config else None
+
+
+def snapshot_time():
+    """Momento (epoch) al que corresponden los datos de la réplica, o None"""
+    now = time.time()
+    # Evita un stat() por consulta: se revisa como mucho una vez por segundo
+    if now - _freshness['checked_at'] >= 1.0:
+        path = replica_path()
+        try:
+            _freshness['snapshot_at'] = os.stat(path).st_mtime if path else None
+        except OSError:
+            _freshness['snapshot_at'] = None
+        _freshness['checked_at'] = now
+    return _freshness['snapshot_at']
+
+
+def replica_is_fresh():
+    taken_at = snapshot_time()
+    return taken_at is not None and time.time() - taken_at <= get_max_staleness()
+
+
+def take_snapshot():
+    """Copia en caliente la base principal sobre la réplica.
+
+    La copia se escribe en un archivo temporal y luego se reemplaza de forma
+    atómica, así las lecturas en curso nunca ven una réplica a medio copiar.
+    La fecha de modificación del archivo queda fijada al inicio de la copia,
+    que es el instante al que corresponden sus datos.
+    """
+    source_path = str(settings.DATABASES['default']['NAME'])
+    target_path = replica_path()
+    if not target_path:
+        raise RuntimeError("No hay una base de datos 'replica' configurada.")
+
+    tmp_path = f'{target_path}.tmp-{os.getpid()}'
+    started_at = time.time()
+    source = sqlite3.connect(source_path, timeout=30)
+    target = sqlite3.connect(tmp_path)
+    try:
+        # Un solo paso: en modo WAL la lectura no bloquea a los escritores y
+        # evita que la copia se reinicie por escrituras concurrentes.
+        source.backup(target)
+        target.execute('PRAGMA journal_mode=DELETE')
+    finally:
+        target.close()
+        source.close()
+    os.utime(tmp_path, (started_at, started_at))
+    os.replace(tmp_path, target_path)
+    _freshness['checked_at'] = 0.0
+    return started_at
+
+
+def _get(name, default=None):
+    return getattr(_state, name, default)
+
+
+def note_write():
+    """Marca que la petición actual escribió (p. ej. desde otro hilo)"""
+    _state.wrote = True
+
+
+@contextmanager
+def _reads(use_replica):
+    previous = _get('use_replica')
+    _state.use_replica = use_replica
+    try:
+        yield
+    finally:
+        _state.use_replica = previous
+
+
+def replica_reads():
+    """Contexto en el que las lecturas pueden ir a la réplica"""
+    return _reads(True)
+
+
+def primary_reads():
+    """Contexto en el que las lecturas van siempre a la base principal"""
+    return _reads(False)
+
+
+def use_replica(view_func):
+    """Decorador: la vista (solo lectura) lee de la réplica si está al día"""
+    @wraps(view_func)
+    def wrapper(*args, **kwargs):
+        with replica_reads():
+            return view_func(*args, **kwargs)
+    return wrapper
+
+
+def use_primary(view_func):
+    """Decorador: la vista lee siempre de la base principal"""
+    @wraps(view_func)
+    def wrapper(*args, **kwargs):
+        with primary_reads():
+            return view_func(*args, **kwargs)
+    return wrapper
+
+
+class ReplicaRouter:
+    """Envía lecturas a la réplica solo cuando la vista lo permite"""
+
+    def db_for_read(self, model, **hints):
+        if not _get('use_replica') or _get('wrote') or _get('pinned'):
+            return None
+        if REPLICA_ALIAS in settings.DATABASES and replica_is_fresh():
+            return REPLICA_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        # A partir de aquí las lecturas de esta petición van a la principal
+        _state.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # La réplica contiene los mismos datos que la principal
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # La réplica se obtiene copiando la principal, nunca se migra
+        return db != REPLICA_ALIAS
+
+
+class ReplicaRoutingMiddleware:
+    """Reinicia el estado de enrutado por petición y fija a la principal a
+    quien acaba de escribir, durante el tiempo máximo de desfase de la réplica
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _state.use_replica = None
+        _state.wrote = False
+        try:
+            pinned_until = float(request.COOKIES.get(PRIMARY_PIN_COOKIE, 0))
+        except ValueError:
+            pinned_until = 0
+        _state.pinned = pinned_until > time.time()
+
+        response = self.get_response(request)
+
+        if _state.wrote:
+            max_age = int(get_max_staleness())
+            response.set_cookie(
+                PRIMARY_PIN_COOKIE, str(time.time() + max_age),
+                max_age=max_age, httponly=True, samesite='Lax',
+            )
+        _state.use_replica = None
+        _state.wrote = False
+        _state.pinned = False
+        return response
@@ -0,0 +1,185 @@
+# authentication/search.py
+"""Búsqueda de texto completo con SQLite FTS5.
+
+Cada tabla con texto tiene un índice FTS5 de "contenido externo": el índice
+guarda solo los términos y apunta por rowid a la fila original, así que el
+texto no se duplica. Los triggers de la base lo mantienen al día en cada
+INSERT, UPDATE o DELETE, también en bulk_create, update() y los borrados
+directos de la purga, que no envían señales.
+
+Las unidades tienen clave UUID: su índice usa el rowid implícito de la
+tabla. Un VACUUM puede renumerar esos rowid; después de uno conviene correr
+`rebuild_search_index`.
+
+En otros motores no hay índice: `search` devuelve una lista vacía y el
+admin vuelve a la búsqueda normal de Django.
+"""
+import re
+import uuid
+
+from django.db import connections
+
+# tipo: tabla de origen, columnas indexadas, columna clave y peso de cada columna
+INDEXES = {
+    'unit': {'table': 'authentication_compostunit', 'columns': ('name', 'description', 'location'),
+             'key': 'rowid', 'weights': (10.0, 1.0, 3.0)},
+    'material': {'table': 'authentication_compostmaterial', 'columns': ('name', 'description'),
+                 'key': 'id', 'weights': (10.0, 1.0)},
+    'log': {'table': 'authentication_monitoringlog', 'columns': ('notes',),
+            'key': 'id', 'weights': (1.0,)},
+    'entry': {'table': 'authentication_compostentry', 'columns': ('notes',),
+              'key': 'id', 'weights': (1.0,)},
+    'harvest': {'table': 'authentication_compostharvest', 'columns': ('notes',),
+                'key': 'id', 'weights': (1.0,)},
+}
+KINDS = tuple(INDEXES)
+# Tildes fuera: "compostaje aeróbico" encuentra "aerobico"; prefijos cortos indexados
+TOKENIZE = "unicode61 remove_diacritics 2"
+PREFIXES = '2 3'
+SEARCH_LIMIT = 20
+MAX_TERMS = 8
+
+_TERM = re.compile(r'\w+', re.UNICODE)
+
+
+def index_table(kind):
+    return f'search_{kind}'
+
+
+def index_sql(kind):
+    """Sentencias que crean el índice de `kind` y sus triggers"""
+    spec = INDEXES[kind]
+    fts, table, key = index_table(kind), spec['table'], spec['key']
+    columns = ', '.join(spec['columns'])
+    new = ', '.join(f'new.{column}' for column in spec['columns'])
+    old = ', '.join(f'old.{column}' for column in spec['columns'])
+    delete = f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.{key}, {old});"
+    insert = f"INSERT INTO {fts}(rowid, {columns}) VALUES (new.{key}, {new});"
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({columns}, content='{table}', "
+        f"content_rowid='{key}', tokenize='{TOKENIZE}', prefix='{PREFIXES}')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN {insert} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN {delete} END",
+        # Solo si cambian las columnas indexadas: los contadores de la unidad no reindexan
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {columns} ON {table} "
+        f"BEGIN {delete} {insert} END",
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+def drop_sql(kind):
+    fts = index_table(kind)
+    return [f'DROP TRIGGER IF EXISTS {fts}_{suffix}' for suffix in ('ai', 'ad', 'au')] + [
+        f'DROP TABLE IF EXISTS {fts}'
+    ]
+
+
+def available(using='default'):
+    return connections[using].vendor == 'sqlite'
+
+
+def create_indexes(using='default'):
+    """Crea (si faltan) y llena los índices; no hace nada fuera de SQLite"""
+    if not available(using):
+        return False
+    with connections[using].cursor() as cursor:
+        for kind in KINDS:
+            for statement in index_sql(kind):
+                cursor.execute(statement)
+    return True
+
+
+def drop_indexes(using='default'):
+    if not available(using):
+        return
+    with connections[using].cursor() as cursor:
+        for kind in KINDS:
+            for statement in drop_sql(kind):
+                cursor.execute(statement)
+
+
+def rebuild_indexes(kinds=KINDS, using='default'):
+    """Vuelve a leer las tablas de origen (p. ej. después de un VACUUM)"""
+    with connections[using].cursor() as cursor:
+        for kind in kinds:
+            fts = index_table(kind)
+            cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+            cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('optimize')")
+
+
+def match_expression(text):
+    """Consulta FTS5 segura a partir del texto del usuario.
+
+    Cada palabra se cita (los operadores de FTS5 no se interpretan) y se
+    busca como prefijo; todas deben aparecer. None si no hay palabras.
+    """
+    terms = _TERM.findall(text or '')[:MAX_TERMS]
+    if not terms:
+        return None
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def key_subquery(kind, expression):
+    """(sql, params) con las claves primarias de `kind` que coinciden con la consulta"""
+    spec = INDEXES[kind]
+    fts = index_table(kind)
+    matches = f'SELECT rowid FROM {fts} WHERE {fts} MATCH %s'
+    if spec['key'] == 'id':
+        return matches, (expression,)
+    # Unidades: del rowid implícito al UUID
+    return f'SELECT id FROM {spec["table"]} WHERE rowid IN ({matches})', (expression,)
+
+
+def _unit_filter(alias, user):
+    sql = f' AND {alias}.deleted_at IS NULL'
+    if user is None:
+        return sql, ()
+    return sql + f' AND {alias}.owner_id = %s', (user.pk,)
+
+
+def _kind_query(kind, expression, user, limit):
+    spec = INDEXES[kind]
+    fts = index_table(kind)
+    weights = ', '.join(str(weight) for weight in spec['weights'])
+    # snippet(-1) elige la columna con más coincidencias
+    columns = f"snippet({fts}, -1, '«', '»', '…', 12), bm25({fts}, {weights})"
+    if kind == 'unit':
+        where, params = _unit_filter('u', user)
+        sql = (f'SELECT u.id, u.id, u.name, {columns} FROM {fts} '
+               f'JOIN {spec["table"]} u ON u.rowid = {fts}.rowid '
+               f'WHERE {fts} MATCH %s{where}')
+    elif kind == 'material':
+        sql, params = (f'SELECT m.id, NULL, m.name, {columns} FROM {fts} '
+                       f'JOIN {spec["table"]} m ON m.id = {fts}.rowid WHERE {fts} MATCH %s'), ()
+    else:
+        where, params = _unit_filter('u', user)
+        sql = (f'SELECT t.id, u.id, u.name, {columns} FROM {fts} '
+               f'JOIN {spec["table"]} t ON t.id = {fts}.rowid '
+               f'JOIN authentication_compostunit u ON u.id = t.compost_unit_id '
+               f'WHERE {fts} MATCH %s{where}')
+    return sql + ' ORDER BY 5 LIMIT %s', (expression, *params, limit)
+
+
+def search(query, kinds=KINDS, user=None, limit=SEARCH_LIMIT, using='default'):
+    """Resultados ordenados por relevancia (BM25) en los tipos pedidos.
+
+    Con `user`, solo unidades propias y notas de sus unidades (los materiales
+    son un catálogo común). Cada resultado es un dict con kind, id, unit_id,
+    title, snippet y score (menor es más relevante).
+    """
+    expression = match_expression(query)
+    if expression is None or not available(using):
+        return []
+    results = []
+    with connections[using].cursor() as cursor:
+        for kind in kinds:
+            cursor.execute(*_kind_query(kind, expression, user, limit))
+            for pk, unit_id, title, snippet, score in cursor.fetchall():
+                # SQLite guarda los UUID como texto hexadecimal
+                unit_id = uuid.UUID(unit_id) if unit_id else None
+                if kind == 'unit':
+                    pk = unit_id
+                results.append({'kind': kind, 'id': pk, 'unit_id': unit_id, 'title': title,
+                                'snippet': snippet, 'score': score})
+    results.sort(key=lambda result: result['score'])
+    return results[:limit]
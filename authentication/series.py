@@ -0,0 +1,331 @@
+# authentication/series.py
+"""Remuestreo de series de lecturas a una grilla regular.
+
+Las lecturas llegan a intervalos irregulares y con métricas faltantes. Aquí
+se cargan como arreglos columnares de NumPy (timestamps en segundos y una
+columna float por métrica, NaN donde falta el dato) y se agregan por
+intervalos fijos sin bucles de Python por lectura.
+
+`read_columns` lee esas columnas con un cursor crudo y por bloques: en
+SQLite la conversión de fechas y decimales la hace la propia consulta, así
+que no se crean instancias del modelo, ni datetime, ni Decimal por lectura.
+"""
+import warnings
+from datetime import datetime
+
+import numpy as np
+from django.core.exceptions import EmptyResultSet
+from django.db import connections
+from django.utils import timezone
+
+from .ingest import METRICS
+
+STEPS = {
+    '1m': 60, '5m': 300, '15m': 900, '30m': 1800,
+    '1h': 3600, '6h': 21600, '12h': 43200, '1d': 86400,
+}
+AGGREGATIONS = ('mean', 'last', 'min', 'max')
+FILLS = ('none', 'ffill', 'linear')
+
+# Evita grillas gigantes por un intervalo demasiado fino
+MAX_BUCKETS = 100000
+# Ventana máxima de las vistas de series (5 años)
+MAX_HOURS = 5 * 366 * 24
+
+
+def parse_step(value):
+    """Intervalo en segundos a partir de '5m', '1h', '1d' o un número de segundos"""
+    if value in STEPS:
+        return STEPS[value]
+    units = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+    text = str(value).strip().lower()
+    try:
+        if text and text[-1] in units:
+            seconds = int(text[:-1]) * units[text[-1]]
+        else:
+            seconds = int(text)
+    except ValueError:
+        raise ValueError(f'intervalo inválido: {value!r}')
+    if seconds <= 0:
+        raise ValueError('el intervalo debe ser positivo')
+    if seconds > MAX_HOURS * 3600:
+        raise ValueError(f'el intervalo no puede superar {MAX_HOURS} horas')
+    return seconds
+
+
+def parse_hours(value):
+    """Ventana en horas, mayor que 0 y hasta MAX_HOURS (rechaza inf y nan)"""
+    try:
+        hours = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'horas inválidas: {value!r}')
+    if not 0 < hours <= MAX_HOURS:
+        raise ValueError(f'las horas deben estar entre 0 y {MAX_HOURS}')
+    return hours
+
+
+def auto_step(span, max_points=200):
+    """El menor intervalo de STEPS que cubre `span` segundos con a lo sumo `max_points` puntos"""
+    for seconds in sorted(STEPS.values()):
+        if span / seconds <= max_points:
+            return seconds
+    return max(STEPS.values())
+
+
+# Filas por fetchmany al leer columnas con el cursor
+CHUNK_SIZE = 10000
+
+
+def _epoch_sql(connection):
+    """Segundos Unix de la columna "timestamp" (texto UTC en SQLite)"""
+    # unixepoch() (SQLite 3.38+) no pasa por el texto de strftime: ~20 % menos por lectura
+    if connection.Database.sqlite_version_info >= (3, 38):
+        return 'unixepoch("timestamp")'
+    return 'CAST(strftime(\'%%s\', "timestamp") AS INTEGER)'
+
+
+def _raw_chunks(queryset, select, params=()):
+    """Bloques float64 de `select` (expresiones SQL sobre las columnas de `queryset`).
+
+    La consulta del queryset (filtros, orden y límites incluidos) queda como
+    subconsulta; los NULL llegan como None y NumPy los convierte en NaN.
+    """
+    try:
+        inner, inner_params = queryset.query.get_compiler(queryset.db).as_sql()
+    except EmptyResultSet:
+        return
+    # Con parámetros el cursor de Django interpreta los %; los literales van escapados
+    sql = f'SELECT {", ".join(select)} FROM ({inner}) AS r'
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(sql, (*params, *inner_params))
+        while True:
+            rows = cursor.fetchmany(CHUNK_SIZE)
+            if not rows:
+                break
+            yield np.array(rows, dtype=np.float64).reshape(len(rows), len(select))
+
+
+def _orm_chunks(queryset, convert):
+    """Lo mismo que _raw_chunks para otros motores: `convert` pasa cada fila a números"""
+    rows = []
+    for row in queryset.iterator(chunk_size=CHUNK_SIZE):
+        rows.append(convert(row))
+        if len(rows) == CHUNK_SIZE:
+            yield np.array(rows, dtype=np.float64)
+            rows = []
+    if rows:
+        yield np.array(rows, dtype=np.float64)
+
+
+def read_columns(readings, metrics=METRICS):
+    """(timestamps, valores) de un queryset de SensorReading sin instanciar modelos.
+
+    `timestamps` es int64 (segundos Unix) y `valores` una matriz float32
+    (n, len(metrics)) con NaN en las métricas nulas, en el orden del queryset.
+    """
+    queryset = readings.values_list('timestamp', *metrics)
+    connection = connections[readings.db]
+    if connection.vendor == 'sqlite':
+        # SQLite guarda las fechas como texto UTC y los decimales como números
+        select = [_epoch_sql(connection)]
+        select += [f'CAST("{metric}" AS REAL)' for metric in metrics]
+        chunks = _raw_chunks(queryset, select)
+    else:
+        chunks = _orm_chunks(queryset, lambda row: (row[0].timestamp(), *row[1:]))
+    # Con el total por adelantado cada bloque se copia directo al resultado: la
+    # memoria máxima es el resultado más un bloque, no el doble al concatenar
+    size = readings.count()
+    ts = np.empty(size, dtype=np.int64)
+    values = np.empty((size, len(metrics)), dtype=np.float32)
+    filled, extra = 0, []
+    for chunk in chunks:
+        take = min(len(chunk), size - filled)
+        ts[filled:filled + take] = chunk[:take, 0]
+        values[filled:filled + take] = chunk[:take, 1:]
+        filled += take
+        if take < len(chunk):
+            # Lecturas insertadas entre el COUNT y la consulta
+            extra.append(chunk[take:])
+    if extra:
+        rest = np.concatenate(extra)
+        return (np.concatenate([ts, rest[:, 0].astype(np.int64)]),
+                np.concatenate([values, rest[:, 1:].astype(np.float32)]))
+    return ts[:filled], values[:filled]
+
+
+def unit_columns(unit_id, start=None, end=None, metrics=METRICS):
+    """Columnas de una unidad entre `start` y `end` (datetime, inclusive), en orden cronológico"""
+    from .models import SensorReading
+
+    readings = SensorReading.objects.filter(compost_unit_id=unit_id)
+    if start is not None:
+        readings = readings.filter(timestamp__gte=start)
+    if end is not None:
+        readings = readings.filter(timestamp__lte=end)
+    return read_columns(readings.order_by('timestamp'), metrics)
+
+
+def load_columns(readings, metrics=METRICS):
+    """(timestamps, valores) de un queryset de SensorReading, en orden cronológico.
+
+    `timestamps` es un arreglo float64 de segundos Unix y `valores` una
+    matriz float32 (n, len(metrics)) con NaN en las métricas nulas.
+    """
+    ts, values = read_columns(readings, metrics)
+    ts = ts.astype(np.float64)
+    if len(ts) > 1 and not (ts[1:] >= ts[:-1]).all():
+        order = np.argsort(ts, kind='stable')
+        ts, values = ts[order], values[order]
+    return ts, values
+
+
+def load_unit_columns(readings, metric, unit_ids):
+    """(códigos, timestamps, valores) de una métrica para varias unidades en una consulta.
+
+    `códigos` es la posición de la unidad de cada lectura en `unit_ids`.
+    """
+    if not unit_ids:
+        return np.zeros(0, np.int64), np.zeros(0), np.zeros(0, np.float32)
+    readings = readings.filter(compost_unit__in=unit_ids).order_by()
+    queryset = readings.values_list('compost_unit_id', 'timestamp', metric)
+    connection = connections[readings.db]
+    if connection.vendor == 'sqlite':
+        # El código de unidad se resuelve en la consulta (los UUID se guardan como hex)
+        cases = ' '.join(f'WHEN %s THEN {code}' for code in range(len(unit_ids)))
+        select = [
+            f'CASE "compost_unit_id" {cases} END',
+            _epoch_sql(connection),
+            f'CAST("{metric}" AS REAL)',
+        ]
+        chunks = list(_raw_chunks(queryset, select, [unit_id.hex for unit_id in unit_ids]))
+    else:
+        codes = {unit_id: code for code, unit_id in enumerate(unit_ids)}
+        chunks = list(_orm_chunks(
+            queryset, lambda row: (codes[row[0]], row[1].timestamp(), row[2])
+        ))
+    if not chunks:
+        return np.zeros(0, np.int64), np.zeros(0), np.zeros(0, np.float32)
+    matrix = np.concatenate(chunks)
+    return (matrix[:, 0].astype(np.int64), matrix[:, 1],
+            matrix[:, 2].astype(np.float32))
+
+
+def fleet_bands(matrix, percentiles=(10, 25, 50, 75, 90)):
+    """Media y percentiles por intervalo entre las filas de `matrix` (ignora NaN)"""
+    with warnings.catch_warnings():
+        # Intervalos sin datos en ninguna unidad: el resultado es NaN
+        warnings.simplefilter('ignore', RuntimeWarning)
+        mean = np.nanmean(matrix, axis=0) if len(matrix) else np.zeros(0)
+        bands = (np.nanpercentile(matrix, percentiles, axis=0)
+                 if len(matrix) else np.zeros((len(percentiles), 0)))
+    return mean, dict(zip(percentiles, bands))
+
+
+def nan_to_none(values, digits=2):
+    return [None if v != v else round(v, digits) for v in np.asarray(values).tolist()]
+
+
+def _grid(ts, step, start, end):
+    if start is None:
+        start = np.floor(ts.min() / step) * step if len(ts) else 0
+    if end is None:
+        end = ts.max() if len(ts) else start
+    buckets = int((end - start) // step) + 1
+    if buckets > MAX_BUCKETS:
+        raise ValueError('el intervalo es demasiado fino para el rango pedido')
+    return start + step * np.arange(buckets, dtype=np.float64)
+
+
+def _aggregate(groups, n_groups, bins, data, order, buckets, agg):
+    """Matriz (n_groups, buckets) con `data` agregado por (grupo, intervalo).
+
+    `order` da la posición cronológica de cada dato (para `last`); los datos
+    ya vienen sin NaN y con intervalos dentro de la grilla.
+    """
+    cells = groups * buckets + bins
+    size = n_groups * buckets
+    if agg == 'mean':
+        counts = np.bincount(cells, minlength=size)
+        sums = np.bincount(cells, weights=data, minlength=size)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            flat = np.where(counts > 0, sums / counts, np.nan)
+    elif agg == 'last':
+        last = np.full(size, -1, dtype=np.int64)
+        np.maximum.at(last, cells, order)
+        latest = np.full(order.max() + 1 if len(order) else 0, np.nan)
+        latest[order] = data
+        flat = np.where(last >= 0, latest[last], np.nan)
+    else:
+        reduce, empty = (np.minimum, np.inf) if agg == 'min' else (np.maximum, -np.inf)
+        flat = np.full(size, empty)
+        reduce.at(flat, cells, data)
+        flat[flat == empty] = np.nan
+    return flat.reshape(n_groups, buckets)
+
+
+def _fill(matrix, fill):
+    """Rellena huecos a lo largo de cada fila de `matrix`"""
+    if fill == 'ffill':
+        columns = np.arange(matrix.shape[1])
+        source = np.where(~np.isnan(matrix), columns, -1)
+        np.maximum.accumulate(source, axis=1, out=source)
+        filled = np.take_along_axis(matrix, np.maximum(source, 0), axis=1)
+        return np.where(source >= 0, filled, np.nan)
+    if fill == 'linear':
+        x = np.arange(matrix.shape[1])
+        matrix = matrix.copy()
+        for row in matrix:
+            known = ~np.isnan(row)
+            if known.sum() < 2:
+                continue
+            inside = (x >= x[known][0]) & (x <= x[known][-1])
+            row[inside] = np.interp(x[inside], x[known], row[known])
+    return matrix
+
+
+def resample_groups(groups, n_groups, ts, data, step, agg='mean', fill='none',
+                    start=None, end=None):
+    """Remuestrea una métrica de varias series (p. ej. unidades) sobre una grilla común.
+
+    `groups` es el código 0..n_groups-1 de la serie de cada dato. Devuelve
+    (grilla, matriz) con una fila por serie y una columna por intervalo.
+    """
+    if agg not in AGGREGATIONS:
+        raise ValueError(f'agregación inválida: {agg!r}')
+    if fill not in FILLS:
+        raise ValueError(f'relleno inválido: {fill!r}')
+    grid = _grid(ts, step, start, end)
+    buckets = len(grid)
+    bins = ((ts - grid[0]) // step).astype(np.int64) if len(ts) else np.zeros(0, np.int64)
+    keep = (bins >= 0) & (bins < buckets) & ~np.isnan(data)
+    order = np.argsort(ts, kind='stable').argsort()
+    matrix = _aggregate(groups[keep], n_groups, bins[keep], data[keep], order[keep],
+                        buckets, agg)
+    return grid, _fill(matrix, fill)
+
+
+def resample(ts, values, step, agg='mean', fill='none', start=None, end=None):
+    """Agrega `values` en intervalos de `step` segundos.
+
+    Devuelve (grilla, matriz): `grilla` son los inicios de cada intervalo y
+    `matriz` tiene una fila por intervalo (NaN si no hubo datos y el
+    relleno no lo cubre). `agg` es mean, last, min o max; `fill` es none,
+    ffill (último valor conocido) o linear (interpolación entre vecinos).
+    """
+    n, columns = values.shape
+    # Cada métrica es una serie: se aplanan a (métrica, timestamp, valor)
+    groups = np.tile(np.arange(columns), n)
+    grid, matrix = resample_groups(groups, columns, np.repeat(ts, columns), values.ravel(),
+                                   step, agg=agg, fill=fill, start=start, end=end)
+    return grid, matrix.T
+
+
+def to_lists(grid, out, label_format='%d/%m %H:%M'):
+    """Etiquetas en la zona horaria activa y columnas como listas (None en lugar de NaN)"""
+    tz = timezone.get_current_timezone()
+    labels = [datetime.fromtimestamp(t, tz=tz).strftime(label_format) for t in grid.tolist()]
+    columns = [
+        [None if np.isnan(v) else round(v, 2) for v in out[:, column].tolist()]
+        for column in range(out.shape[1])
+    ]
+    return labels, columns
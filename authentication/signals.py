@@ -1,9 +1,192 @@
-from django.db.models.signals import post_save
+import os
+
+from django.db import connections, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_save
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import UserProfile
+from django.utils import timezone
+from .apikeys import key_cache
+from .balance import apply_entry, rebuild_balances
+from .catalog import bump_version
+from .geo import apply_unit
+from .inventory import apply_load, reconcile_loads
+from .models import (
+    CompostEntry, CompostHarvest, CompostMaterial, CompostUnit, DeviceKey, SensorReading,
+    UserProfile,
+)
+from .routers import replica_path, take_snapshot
+from .sketches import apply_readings
+from .sparklines import apply_readings as apply_sparklines
+from .yields import apply_harvest, apply_input, rebuild_yield_summaries
 
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
     if created:
         UserProfile.objects.create(user=instance)
+
+
+@receiver(post_save, sender=SensorReading)
+def count_sensor_reading(sender, instance, created, **kwargs):
+    if created and instance.compost_unit_id:
+        CompostUnit.objects.filter(pk=instance.compost_unit_id).update(
+            reading_count=F('reading_count') + 1
+        )
+        row = (instance.compost_unit_id, instance.timestamp, instance.temperature,
+               instance.ph, instance.humidity, instance.oxygen)
+        apply_readings([row])
+        apply_sparklines([row])
+    elif instance.compost_unit_id:
+        # Lectura editada: cambia la huella de las unidades (reports.units_version)
+        CompostUnit.objects.filter(pk=instance.compost_unit_id).update(updated_at=timezone.now())
+
+
+@receiver(post_delete, sender=SensorReading)
+def uncount_sensor_reading(sender, instance, **kwargs):
+    # Los t-digest y minigráficos no admiten restas: ver rebuild_sketches/rebuild_sparklines
+    if instance.compost_unit_id:
+        CompostUnit.objects.filter(pk=instance.compost_unit_id, reading_count__gt=0).update(
+            reading_count=F('reading_count') - 1, updated_at=timezone.now()
+        )
+
+
+def _is_test_database(using):
+    # Al crear la base de pruebas su NAME pasa a ser el nombre de prueba
+    connection = connections[using]
+    return connection.settings_dict['NAME'] == connection.creation._get_test_db_name()
+
+
+@receiver(post_migrate)
+def refresh_replica_after_migrate(sender, using='default', **kwargs):
+    # Una réplica con el esquema anterior rompería las vistas analíticas.
+    # La base de pruebas nunca debe copiarse sobre la réplica real.
+    if sender.name == 'authentication' and using == 'default' and not _is_test_database(using):
+        path = replica_path()
+        if path and os.path.exists(path):
+            take_snapshot()
+
+
+@receiver(post_save, sender=DeviceKey)
+@receiver(post_delete, sender=DeviceKey)
+def invalidate_device_keys(sender, **kwargs):
+    # Efecto inmediato en este proceso; los demás lo ven al expirar el TTL
+    key_cache.clear()
+
+
+@receiver(post_save, sender=User)
+def invalidate_keys_of_inactive_user(sender, instance, created, **kwargs):
+    # Un usuario desactivado pierde sus claves como si se hubieran revocado
+    if not created and not instance.is_active:
+        key_cache.clear()
+
+
+@receiver(post_save, sender=CompostMaterial)
+@receiver(post_delete, sender=CompostMaterial)
+def invalidate_material_catalog(sender, **kwargs):
+    # Después del commit: antes, otro proceso podría recargar las filas viejas
+    # y quedarse con ellas bajo la versión nueva
+    transaction.on_commit(bump_version)
+
+
+def _entry_totals(state, sign):
+    unit_id, quantity = state['compost_unit_id'], state['quantity']
+    apply_load(unit_id, sign * quantity)
+    apply_input(unit_id, state['date_added'], quantity, sign)
+    return apply_entry(unit_id, state['material_id'], quantity, sign=sign)
+
+
+@receiver(post_save, sender=CompostEntry)
+def apply_compost_entry(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = None if created else getattr(instance, '_saved_state', None)
+    current = instance.tracked_state()
+    if previous == current:
+        return
+    unit_id = instance.compost_unit_id
+    if not created and previous is None:
+        # Guardada sin haberse leído de la base: no se conoce la diferencia
+        reconcile_loads([unit_id], fix=True)
+        rebuild_balances([unit_id])
+        rebuild_yield_summaries([unit_id])
+    else:
+        if previous is not None:
+            _entry_totals(previous, -1)
+        if not _entry_totals(current, 1):
+            rebuild_balances([unit_id])
+    instance._saved_state = current
+
+
+@receiver(post_delete, sender=CompostEntry)
+def revert_compost_entry(sender, instance, **kwargs):
+    # Sin respaldo a rebuild: en un borrado en cascada la unidad también desaparece
+    _entry_totals(instance.tracked_state(), -1)
+
+
+def _harvest_totals(state, sign):
+    apply_load(state['compost_unit_id'], -sign * state['quantity'])
+    apply_harvest(state, sign)
+
+
+@receiver(post_save, sender=CompostHarvest)
+def apply_compost_harvest(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = None if created else getattr(instance, '_saved_state', None)
+    current = instance.tracked_state()
+    if previous == current:
+        return
+    if not created and previous is None:
+        reconcile_loads([instance.compost_unit_id], fix=True)
+        rebuild_yield_summaries([instance.compost_unit_id])
+    else:
+        if previous is not None:
+            _harvest_totals(previous, -1)
+        _harvest_totals(current, 1)
+    instance._saved_state = current
+
+
+@receiver(post_delete, sender=CompostHarvest)
+def revert_compost_harvest(sender, instance, **kwargs):
+    _harvest_totals(instance.tracked_state(), -1)
+
+
+@receiver(post_save, sender=CompostMaterial)
+def rebuild_balances_for_material(sender, instance, created, raw=False, **kwargs):
+    # Un cambio de tipo o de C/N afecta a todas las unidades que usan el material
+    if created or raw:
+        return
+    unit_ids = list(
+        CompostEntry.objects.filter(material=instance)
+        .order_by().values_list('compost_unit', flat=True).distinct()
+    )
+    if unit_ids:
+        rebuild_balances(unit_ids)
+
+
+@receiver(pre_save, sender=CompostUnit)
+def load_unit_map_state(sender, instance, raw=False, **kwargs):
+    # Instancia no leída de la base: se consulta el estado anterior para el mapa
+    if raw or instance._state.adding or hasattr(instance, '_saved_map_state'):
+        return
+    previous = CompostUnit.objects.filter(pk=instance.pk).only(
+        'is_public', 'geohash', 'latitude', 'longitude'
+    ).first()
+    instance._saved_map_state = previous.map_state() if previous else None
+
+
+@receiver(post_save, sender=CompostUnit)
+def update_map_cells(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = None if created else getattr(instance, '_saved_map_state', None)
+    current = instance.map_state()
+    if previous != current:
+        apply_unit(previous, -1)
+        apply_unit(current, 1)
+    instance._saved_map_state = current
+
+
+@receiver(post_delete, sender=CompostUnit)
+def remove_from_map_cells(sender, instance, **kwargs):
+    apply_unit(getattr(instance, '_saved_map_state', instance.map_state()), -1)
@@ -0,0 +1,153 @@
+# authentication/singleflight.py
+"""Coalescencia de cálculos costosos idénticos ("single flight").
+
+Cuando muchas peticiones piden a la vez la misma página (p. ej. al empezar
+un turno), solo una calcula los datos y las demás esperan su resultado:
+
+- entre hilos del mismo proceso, el primero queda como líder y los demás
+  esperan un Event;
+- entre procesos, el líder toma un candado de archivo propio de la clave y
+  publica el resultado en la caché 'singleflight' (en disco, compartida);
+  los líderes de otros procesos esperan el candado y leen la caché.
+
+Cada clave tiene su archivo de candado, así que cálculos anidados (un
+`single_flight` dentro de otro) o de usuarios distintos no se bloquean
+entre sí. El líder borra el archivo antes de soltarlo.
+
+La clave incluye la versión de los datos, así que un resultado guardado
+nunca queda viejo: cuando cambian los datos cambia la clave. Si el líder
+tarda más que `timeout`, quien espera calcula por su cuenta en lugar de
+quedarse bloqueado.
+"""
+import hashlib
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin coalescencia entre procesos
+    fcntl = None
+
+FLIGHT_CACHE = 'singleflight'
+# Segundos que se espera a otro cálculo antes de hacerlo por cuenta propia
+DEFAULT_TIMEOUT = 30
+# Segundos que el resultado queda en la caché compartida
+RESULT_TTL = 300
+POLL_INTERVAL = 0.05
+
+_MISSING = object()
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def flight_key(*parts):
+    return 'flight:' + hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def _cache():
+    return caches[FLIGHT_CACHE if FLIGHT_CACHE in settings.CACHES else 'default']
+
+
+def _lock_path(key):
+    runtime_dir = getattr(settings, 'RUNTIME_DIR', settings.BASE_DIR / 'var')
+    directory = os.path.join(runtime_dir, 'singleflight')
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, key.split(':', 1)[1] + '.lock')
+
+
+def single_flight(parts, compute, timeout=DEFAULT_TIMEOUT, ttl=RESULT_TTL):
+    """Resultado de `compute()` para la clave `parts`, calculado una sola vez a la vez.
+
+    `parts` identifica el cálculo (vista, usuario u organización, versión de
+    los datos); el resultado debe poder guardarse en la caché (pickle).
+    """
+    key = flight_key(*parts)
+    cache = _cache()
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        return value
+
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+    if not leader:
+        if flight.done.wait(timeout):
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        # El líder no terminó a tiempo: se calcula sin esperarlo más
+        return compute()
+
+    try:
+        flight.result = _lead(key, compute, cache, timeout, ttl)
+        return flight.result
+    except Exception as exc:
+        flight.error = exc
+        raise
+    finally:
+        with _flights_lock:
+            _flights.pop(key, None)
+        flight.done.set()
+
+
+def _lead(key, compute, cache, timeout, ttl):
+    """Calcula como líder del proceso, coordinándose con los demás procesos"""
+    if fcntl is None:
+        value = compute()
+        cache.set(key, value, ttl)
+        return value
+
+    deadline = time.monotonic() + timeout
+    path = _lock_path(key)
+    while True:
+        lock_file = open(path, 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            # Otro proceso está calculando esta clave
+            lock_file.close()
+            value = cache.get(key, _MISSING)
+            if value is not _MISSING:
+                return value
+            if time.monotonic() >= deadline:
+                return compute()
+            time.sleep(POLL_INTERVAL)
+            continue
+        if _same_file(lock_file, path):
+            break
+        # El líder anterior borró el archivo entre open y flock: se abre el nuevo
+        lock_file.close()
+
+    try:
+        # El proceso que tenía el candado pudo dejar el resultado listo
+        value = cache.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            cache.set(key, value, ttl)
+        return value
+    finally:
+        os.unlink(path)
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+        lock_file.close()
+
+
+def _same_file(lock_file, path):
+    try:
+        return os.fstat(lock_file.fileno()).st_ino == os.stat(path).st_ino
+    except FileNotFoundError:
+        return False
@@ -0,0 +1,270 @@
+# authentication/sketches.py
+"""Percentiles aproximados de las lecturas con t-digest.
+
+ReadingSketch guarda por unidad, métrica y día un t-digest: unos pocos
+centroides (media, peso) que resumen la distribución de los valores, más
+el mínimo y el máximo exactos. Los digest se combinan uniendo centroides y
+volviendo a comprimir, así que los percentiles de muchas unidades y días
+salen de unas decenas de centroides por fila en lugar de ordenar todas las
+lecturas. El error es menor en las colas (p5, p95) que en la mediana.
+
+El ingreso actualiza la fila del día de cada lectura; los borrados de
+lecturas no se descuentan (un digest no admite restas): `rebuild_sketches`
+los recalcula desde las lecturas.
+"""
+import uuid
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+import numpy as np
+from django.utils import timezone
+
+from .ingest import METRICS
+
+# Compresión: a lo sumo ~DELTA/2 centroides por digest
+DELTA = 100
+QUANTILES = (5, 50, 95)
+# Días que resume la página de estadísticas
+SKETCH_DAYS = 30
+
+
+def compress(means, weights, delta=DELTA):
+    """Agrupa centroides (o valores sueltos con peso 1) en un t-digest.
+
+    Usa la escala k1 (arcoseno): los grupos son estrechos en las colas y
+    anchos en el centro. Devuelve (medias, pesos) ordenados por media.
+    """
+    means = np.asarray(means, dtype=np.float64)
+    weights = np.asarray(weights, dtype=np.float64)
+    if not len(means):
+        return means, weights
+    order = np.argsort(means)
+    means, weights = means[order], weights[order]
+    # Cuantil del centro de cada centroide y su posición en la escala k
+    q = (np.cumsum(weights) - weights / 2) / weights.sum()
+    k = delta / (2 * np.pi) * np.arcsin(2 * q - 1)
+    cluster = np.floor(k - k[0]).astype(np.int64)
+    groups = np.concatenate(([0], np.cumsum(cluster[1:] != cluster[:-1])))
+    totals = np.bincount(groups, weights=weights)
+    return np.bincount(groups, weights=weights * means) / totals, totals
+
+
+def pack(means, weights):
+    """Centroides como bytes: pares float32 (media, peso)"""
+    return np.column_stack((means, weights)).astype('<f4').tobytes()
+
+
+def unpack(data):
+    pairs = np.frombuffer(bytes(data), dtype='<f4').reshape(-1, 2).astype(np.float64)
+    return pairs[:, 0], pairs[:, 1]
+
+
+def quantiles(means, weights, minimum, maximum, percentiles=QUANTILES):
+    """Percentiles (0-100) interpolando entre centroides; los extremos son exactos"""
+    if not len(means):
+        return [None] * len(percentiles)
+    total = weights.sum()
+    positions = np.concatenate(([0.0], np.cumsum(weights) - weights / 2, [total]))
+    values = np.concatenate(([minimum], means, [maximum]))
+    targets = np.asarray(percentiles, dtype=np.float64) / 100 * total
+    return np.interp(targets, positions, values).tolist()
+
+
+class Digest:
+    """Acumula digest (o valores) y los comprime una sola vez al final"""
+
+    def __init__(self):
+        self.means, self.weights = [], []
+        self.count = 0
+        self.minimum, self.maximum = np.inf, -np.inf
+        self._compressed = True
+
+    def add_values(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if len(values):
+            means, weights = compress(values, np.ones(len(values)))
+            self.add(means, weights, len(values), values.min(), values.max())
+
+    def add(self, means, weights, count, minimum, maximum):
+        self.means.append(means)
+        self.weights.append(weights)
+        self._compressed = False
+        self.count += count
+        self.minimum = min(self.minimum, minimum)
+        self.maximum = max(self.maximum, maximum)
+
+    def compressed(self):
+        if not self.means:
+            return np.zeros(0), np.zeros(0)
+        if not self._compressed:
+            # Se guarda comprimido: las siguientes llamadas no repiten el trabajo
+            means, weights = compress(np.concatenate(self.means), np.concatenate(self.weights))
+            self.means, self.weights = [means], [weights]
+            self._compressed = True
+        return self.means[0], self.weights[0]
+
+    def summary(self, percentiles=QUANTILES):
+        """dict con count, min, max y p<n> por cada percentil"""
+        means, weights = self.compressed()
+        result = {'count': self.count,
+                  'min': float(self.minimum) if self.count else None,
+                  'max': float(self.maximum) if self.count else None}
+        for percentile, value in zip(percentiles, quantiles(
+                means, weights, self.minimum, self.maximum, percentiles)):
+            result[f'p{percentile}'] = value
+        return result
+
+
+def _local_day(value):
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    return value.date()
+
+
+def apply_readings(rows):
+    """Suma lecturas nuevas a los digest de su día.
+
+    `rows` son tuplas (unit_id, timestamp, temperature, ph, humidity, oxygen)
+    como las de ingest.store_readings. Lee y reescribe las filas afectadas:
+    debe correr dentro de la transacción que insertó las lecturas (que ya
+    tiene el bloqueo de escritura).
+    """
+    from .models import ReadingSketch
+
+    pending = defaultdict(list)
+    for unit_id, ts, *values in rows:
+        if unit_id is None:
+            continue
+        # Las filas del ingreso pueden traer el id como texto
+        unit_id = uuid.UUID(str(unit_id))
+        day = _local_day(ts)
+        for metric, value in zip(METRICS, values):
+            if value is not None:
+                pending[unit_id, metric, day].append(float(value))
+    if not pending:
+        return 0
+
+    days = defaultdict(set)
+    for unit_id, _, day in pending:
+        days[unit_id].add(day)
+    existing = {}
+    for unit_id, unit_days in days.items():
+        for sketch in ReadingSketch.objects.filter(compost_unit_id=unit_id, day__in=unit_days):
+            existing[sketch.compost_unit_id, sketch.metric, sketch.day] = sketch
+
+    to_create, to_update = [], []
+    for key, values in pending.items():
+        digest = Digest()
+        digest.add_values(values)
+        sketch = existing.get(key)
+        if sketch is None:
+            sketch = ReadingSketch(compost_unit_id=key[0], metric=key[1], day=key[2])
+            to_create.append(sketch)
+        else:
+            digest.add(*unpack(sketch.centroids), sketch.count, sketch.minimum, sketch.maximum)
+            to_update.append(sketch)
+        sketch.count = digest.count
+        sketch.minimum, sketch.maximum = digest.minimum, digest.maximum
+        sketch.centroids = pack(*digest.compressed())
+
+    ReadingSketch.objects.bulk_create(to_create, batch_size=500)
+    ReadingSketch.objects.bulk_update(
+        to_update, ['count', 'minimum', 'maximum', 'centroids'], batch_size=500
+    )
+    return len(pending)
+
+
+def _day_index(ts):
+    """(días locales, índice del día de cada timestamp) para timestamps ordenados"""
+    tz = timezone.get_current_timezone()
+    first = datetime.fromtimestamp(int(ts[0]), tz=tz).date()
+    last = datetime.fromtimestamp(int(ts[-1]), tz=tz).date()
+    days = [first + timedelta(days=n) for n in range((last - first).days + 1)]
+    starts = [datetime.combine(day, time.min, tzinfo=tz).timestamp() for day in days]
+    return days, np.searchsorted(starts, ts, side='right') - 1
+
+
+def daily_sketches(readings):
+    """Campos de ReadingSketch por día y métrica de un queryset de lecturas de una unidad"""
+    from .series import read_columns
+
+    ts, values = read_columns(readings.order_by('timestamp'))
+    if not len(ts):
+        return
+    days, index = _day_index(ts)
+    # Límites de cada día dentro de los arreglos ordenados
+    bounds = np.searchsorted(index, np.arange(len(days) + 1))
+    for position, day in enumerate(days):
+        block = values[bounds[position]:bounds[position + 1]]
+        for column, metric in enumerate(METRICS):
+            data = block[:, column]
+            data = data[~np.isnan(data)]
+            if not len(data):
+                continue
+            yield {
+                'metric': metric, 'day': day, 'count': len(data),
+                'minimum': float(data.min()), 'maximum': float(data.max()),
+                'centroids': pack(*compress(data, np.ones(len(data)))),
+            }
+
+
+def rebuild_sketches(unit_ids=None):
+    """Recalcula los digest desde las lecturas; devuelve cuántas filas escribió"""
+    from django.db import transaction
+    from .models import CompostUnit, ReadingSketch, SensorReading
+
+    if unit_ids is None:
+        unit_ids = list(CompostUnit.objects.order_by('pk').values_list('pk', flat=True))
+    rows = [
+        ReadingSketch(compost_unit_id=unit_id, **fields)
+        for unit_id in unit_ids
+        for fields in daily_sketches(SensorReading.objects.filter(compost_unit_id=unit_id))
+    ]
+
+    with transaction.atomic():
+        ReadingSketch.objects.filter(compost_unit__in=unit_ids).delete()
+        ReadingSketch.objects.bulk_create(rows, batch_size=500)
+    return len(rows)
+
+
+def sketch_summary(unit_ids, start=None, end=None, metrics=METRICS, percentiles=QUANTILES):
+    """Percentiles por unidad y de toda la flota entre los días `start` y `end` inclusive.
+
+    Una sola consulta sobre ReadingSketch. Devuelve (flota, por_unidad):
+    `flota` es {métrica: resumen} y `por_unidad` {unit_id: {métrica: resumen}},
+    con los resúmenes de Digest.summary.
+    """
+    from .models import ReadingSketch
+
+    sketches = ReadingSketch.objects.filter(compost_unit__in=unit_ids, metric__in=metrics)
+    if start:
+        sketches = sketches.filter(day__gte=start)
+    if end:
+        sketches = sketches.filter(day__lte=end)
+
+    # Por (unidad, métrica): [lecturas, mínimo, máximo, centroides empaquetados...]
+    groups = {}
+    for unit_id, metric, count, minimum, maximum, centroids in sketches.order_by().values_list(
+            'compost_unit_id', 'metric', 'count', 'minimum', 'maximum', 'centroids'):
+        group = groups.setdefault((unit_id, metric), [0, minimum, maximum])
+        group[0] += count
+        group[1], group[2] = min(group[1], minimum), max(group[2], maximum)
+        group.append(bytes(centroids))
+
+    fleet = {metric: Digest() for metric in metrics}
+    units = defaultdict(dict)
+    for (unit_id, metric), (count, minimum, maximum, *blobs) in groups.items():
+        # Los días de una unidad se desempaquetan juntos: un solo arreglo por grupo
+        digest = Digest()
+        digest.add(*unpack(b''.join(blobs)), count, minimum, maximum)
+        means, weights = digest.compressed()
+        # La flota combina los digest ya comprimidos de cada unidad
+        fleet[metric].add(means, weights, count, minimum, maximum)
+        units[unit_id][metric] = digest.summary(percentiles)
+    return {metric: digest.summary(percentiles) for metric, digest in fleet.items()}, dict(units)
+
+
+def recent_window(days=SKETCH_DAYS):
+    """(primer día, hoy) de los últimos `days` días en la zona activa"""
+    today = timezone.localdate()
+    return today - timedelta(days=days - 1), today
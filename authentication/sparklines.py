@@ -0,0 +1,183 @@
+# authentication/sparklines.py
+"""Minigráficos de tendencia precalculados por unidad.
+
+UnitSparkline guarda por unidad, para las últimas 24 horas y los últimos 7
+días, BUCKETS celdas por métrica con la suma y la cantidad de lecturas, en
+un arreglo float32 empaquetado de unos 3 KB. Las celdas están alineadas a
+múltiplos fijos de su duración: al llegar lecturas nuevas las celdas viejas
+se desplazan fuera y las nuevas se suman, sin volver a leer el historial.
+
+La lista de unidades trae la fila con select_related y dibuja los
+minigráficos sin consultas extra. Como en sketches.py, los borrados de
+lecturas no se descuentan: `rebuild_sparklines` los recalcula.
+"""
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+
+import numpy as np
+from django.utils import timezone
+
+from .ingest import METRICS
+
+BUCKETS = 48
+# ventana: segundos por celda (48 celdas de 30 min = 24 h; de 3 h 30 min = 7 días)
+WINDOWS = {'day': 1800, 'week': 12600}
+# ventana, (suma, lecturas), métrica, celda
+SHAPE = (len(WINDOWS), 2, len(METRICS), BUCKETS)
+# Tamaño de los SVG de la lista de unidades
+WIDTH, HEIGHT = 120, 28
+
+
+def unpack(data):
+    if not data:
+        return np.zeros(SHAPE, dtype=np.float32)
+    return np.frombuffer(bytes(data), dtype='<f4').reshape(SHAPE).copy()
+
+
+def pack(array):
+    return array.astype('<f4').tobytes()
+
+
+def advance(array, old_end, new_end):
+    """Desplaza las celdas de `old_end` a `new_end` (segundos Unix); las que salen se pierden"""
+    for position, step in enumerate(WINDOWS.values()):
+        shift = new_end // step - old_end // step
+        if shift <= 0:
+            continue
+        if shift >= BUCKETS:
+            array[position] = 0
+        else:
+            array[position, :, :, :-shift] = array[position, :, :, shift:]
+            array[position, :, :, -shift:] = 0
+    return array
+
+
+def add(array, end, ts, values):
+    """Suma lecturas a las celdas cuya última termina en `end`.
+
+    `ts` son segundos Unix (int64) y `values` una matriz (n, métricas) con
+    NaN en los nulos, como la de series.read_columns. Las lecturas fuera de
+    la ventana se ignoran.
+    """
+    for position, step in enumerate(WINDOWS.values()):
+        index = BUCKETS - 1 - (end // step - ts // step)
+        inside = (index >= 0) & (index < BUCKETS)
+        for column in range(len(METRICS)):
+            data = values[:, column]
+            keep = inside & ~np.isnan(data)
+            np.add.at(array[position, 0, column], index[keep], data[keep])
+            np.add.at(array[position, 1, column], index[keep], 1)
+    return array
+
+
+def _now():
+    return int(timezone.now().timestamp())
+
+
+def apply_readings(rows):
+    """Suma lecturas nuevas a los minigráficos de sus unidades.
+
+    `rows` son tuplas (unit_id, timestamp, temperature, ph, humidity, oxygen)
+    como las de ingest.store_readings; debe correr dentro de la transacción
+    que las insertó. Una consulta para leer las filas y una escritura por lote.
+    """
+    from .models import UnitSparkline
+
+    pending = defaultdict(list)
+    for unit_id, ts, *values in rows:
+        if unit_id is not None:
+            pending[uuid.UUID(str(unit_id))].append(
+                (ts.timestamp(), *(np.nan if value is None else float(value) for value in values))
+            )
+    if not pending:
+        return 0
+
+    now = _now()
+    existing = {
+        sparkline.compost_unit_id: sparkline
+        for sparkline in UnitSparkline.objects.filter(compost_unit__in=list(pending))
+    }
+    to_create, to_update = [], []
+    for unit_id, unit_rows in pending.items():
+        data = np.array(unit_rows, dtype=np.float64)
+        sparkline = existing.get(unit_id)
+        if sparkline is None:
+            sparkline = UnitSparkline(compost_unit_id=unit_id, end=now)
+            to_create.append(sparkline)
+        else:
+            to_update.append(sparkline)
+        end = max(sparkline.end, now)
+        array = advance(unpack(sparkline.buckets), sparkline.end, end)
+        sparkline.end = end
+        sparkline.buckets = pack(add(array, end, data[:, 0].astype(np.int64), data[:, 1:]))
+
+    UnitSparkline.objects.bulk_create(to_create, batch_size=500)
+    UnitSparkline.objects.bulk_update(to_update, ['end', 'buckets'], batch_size=500)
+    return len(pending)
+
+
+def history_start():
+    """Inicio de la ventana más larga: lo que hace falta leer para reconstruir"""
+    return timezone.now() - timedelta(seconds=BUCKETS * max(WINDOWS.values()))
+
+
+def build_buckets(readings, end):
+    """Celdas empaquetadas de un queryset de lecturas de una unidad, o None sin lecturas"""
+    from .series import read_columns
+
+    ts, values = read_columns(readings.filter(timestamp__gte=history_start()).order_by('timestamp'))
+    if not len(ts):
+        return None
+    return pack(add(np.zeros(SHAPE, dtype=np.float32), end, ts, values))
+
+
+def rebuild_sparklines(unit_ids=None):
+    """Recalcula los minigráficos desde las lecturas de los últimos 7 días"""
+    from django.db import transaction
+    from .models import CompostUnit, SensorReading, UnitSparkline
+
+    if unit_ids is None:
+        unit_ids = list(CompostUnit.objects.order_by('pk').values_list('pk', flat=True))
+    now = _now()
+    rows = []
+    for unit_id in unit_ids:
+        buckets = build_buckets(SensorReading.objects.filter(compost_unit_id=unit_id), now)
+        if buckets is not None:
+            rows.append(UnitSparkline(compost_unit_id=unit_id, end=now, buckets=buckets))
+
+    with transaction.atomic():
+        UnitSparkline.objects.filter(compost_unit__in=unit_ids).delete()
+        UnitSparkline.objects.bulk_create(rows, batch_size=500)
+    return len(rows)
+
+
+def series(sparkline, window, metric, now=None):
+    """Medias por celda (None sin lecturas) de `window` hasta ahora, de la más vieja a la actual"""
+    array = advance(unpack(sparkline.buckets), sparkline.end, max(sparkline.end, now or _now()))
+    block = array[list(WINDOWS).index(window), :, METRICS.index(metric)]
+    sums, counts = block[0].astype(np.float64), block[1]
+    return [float(total / count) if count else None for total, count in zip(sums, counts)]
+
+
+def polylines(values, width=WIDTH, height=HEIGHT):
+    """Puntos de SVG "x,y x,y ..." de cada tramo sin huecos, escalados al rango de los valores"""
+    present = [value for value in values if value is not None]
+    if not present:
+        return []
+    low, high = min(present), max(present)
+    span = (high - low) or 1.0
+    margin = 2
+    step = width / (len(values) - 1)
+    lines, current = [], []
+    for position, value in enumerate(values + [None]):
+        if value is None:
+            if current:
+                # Un punto suelto se repite: con extremos redondeados se ve como un punto
+                lines.append(' '.join(current * 2 if len(current) == 1 else current))
+            current = []
+            continue
+        # Serie plana: línea al medio
+        y = height / 2 if high == low else margin + (high - value) / span * (height - 2 * margin)
+        current.append(f'{position * step:.1f},{y:.1f}')
+    return lines
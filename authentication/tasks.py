@@ -0,0 +1,277 @@
+# authentication/tasks.py
+"""Tipos de trabajo en segundo plano (ver authentication/jobs.py).
+
+Cada función recibe el JobContext y los parámetros del trabajo, y devuelve
+un dict serializable en JSON que queda como resultado.
+"""
+import os
+import random
+import uuid
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from .jobs import JobError, register
+from .writer import process_write_lock, run_write
+
+# Unidades por transacción en las reconstrucciones
+BATCH_SIZE = 500
+
+DEMO_UNITS = [
+    {'name': 'Unidad Demo 1', 'location': 'Jardín Principal', 'capacity': 100.0,
+     'description': 'Unidad de demostración para residuos orgánicos del hogar'},
+    {'name': 'Unidad Demo 2', 'location': 'Área de Compostaje', 'capacity': 200.0,
+     'description': 'Unidad industrial para grandes volúmenes de compost'}
+]
+
+
+def _write_file(context, filename, write):
+    """Escribe el resultado en un temporal y lo publica con un rename atómico"""
+    path = context.output_path(filename)
+    with open(path + '.tmp', 'wb') as output:
+        write(output)
+    os.replace(path + '.tmp', path)
+    return path
+
+
+def _user(user_id):
+    try:
+        return User.objects.get(pk=user_id)
+    except User.DoesNotExist:
+        raise JobError('El usuario ya no existe.')
+
+
+@register('export_readings_pdf')
+def export_readings_pdf(context, unit_id, step=None, agg='mean', fill='none'):
+    from .models import CompostUnit, SensorReading
+    from .reports import readings_rows, write_readings_pdf
+
+    unit = CompostUnit.objects.filter(pk=unit_id).first()
+    if unit is None:
+        raise JobError('La unidad ya no existe.')
+    readings = SensorReading.objects.filter(compost_unit=unit).order_by('timestamp')
+    try:
+        rows = readings_rows(readings, step, agg, fill)
+    except ValueError as exc:
+        raise JobError(f'Parámetros de remuestreo inválidos: {exc}')
+
+    total = max(unit.reading_count, 1)
+    _write_file(context, f'lecturas_{unit.pk}.pdf', lambda output: write_readings_pdf(
+        output, unit, rows,
+        progress=lambda written: context.progress(written / total, f'{written} filas escritas'),
+    ))
+    return {'filename': f'{unit.name}_readings.pdf'}
+
+
+@register('export_bundle')
+def export_bundle(context, unit_ids, formats=('pdf', 'csv'), start=None, end=None):
+    from .bundles import build_bundle, parse_day
+
+    try:
+        start, end = parse_day(start), parse_day(end)
+    except ValueError as exc:
+        raise JobError(f'Fecha inválida: {exc}')
+    path = context.output_path('lecturas.zip')
+    summary = build_bundle(
+        unit_ids, path + '.tmp', formats=formats, start=start, end=end,
+        progress=lambda done, total: context.progress(
+            done / total, f'{done} de {total} archivos', force=done == total
+        ),
+    )
+    os.replace(path + '.tmp', path)
+    # Cada formato de una unidad tiene las mismas lecturas: se cuentan una vez
+    per_unit = {}
+    for unit_id, _, written in summary:
+        per_unit[unit_id] = max(per_unit.get(unit_id, 0), written)
+    return {
+        'filename': f'lecturas_{timezone.localdate():%Y%m%d}.zip',
+        'files': len(summary),
+        'readings': sum(per_unit.values()),
+    }
+
+
+@register('statistics_report')
+def statistics_report(context, user_id):
+    from .reports import (
+        cached_report, render_statistics_pdf, shared_statistics_data, statistics_version,
+    )
+
+    user = _user(user_id)
+    version = statistics_version(user)
+    pdf, cached = cached_report(
+        'statistics', user, version,
+        lambda: render_statistics_pdf(user, **shared_statistics_data(user, version)),
+    )
+    _write_file(context, 'estadisticas_compost_iot.pdf', lambda output: output.write(pdf))
+    return {'filename': 'estadisticas_compost_iot.pdf', 'cached': cached}
+
+
+def create_demo_sensor_data(unit):
+    from .models import SensorReading
+
+    now = timezone.now()
+    phases = [
+        {'temp_range': (45, 65), 'humidity_range': (40, 60), 'ph_range': (6.0, 7.5), 'oxygen_range': (5, 15)},
+        {'temp_range': (25, 45), 'humidity_range': (50, 70), 'ph_range': (6.5, 8.0), 'oxygen_range': (10, 20)},
+        {'temp_range': (20, 35), 'humidity_range': (55, 75), 'ph_range': (7.0, 8.5), 'oxygen_range': (15, 25)},
+        {'temp_range': (15, 25), 'humidity_range': (60, 80), 'ph_range': (7.5, 8.5), 'oxygen_range': (18, 30)},
+    ]
+
+    for day in range(7):
+        phase = phases[min(day // 2, len(phases) - 1)]
+        for _ in range(random.randint(4, 6)):
+            timestamp = now - timedelta(days=6-day, hours=random.randint(0, 23), minutes=random.randint(0, 59))
+            if not SensorReading.objects.filter(
+                compost_unit=unit,
+                timestamp__range=[timestamp - timedelta(minutes=30), timestamp + timedelta(minutes=30)]
+            ).exists():
+                SensorReading.objects.create(
+                    compost_unit=unit,
+                    temperature=round(random.uniform(*phase['temp_range']), 1),
+                    humidity=round(random.uniform(*phase['humidity_range'])),
+                    ph=round(random.uniform(*phase['ph_range']), 1),
+                    oxygen=round(random.uniform(*phase['oxygen_range'])),
+                    timestamp=timestamp
+                )
+
+
+@register('demo_data')
+def demo_data(context, user_id):
+    from .models import CompostUnit
+
+    user = _user(user_id)
+
+    def create_unit(data):
+        if CompostUnit.objects.filter(owner=user, name=data['name']).exists():
+            return False
+        unit = CompostUnit.objects.create(owner=user, **data)
+        create_demo_sensor_data(unit)
+        return True
+
+    created = 0
+    for index, data in enumerate(DEMO_UNITS):
+        created += run_write(create_unit, data)
+        context.progress((index + 1) / len(DEMO_UNITS), data['name'], force=True)
+    return {'created': created}
+
+
+def _unit_batches(context, unit_ids, label):
+    """Ids de unidad en bloques de BATCH_SIZE, informando el avance"""
+    from .models import CompostUnit
+
+    if unit_ids is None:
+        unit_ids = list(CompostUnit.objects.order_by('pk').values_list('pk', flat=True))
+    else:
+        # Los parámetros llegan como texto JSON
+        unit_ids = [uuid.UUID(str(pk)) for pk in unit_ids]
+    for start in range(0, len(unit_ids), BATCH_SIZE):
+        yield unit_ids[start:start + BATCH_SIZE]
+        done = min(start + BATCH_SIZE, len(unit_ids))
+        context.progress(done / len(unit_ids), f'{label}: {done} de {len(unit_ids)} unidades')
+
+
+def _purge_progress(context, expected):
+    """Callback de purga que informa filas borradas sobre un total estimado"""
+    removed = 0
+
+    def report(count):
+        nonlocal removed
+        removed += count
+        context.progress(removed / max(expected, removed, 1), f'{removed} filas borradas')
+
+    return report
+
+
+@register('purge_unit')
+def purge_unit_job(context, unit_id):
+    from .deletion import purge_unit
+    from .models import CompostUnit
+
+    unit = CompostUnit.all_objects.filter(pk=unit_id).only('reading_count').first()
+    expected = unit.reading_count if unit else 0
+    removed = purge_unit(unit_id, removed=_purge_progress(context, expected))
+    if removed is None:
+        return {'purged': False}
+    return {'purged': True, 'rows': removed}
+
+
+@register('purge_user')
+def purge_user_job(context, user_id):
+    from django.db.models import Sum
+    from .deletion import purge_user
+    from .models import CompostUnit
+
+    expected = CompostUnit.all_objects.filter(owner_id=user_id).aggregate(
+        total=Sum('reading_count')
+    )['total'] or 0
+    removed = purge_user(user_id, removed=_purge_progress(context, expected))
+    if removed is None:
+        raise JobError('El usuario ya no existe o fue reactivado.')
+    return {'rows': removed}
+
+
+@register('rebuild_balances')
+def rebuild_balances_job(context, unit_ids=None):
+    from .balance import rebuild_balances
+
+    rebuilt = 0
+    for batch in _unit_batches(context, unit_ids, 'Balances'):
+        with process_write_lock():
+            rebuilt += rebuild_balances(batch)
+    return {'rebuilt': rebuilt}
+
+
+@register('rebuild_yield_summaries')
+def rebuild_yield_summaries_job(context, unit_ids=None):
+    from .yields import rebuild_yield_summaries
+
+    rows = 0
+    for batch in _unit_batches(context, unit_ids, 'Rendimiento'):
+        with process_write_lock():
+            rows += rebuild_yield_summaries(batch)
+    return {'rows': rows}
+
+
+@register('rebuild_sketches')
+def rebuild_sketches_job(context, unit_ids=None):
+    from .sketches import rebuild_sketches
+
+    rows = 0
+    for batch in _unit_batches(context, unit_ids, 'Percentiles'):
+        with process_write_lock():
+            rows += rebuild_sketches(batch)
+    return {'rows': rows}
+
+
+@register('rebuild_sparklines')
+def rebuild_sparklines_job(context, unit_ids=None):
+    from .sparklines import rebuild_sparklines
+
+    rows = 0
+    for batch in _unit_batches(context, unit_ids, 'Minigráficos'):
+        with process_write_lock():
+            rows += rebuild_sparklines(batch)
+    return {'rows': rows}
+
+
+@register('rebuild_map_cells')
+def rebuild_map_cells_job(context):
+    from .geo import rebuild_map_cells
+
+    with process_write_lock():
+        return {'cells': rebuild_map_cells()}
+
+
+@register('reconcile_loads')
+def reconcile_loads_job(context, unit_ids=None, fix=False):
+    from .inventory import reconcile_loads
+
+    drift = []
+    for batch in _unit_batches(context, unit_ids, 'Cargas'):
+        with process_write_lock():
+            drift += reconcile_loads(batch, fix=fix)
+    return {
+        'fixed': fix,
+        'drift': [[str(pk), str(stored), str(expected)] for pk, stored, expected in drift],
+    }
@@ -0,0 +1,11 @@
+from django import template
+
+from authentication.assets import vendor_url
+
+register = template.Library()
+
+
+@register.simple_tag
+def vendor(name):
+    """{% vendor 'chart.umd.js' %}: URL de la copia local versionada"""
+    return vendor_url(name)
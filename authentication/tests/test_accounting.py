@@ -0,0 +1,161 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from authentication.balance import rebuild_balances, what_if
+from authentication.inventory import add_entries, ledger_loads, reconcile_loads
+from authentication.models import (
+    CompostBalance, CompostEntry, CompostHarvest, CompostMaterial, CompostUnit,
+)
+
+BALANCE_FIELDS = ('green_kg', 'brown_kg', 'other_kg', 'cn_mass', 'entry_count')
+
+
+class AccountingTests(TestCase):
+    """Los acumulados incrementales deben coincidir con recalcularlos desde cero"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('ledger', password='x')
+        cls.unit = CompostUnit.objects.create(owner=cls.owner, name='Pila', location='-', capacity=500)
+        cls.other = CompostUnit.objects.create(owner=cls.owner, name='Otra', location='-', capacity=500)
+        cls.green = CompostMaterial.objects.create(name='Restos de cocina', material_type='green',
+                                                   carbon_nitrogen_ratio=15)
+        cls.brown = CompostMaterial.objects.create(name='Hojas secas', material_type='brown',
+                                                   carbon_nitrogen_ratio=60)
+
+    def entry(self, material, quantity, unit=None):
+        return CompostEntry.objects.create(compost_unit=unit or self.unit, material=material,
+                                           user=self.owner, quantity=Decimal(quantity))
+
+    def harvest(self, quantity, unit=None):
+        return CompostHarvest.objects.create(compost_unit=unit or self.unit, user=self.owner,
+                                             quantity=Decimal(quantity), quality_grade='B',
+                                             compost_age_days=90)
+
+    def balances(self, *units):
+        # Una unidad sin balance equivale a uno en cero
+        empty = dict.fromkeys(BALANCE_FIELDS, 0)
+        return {
+            unit.pk: CompostBalance.objects.filter(pk=unit.pk).values(*BALANCE_FIELDS).first() or empty
+            for unit in units
+        }
+
+    def assertConsistent(self, *units):
+        units = units or (self.unit, self.other)
+        pks = [unit.pk for unit in units]
+        loads = dict(CompostUnit.objects.filter(pk__in=pks).values_list('pk', 'current_load'))
+        self.assertEqual(loads, ledger_loads(pks))
+        self.assertEqual(reconcile_loads(pks), [])
+        incremental = self.balances(*units)
+        rebuild_balances(pks)
+        self.assertEqual(incremental, self.balances(*units))
+
+    def test_entries_accumulate_load_and_balance(self):
+        self.entry(self.green, '10')
+        self.entry(self.brown, '20.5')
+        self.unit.refresh_from_db()
+        self.assertEqual(self.unit.current_load, Decimal('30.50'))
+        balance = CompostBalance.objects.get(pk=self.unit.pk)
+        self.assertEqual((balance.green_kg, balance.brown_kg, balance.entry_count),
+                         (Decimal('10'), Decimal('20.5'), 2))
+        self.assertEqual(balance.cn_mass, Decimal('1380'))
+        self.assertConsistent()
+
+    def test_editing_an_entry_applies_only_the_difference(self):
+        entry = self.entry(self.green, '10')
+        self.entry(self.brown, '5')
+        entry.quantity = Decimal('4')
+        entry.save()
+        # Editada desde una lectura nueva de la base
+        entry = CompostEntry.objects.get(pk=entry.pk)
+        entry.material = self.brown
+        entry.save()
+        self.unit.refresh_from_db()
+        self.assertEqual(self.unit.current_load, Decimal('9.00'))
+        balance = CompostBalance.objects.get(pk=self.unit.pk)
+        self.assertEqual((balance.green_kg, balance.brown_kg), (Decimal('0'), Decimal('9')))
+        self.assertConsistent()
+
+    def test_moving_an_entry_to_another_unit(self):
+        entry = self.entry(self.brown, '12')
+        entry.compost_unit = self.other
+        entry.save()
+        self.unit.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual((self.unit.current_load, self.other.current_load),
+                         (Decimal('0.00'), Decimal('12.00')))
+        self.assertConsistent()
+
+    def test_saving_an_entry_not_read_from_the_database(self):
+        entry = self.entry(self.green, '10')
+        detached = CompostEntry(pk=entry.pk, compost_unit=self.unit, material=self.brown,
+                                user=self.owner, quantity=Decimal('7'), date_added=entry.date_added)
+        detached.save()
+        self.unit.refresh_from_db()
+        self.assertEqual(self.unit.current_load, Decimal('7.00'))
+        self.assertConsistent()
+
+    def test_deleting_entries_reverts_them(self):
+        kept = self.entry(self.green, '3')
+        self.entry(self.brown, '8').delete()
+        self.entry(self.green, '2', unit=self.other)
+        CompostEntry.objects.filter(compost_unit=self.other).delete()
+        self.unit.refresh_from_db()
+        self.assertEqual(self.unit.current_load, kept.quantity)
+        self.assertEqual(CompostBalance.objects.get(pk=self.unit.pk).entry_count, 1)
+        self.assertConsistent()
+
+    def test_harvests_subtract_load_under_edit_and_delete(self):
+        self.entry(self.brown, '50')
+        harvest = self.harvest('20')
+        harvest.quantity = Decimal('15')
+        harvest.save()
+        second = self.harvest('5')
+        self.unit.refresh_from_db()
+        self.assertEqual(self.unit.current_load, Decimal('30.00'))
+        second.delete()
+        harvest = CompostHarvest.objects.get(pk=harvest.pk)
+        harvest.compost_unit = self.other
+        harvest.save()
+        self.unit.refresh_from_db()
+        self.assertEqual(self.unit.current_load, Decimal('50.00'))
+        self.assertConsistent()
+
+    def test_bulk_entries_use_summed_deltas(self):
+        self.entry(self.green, '1')
+        add_entries([
+            CompostEntry(compost_unit=unit, material=material, user=self.owner, quantity=Decimal(q))
+            for unit, material, q in [(self.unit, self.green, '2'), (self.unit, self.brown, '3'),
+                                      (self.other, self.brown, '4'), (self.unit, self.green, '5')]
+        ])
+        self.unit.refresh_from_db()
+        self.assertEqual(self.unit.current_load, Decimal('11.00'))
+        self.assertEqual(CompostBalance.objects.get(pk=self.unit.pk).entry_count, 4)
+        self.assertConsistent()
+
+    def test_changing_a_material_rebuilds_the_balances_that_use_it(self):
+        self.entry(self.green, '10')
+        self.entry(self.green, '6', unit=self.other)
+        self.green.carbon_nitrogen_ratio = 20
+        self.green.save()
+        self.assertEqual(CompostBalance.objects.get(pk=self.other.pk).cn_mass, Decimal('120'))
+        self.assertConsistent()
+
+    def test_reconcile_reports_and_fixes_drift(self):
+        self.entry(self.brown, '10')
+        CompostUnit.objects.filter(pk=self.unit.pk).update(current_load=Decimal('99'))
+        drift = reconcile_loads([self.unit.pk, self.other.pk], fix=True)
+        self.assertEqual(drift, [(self.unit.pk, Decimal('99.00'), Decimal('10.00'))])
+        self.assertEqual(reconcile_loads([self.unit.pk]), [])
+
+    def test_what_if_does_not_touch_the_balance(self):
+        self.entry(self.green, '10')
+        balance = CompostBalance.objects.get(pk=self.unit.pk)
+        result = what_if(balance, [(self.brown.pk, 10)])
+        self.assertEqual(result['current']['cn_ratio'], 15.0)
+        self.assertEqual(result['projected']['cn_ratio'], 37.5)
+        with self.assertRaises(ValueError):
+            what_if(balance, [(self.brown.pk, 0)])
+        self.assertConsistent(self.unit)
@@ -0,0 +1,41 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from authentication.apikeys import generate_key, issue_key, key_cache, rejected_cache, verify_key
+from authentication.models import CompostUnit
+
+
+class VerifyKeyTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('gateway-owner', password='x')
+        cls.unit = CompostUnit.objects.create(owner=cls.owner, name='Pila', location='-', capacity=100)
+        _, cls.raw_key = issue_key(cls.owner, 'gateway')
+
+    def setUp(self):
+        key_cache.clear()
+        rejected_cache.clear()
+
+    def test_valid_key_is_cached(self):
+        self.assertEqual(verify_key(self.raw_key).unit_ids, {self.unit.pk})
+        with self.assertNumQueries(0):
+            self.assertIsNotNone(verify_key(self.raw_key))
+
+    def test_inactive_owner_is_rejected(self):
+        self.assertIsNotNone(verify_key(self.raw_key))
+        self.owner.is_active = False
+        self.owner.save()
+        self.assertIsNone(verify_key(self.raw_key))
+
+    def test_unknown_keys_do_not_evict_valid_ones(self):
+        verify_key(self.raw_key)
+        for _ in range(key_cache.maxsize + 10):
+            self.assertIsNone(verify_key(generate_key()[1]))
+        with self.assertNumQueries(0):
+            self.assertIsNotNone(verify_key(self.raw_key))
+
+    def test_rejected_key_is_not_looked_up_again(self):
+        raw_key = generate_key()[1]
+        self.assertIsNone(verify_key(raw_key))
+        with self.assertNumQueries(0):
+            self.assertIsNone(verify_key(raw_key))
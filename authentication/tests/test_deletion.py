@@ -0,0 +1,90 @@
+import json
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from authentication.apikeys import hash_key, issue_key, key_cache, rejected_cache, verify_key
+from authentication.deletion import (
+    _unit_children, purge_unit, purge_user, soft_delete_units, soft_delete_users,
+)
+from authentication.models import (
+    CompostEntry, CompostMaterial, CompostUnit, DeviceKey, Job, MonitoringLog, SensorReading,
+)
+
+
+class DeletionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('grower', password='x')
+        cls.unit = CompostUnit.objects.create(owner=cls.owner, name='Pila', location='-', capacity=100)
+        cls.other = CompostUnit.objects.create(owner=cls.owner, name='Otra', location='-', capacity=100)
+        material = CompostMaterial.objects.create(name='Hojas', material_type='brown',
+                                                  carbon_nitrogen_ratio=60)
+        now = timezone.now()
+        for unit in (cls.unit, cls.other):
+            SensorReading.objects.bulk_create(
+                SensorReading(compost_unit=unit, timestamp=now - timedelta(minutes=n), temperature=40)
+                for n in range(25)
+            )
+            MonitoringLog.objects.create(compost_unit=unit, user=cls.owner, notes='volteo')
+            CompostEntry.objects.create(compost_unit=unit, material=material, user=cls.owner,
+                                        quantity=5)
+        _, cls.raw_key = issue_key(cls.owner, 'sensor', compost_unit=cls.unit)
+
+    def setUp(self):
+        key_cache.clear()
+        rejected_cache.clear()
+
+    def test_soft_delete_hides_the_unit_and_enqueues_its_purge(self):
+        jobs = soft_delete_units([self.unit], owner=self.owner)
+        self.assertEqual([job.kind for job in jobs], ['purge_unit'])
+        self.assertFalse(CompostUnit.objects.filter(pk=self.unit.pk).exists())
+        self.assertTrue(CompostUnit.all_objects.filter(pk=self.unit.pk).exists())
+        self.assertFalse(DeviceKey.objects.filter(compost_unit=self.unit).exists())
+        # Volver a borrarla no encola otra purga
+        self.assertEqual(soft_delete_units([CompostUnit.all_objects.get(pk=self.unit.pk)]), [])
+
+    def test_purge_removes_history_in_batches(self):
+        soft_delete_units([self.unit])
+        children = sum(model._base_manager.filter(**{field: self.unit.pk}).count()
+                       for model, field in _unit_children())
+        batches = []
+        self.assertEqual(purge_unit(self.unit.pk, batch_size=10, removed=batches.append), children)
+        self.assertEqual(sum(batches), children)
+        self.assertFalse(CompostUnit.all_objects.filter(pk=self.unit.pk).exists())
+        self.assertFalse(SensorReading.objects.filter(compost_unit_id=self.unit.pk).exists())
+        self.assertEqual(batches[:3], [10, 10, 5])
+        # La otra unidad queda intacta
+        self.assertEqual(SensorReading.objects.filter(compost_unit=self.other).count(), 25)
+
+    def test_purge_ignores_units_not_marked(self):
+        self.assertIsNone(purge_unit(self.unit.pk))
+        self.assertTrue(CompostUnit.objects.filter(pk=self.unit.pk).exists())
+
+    def test_stale_key_cannot_write_into_a_deleted_unit(self):
+        principal = verify_key(self.raw_key)
+        soft_delete_units([self.unit])
+        # Otro proceso todavía tiene la clave en su caché
+        key_cache.set(hash_key(self.raw_key), principal)
+        response = self.client.post(
+            reverse('api_ingest_readings'), json.dumps({'temperature': 41}),
+            content_type='application/json', HTTP_AUTHORIZATION=f'Bearer {self.raw_key}',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(SensorReading.objects.filter(compost_unit_id=self.unit.pk).count(), 25)
+        self.assertIsNotNone(purge_unit(self.unit.pk))
+        self.assertFalse(CompostUnit.all_objects.filter(pk=self.unit.pk).exists())
+
+    def test_purge_user_removes_units_and_the_user(self):
+        jobs = soft_delete_users([self.owner])
+        self.assertEqual([job.kind for job in jobs], ['purge_user'])
+        self.assertFalse(User.objects.get(pk=self.owner.pk).is_active)
+        self.assertIsNone(verify_key(self.raw_key))
+        purge_user(self.owner.pk, batch_size=7)
+        self.assertFalse(User.objects.filter(pk=self.owner.pk).exists())
+        self.assertFalse(CompostUnit.all_objects.filter(owner_id=self.owner.pk).exists())
+        self.assertFalse(SensorReading.objects.exists())
+        self.assertTrue(Job.objects.filter(kind='purge_user').exists())
@@ -0,0 +1,129 @@
+import io
+import json
+import os
+import tempfile
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from authentication.apikeys import issue_key, key_cache
+from authentication.ingest import parse_record, reading_limits
+from authentication.models import CompostUnit, SensorReading
+
+
+class ParseRecordTests(SimpleTestCase):
+    def parse(self, **record):
+        return parse_record({'unit': 'u1', 'timestamp': 1700000000, **record}, reading_limits())
+
+    def test_rounds_to_the_model_precision(self):
+        unit, ts, temperature, ph, humidity, oxygen = self.parse(temperature='45.678', humidity='55.6')
+        self.assertEqual((unit, ts.timestamp()), ('u1', 1700000000))
+        self.assertEqual((temperature, ph, humidity, oxygen), (Decimal('45.68'), None, 56, None))
+
+    def test_rejects_non_finite_metrics(self):
+        for value in ('NaN', 'Infinity', '-inf', float('nan'), float('inf')):
+            with self.subTest(value=value), self.assertRaisesRegex(ValueError, 'finito'):
+                self.parse(temperature=value)
+
+    def test_rejects_metrics_beyond_the_decimal_precision(self):
+        for value in ('1e30', '1e400'):
+            with self.subTest(value=value), self.assertRaises(ValueError):
+                self.parse(temperature=value)
+        with self.assertRaises(ValueError):
+            self.parse(humidity='1e400')
+
+    def test_rejects_out_of_range_epochs(self):
+        for value in (1e20, '100000000000000000000', float('inf'), float('nan')):
+            with self.subTest(value=value), self.assertRaisesRegex(ValueError, 'timestamp'):
+                self.parse(timestamp=value, temperature=40)
+
+
+class ApiIngestTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('sensor-owner', password='x')
+        cls.unit = CompostUnit.objects.create(owner=cls.owner, name='Pila', location='-', capacity=100)
+        _, cls.raw_key = issue_key(cls.owner, 'sensor', compost_unit=cls.unit)
+
+    def setUp(self):
+        key_cache.clear()
+
+    def post(self, payload):
+        return self.client.post(reverse('api_ingest_readings'), json.dumps(payload),
+                                content_type='application/json',
+                                HTTP_AUTHORIZATION=f'Bearer {self.raw_key}')
+
+    def test_invalid_rows_are_reported_per_row(self):
+        response = self.post([
+            {'timestamp': 1700000000, 'temperature': 40},
+            {'timestamp': 1700000060, 'temperature': 'NaN'},
+            {'timestamp': 1700000120, 'humidity': 'Infinity'},
+            {'timestamp': 1700000180, 'temperature': '1e400'},
+            {'timestamp': 1e20, 'temperature': 40},
+        ])
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertEqual(body['inserted'], 1)
+        self.assertEqual([error['index'] for error in body['errors']], [1, 2, 3, 4])
+        self.assertEqual(SensorReading.objects.filter(compost_unit=self.unit).count(), 1)
+
+    def test_only_invalid_rows_is_a_bad_request(self):
+        response = self.client.post(
+            reverse('api_ingest_readings'), '{"temperature": 1e400, "timestamp": 1700000000}',
+            content_type='application/json', HTTP_AUTHORIZATION=f'Bearer {self.raw_key}',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(response.json()['errors']), 1)
+        self.assertFalse(SensorReading.objects.exists())
+
+
+class ImportReadingsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        owner = User.objects.create_user('importer', password='x')
+        cls.unit = CompostUnit.objects.create(owner=owner, name='Hilera', location='-', capacity=100)
+
+    def import_file(self, suffix, content):
+        handle, path = tempfile.mkstemp(suffix=suffix)
+        self.addCleanup(os.remove, path)
+        with os.fdopen(handle, 'w') as target:
+            target.write(content)
+        stdout, stderr = io.StringIO(), io.StringIO()
+        call_command('import_readings', path, stdout=stdout, stderr=stderr)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_csv_rejects_bad_rows_and_keeps_the_rest(self):
+        stdout, stderr = self.import_file('.csv', (
+            'unit,timestamp,temperature,humidity\n'
+            f'{self.unit.pk},1700000000,41.5,60\n'
+            f'{self.unit.pk},1700000060,1e30,60\n'
+            f'{self.unit.pk},1700000120,NaN,60\n'
+            f'{self.unit.pk},100000000000000000000,40,60\n'
+            f'{self.unit.pk},1700000180,,Infinity\n'
+            f'{self.unit.pk},1700000240,42,61\n'
+        ))
+        self.assertIn('2 insertadas', stdout)
+        self.assertIn('4 con error', stdout)
+        for line in (3, 4, 5, 6):
+            self.assertIn(f'línea {line}:', stderr)
+        self.assertEqual(SensorReading.objects.filter(compost_unit=self.unit).count(), 2)
+
+    def test_ndjson_rejects_bad_rows_and_keeps_the_rest(self):
+        good = {'unit': str(self.unit.pk), 'timestamp': 1700000000, 'temperature': 41}
+        stdout, stderr = self.import_file('.ndjson', '\n'.join([
+            json.dumps(good),
+            '{"unit": "%s", "timestamp": 1700000060, "temperature": 1e400}' % self.unit.pk,
+            '{"unit": "%s", "timestamp": 1e20, "temperature": 40}' % self.unit.pk,
+            '{"unit": "%s", "timestamp": 1700000120, "oxygen": NaN}' % self.unit.pk,
+            '{roto',
+            '',
+            json.dumps({**good, 'timestamp': 1700000180}),
+        ]) + '\n')
+        self.assertIn('2 insertadas', stdout)
+        self.assertIn('4 con error', stdout)
+        for line in (2, 3, 4, 5):
+            self.assertIn(f'línea {line}:', stderr)
+        self.assertEqual(SensorReading.objects.filter(compost_unit=self.unit).count(), 2)
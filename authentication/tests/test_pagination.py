@@ -0,0 +1,101 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from authentication.models import CompostUnit, SensorReading
+from authentication.pagination import decode_cursor, encode_cursor, keyset_paginate
+
+from .test_views import LOCAL_CACHES, PLAIN_STORAGES
+
+
+class KeysetPaginateTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        owner = User.objects.create_user('pager', password='x')
+        cls.unit = CompostUnit.objects.create(owner=owner, name='Pila', location='-', capacity=100)
+        cls.other = CompostUnit.objects.create(owner=owner, name='Otra', location='-', capacity=100)
+        now = timezone.now().replace(microsecond=0)
+        # Lotes de tres lecturas con el mismo timestamp: el desempate es el id
+        SensorReading.objects.bulk_create(
+            SensorReading(compost_unit=cls.unit, timestamp=now - timedelta(minutes=n // 3),
+                          temperature=40)
+            for n in range(23)
+        )
+        SensorReading.objects.create(compost_unit=cls.other, timestamp=now, temperature=40)
+        cls.expected = list(
+            SensorReading.objects.filter(compost_unit=cls.unit)
+            .order_by('-timestamp', '-id').values_list('pk', flat=True)
+        )
+
+    def paginate(self, cursor=None):
+        return keyset_paginate(SensorReading.objects.filter(compost_unit=self.unit),
+                               cursor, per_page=5)
+
+    def walk_forward(self):
+        pages, cursor = [], None
+        while True:
+            page = self.paginate(cursor)
+            pages.append(page)
+            if not page.has_next():
+                return pages
+            cursor = page.next_cursor
+
+    def test_forward_walk_visits_every_reading_once_in_order(self):
+        pages = self.walk_forward()
+        self.assertEqual([len(page) for page in pages], [5, 5, 5, 5, 3])
+        self.assertEqual([r.pk for page in pages for r in page], self.expected)
+        self.assertFalse(pages[0].has_previous())
+        self.assertTrue(all(page.has_previous() for page in pages[1:]))
+
+    def test_previous_cursor_returns_the_same_page(self):
+        pages = self.walk_forward()
+        for newer, older in zip(pages, pages[1:]):
+            page = self.paginate(older.previous_cursor)
+            self.assertEqual([r.pk for r in page], [r.pk for r in newer])
+            self.assertTrue(page.has_next())
+        # La primera página alcanzada hacia atrás no ofrece "anterior"
+        self.assertFalse(self.paginate(pages[1].previous_cursor).has_previous())
+
+    def test_invalid_cursor_restarts_from_the_first_page(self):
+        first = [r.pk for r in self.paginate()]
+        for token in ('basura', encode_cursor({'d': 'next'}), encode_cursor({'d': 'up', 'k': [1, 2]}),
+                      encode_cursor({'d': 'next', 'k': [1]})):
+            with self.subTest(token=token):
+                self.assertEqual([r.pk for r in self.paginate(token)], first)
+
+    def test_cursor_round_trip(self):
+        payload = {'d': 'prev', 'k': ['2024-01-01T00:00:00+00:00', 7]}
+        self.assertEqual(decode_cursor(encode_cursor(payload)), payload)
+        with self.assertRaises(ValueError):
+            decode_cursor('%%%')
+
+
+@override_settings(CACHES=LOCAL_CACHES, STORAGES=PLAIN_STORAGES)
+class UnitDetailPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('viewer', password='x')
+        cls.unit = CompostUnit.objects.create(owner=cls.owner, name='Pila', location='-', capacity=100)
+        now = timezone.now()
+        for n in range(25):
+            SensorReading.objects.create(compost_unit=cls.unit, temperature=40,
+                                         timestamp=now - timedelta(minutes=n))
+
+    def setUp(self):
+        self.client.force_login(self.owner)
+
+    def test_pages_through_the_history_with_cursors(self):
+        url = reverse('unit_detail', args=[self.unit.pk])
+        first = self.client.get(url).context['readings_page']
+        self.assertEqual(len(first), 20)
+        self.assertEqual(first.approx_total, 25)
+        second = self.client.get(url, {'cursor': first.next_cursor}).context['readings_page']
+        self.assertEqual(len(second), 5)
+        self.assertFalse(second.has_next())
+        self.assertEqual({r.pk for r in first} | {r.pk for r in second},
+                         set(SensorReading.objects.values_list('pk', flat=True)))
+        back = self.client.get(url, {'cursor': second.previous_cursor}).context['readings_page']
+        self.assertEqual([r.pk for r in back], [r.pk for r in first])
@@ -0,0 +1,35 @@
+import os
+import tempfile
+import time
+import uuid
+
+from django.test import SimpleTestCase, override_settings
+
+from authentication.singleflight import single_flight
+
+
+class SingleFlightTests(SimpleTestCase):
+    def setUp(self):
+        runtime_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(runtime_dir.cleanup)
+        self.lock_dir = os.path.join(runtime_dir.name, 'singleflight')
+        settings = override_settings(RUNTIME_DIR=runtime_dir.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_nested_flights_do_not_wait_for_each_other(self):
+        # 65 claves anidadas: con 64 candados repartidos por hash, dos coincidían
+        run = uuid.uuid4().hex
+
+        def nested(depth):
+            if depth == 65:
+                return depth
+            return single_flight(('nested', run, depth), lambda: nested(depth + 1), timeout=5)
+
+        started = time.monotonic()
+        self.assertEqual(nested(0), 65)
+        self.assertLess(time.monotonic() - started, 5)
+
+    def test_lock_file_is_removed_after_flight(self):
+        self.assertEqual(single_flight(('cleanup', uuid.uuid4().hex), lambda: 1), 1)
+        self.assertEqual(os.listdir(self.lock_dir), [])
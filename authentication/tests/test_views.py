@@ -0,0 +1,40 @@
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from authentication.models import CompostUnit, SensorReading, compost_phase
+
+# Cachés en memoria: las pruebas no escriben en los cachés de archivo de RUNTIME_DIR
+LOCAL_CACHES = {
+    name: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': name}
+    for name in ('default', 'reports', 'singleflight')
+}
+# Sin collectstatic no hay manifiesto: los estáticos se resuelven sin hash
+PLAIN_STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+
+@override_settings(CACHES=LOCAL_CACHES, STORAGES=PLAIN_STORAGES)
+class ReadingWithoutTemperatureTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('operator', password='x')
+        cls.unit = CompostUnit.objects.create(owner=cls.user, name='Pila', location='-', capacity=100)
+        SensorReading.objects.create(compost_unit=cls.unit, temperature=None, humidity=55)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_phase_is_none_without_temperature(self):
+        self.assertIsNone(compost_phase(None))
+        self.assertEqual(compost_phase(55), 'Fase Termófila')
+
+    def test_dashboard_renders(self):
+        response = self.client.get(reverse('dashboard'))
+        self.assertContains(response, 'Sin temperatura')
+
+    def test_unit_detail_renders(self):
+        response = self.client.get(reverse('unit_detail', args=[self.unit.pk]))
+        self.assertContains(response, 'Sin temperatura')
@@ -0,0 +1,142 @@
+# authentication/timeline.py
+"""Línea de tiempo de actividad de una unidad.
+
+Lecturas, registros de monitoreo, entradas de material y cosechas viven en
+tablas separadas, cada una con un índice (unidad, fecha, id). La línea de
+tiempo abre un cursor por fuente que lee en bloques desde ese índice y las
+mezcla con heapq.merge: solo se consumen las filas que la página necesita.
+
+El orden global es (fecha, fuente, id) descendente, de modo que el cursor de
+continuación (fecha, fuente, id) es único aunque dos eventos coincidan en la
+fecha.
+"""
+import heapq
+from itertools import islice
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from .catalog import catalog
+from .pagination import decode_cursor, encode_cursor
+
+
+def _float(value):
+    return float(value) if value is not None else None
+
+
+def _reading(row):
+    return {
+        'temperature': _float(row['temperature']), 'ph': _float(row['ph']),
+        'humidity': row['humidity'], 'oxygen': row['oxygen'],
+    }
+
+
+def _log(row):
+    return {
+        'temperature': _float(row['temperature']), 'ph_level': _float(row['ph_level']),
+        'moisture_level': row['moisture_level'], 'pest_presence': row['pest_presence'],
+        'turning_performed': row['turning_performed'], 'notes': row['notes'],
+    }
+
+
+def _entry(row):
+    material = catalog.get(row['material_id'])
+    return {
+        'material': material.name if material else None,
+        'quantity': _float(row['quantity']), 'notes': row['notes'],
+    }
+
+
+def _harvest(row):
+    return {
+        'quantity': _float(row['quantity']), 'quality_grade': row['quality_grade'],
+        'compost_age_days': row['compost_age_days'], 'notes': row['notes'],
+    }
+
+
+def _sources():
+    from .models import CompostEntry, CompostHarvest, MonitoringLog, SensorReading
+
+    # (tipo, modelo, campo de fecha, columnas, serializador); la posición es el rango
+    return (
+        ('reading', SensorReading, 'timestamp',
+         ('temperature', 'ph', 'humidity', 'oxygen'), _reading),
+        ('log', MonitoringLog, 'date_recorded',
+         ('temperature', 'ph_level', 'moisture_level', 'pest_presence',
+          'turning_performed', 'notes'), _log),
+        ('entry', CompostEntry, 'date_added', ('material_id', 'quantity', 'notes'), _entry),
+        ('harvest', CompostHarvest, 'harvest_date',
+         ('quantity', 'quality_grade', 'compost_age_days', 'notes'), _harvest),
+    )
+
+
+SOURCE_TYPES = ('reading', 'log', 'entry', 'harvest')
+
+
+def _stream(rank, kind, model, date_field, columns, serialize, unit_id, before, chunk_size):
+    """Genera (fecha, rango, id, evento) de una fuente en orden descendente.
+
+    Cada bloque es una búsqueda en el índice (unidad, fecha, id) a partir de
+    la última fila entregada.
+    """
+    queryset = model.objects.filter(compost_unit_id=unit_id).order_by(f'-{date_field}', '-id')
+    fields = ('id', date_field) + tuple(columns)
+
+    if before is not None:
+        ts, cursor_rank, pk = before
+        if rank < cursor_rank:
+            condition = Q(**{f'{date_field}__lte': ts})
+        elif rank > cursor_rank:
+            condition = Q(**{f'{date_field}__lt': ts})
+        else:
+            condition = Q(**{f'{date_field}__lte': ts}) & (
+                Q(**{f'{date_field}__lt': ts}) | Q(**{date_field: ts, 'id__lt': pk})
+            )
+    else:
+        condition = Q()
+
+    while True:
+        rows = list(queryset.filter(condition).values(*fields)[:chunk_size])
+        for row in rows:
+            event = {'type': kind, 'id': row['id'], 'timestamp': row[date_field].isoformat()}
+            event.update(serialize(row))
+            yield row[date_field], rank, row['id'], event
+        if len(rows) < chunk_size:
+            return
+        last = rows[-1]
+        condition = Q(**{f'{date_field}__lte': last[date_field]}) & (
+            Q(**{f'{date_field}__lt': last[date_field]})
+            | Q(**{date_field: last[date_field], 'id__lt': last['id']})
+        )
+
+
+def unit_timeline(unit_id, cursor=None, per_page=50, types=SOURCE_TYPES):
+    """Devuelve (eventos, cursor siguiente) de la línea de tiempo de una unidad.
+
+    `cursor` es el token devuelto por la página anterior; un cursor inválido
+    vuelve al principio.
+    """
+    before = None
+    if cursor:
+        try:
+            ts, rank, pk = decode_cursor(cursor)
+            before = (parse_datetime(ts), int(rank), int(pk))
+            if before[0] is None:
+                raise ValueError
+        except (ValueError, TypeError):
+            before = None
+
+    # Ninguna fuente puede aportar más de per_page + 1 filas a esta página
+    streams = [
+        _stream(rank, *source, unit_id=unit_id, before=before, chunk_size=per_page + 1)
+        for rank, source in enumerate(_sources())
+        if source[0] in types
+    ]
+    merged = heapq.merge(*streams, key=lambda item: item[:3], reverse=True)
+    page = list(islice(merged, per_page + 1))
+
+    next_cursor = None
+    if len(page) > per_page:
+        ts, rank, pk, _ = page[per_page - 1]
+        next_cursor = encode_cursor([ts.isoformat(), rank, pk])
+    return [item[3] for item in page[:per_page]], next_cursor
@@ -11,14 +11,37 @@ urlpatterns = [
     # Gestión de unidades
     path('units/', views.manage_units, name='manage_units'),
     path('units/create/', views.create_unit, name='create_unit'),
+    path('units/compare/', views.compare_units, name='compare_units'),
+    path('units/percentiles/', views.reading_percentiles, name='reading_percentiles'),
+    path('units/export/', views.export_bundle_job, name='export_bundle'),
     path('units/<uuid:unit_id>/', views.unit_detail, name='unit_detail'),
     path('units/<uuid:unit_id>/delete/', views.delete_unit, name='delete_unit'),
+    path('units/<uuid:unit_id>/balance/', views.unit_balance, name='unit_balance'),
+    path('units/<uuid:unit_id>/timeline/', views.unit_timeline_view, name='unit_timeline'),
+    path('units/<uuid:unit_id>/series/', views.unit_series, name='unit_series'),
+    path('units/<uuid:unit_id>/export/', views.export_readings_job, name='export_readings_job'),
     
+    # Búsqueda de texto completo
+    path('search/', views.search_view, name='search'),
+
+    # Mapa público de unidades
+    path('map/units/', views.public_map_units, name='public_map_units'),
+
     # Estadísticas
     path('statistics/', views.statistics, name='statistics'),
+    path('statistics/pdf/', views.statistics_pdf, name='statistics_pdf'),
+    path('yields/', views.yield_report_view, name='yield_report'),
     
     # Datos de demostración
     path('create-demo-data/', views.create_demo_data, name='create_demo_data'),
     path('auth/units/<uuid:unit_id>/export_pdf/', views.export_readings_pdf, name='export_readings_pdf'),
+
+    # Trabajos en segundo plano
+    path('jobs/<int:job_id>/', views.job_detail, name='job_detail'),
+    path('jobs/<int:job_id>/result/', views.job_result, name='job_result'),
+    path('jobs/<int:job_id>/cancel/', views.job_cancel, name='job_cancel'),
+
+    # API para dispositivos (clave de API, sin sesión)
+    path('api/readings/', views.api_ingest_readings, name='api_ingest_readings'),
     
 ]
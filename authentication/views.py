@@ -1,18 +1,54 @@
 # authentication/views.py
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.core.paginator import Paginator
 from django.db.models import Q, Avg, Count
 from django.utils import timezone
-from django.http import JsonResponse
-from datetime import timedelta
+from django.http import FileResponse, Http404, HttpResponseNotModified, JsonResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import require_GET, require_POST
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.utils._os import safe_join
+import os
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+import hashlib
 import json
 import random
-from .models import CompostMaterial
-from .models import CompostUnit, SensorReading, UserProfile
+import uuid
+from .models import CompostBalance, CompostMaterial, Job, YieldSummary
+from .models import CompostUnit, SensorReading, UserProfile, compost_phase
 from .forms import CustomUserCreationForm, CompostUnitForm
+from .apikeys import device_key_required
+from .assets import HASHED_NAME, IMMUTABLE_MAX_AGE, content_type, pick_variant
+from .balance import what_if
+from .bundles import FORMATS as BUNDLE_FORMATS, parse_day
+from .catalog import catalog
+from .deletion import soft_delete_units
+from .geo import map_clusters, map_points
+from .jobs import cancel, enqueue, result_path
+from .ingest import METRICS, parse_record, reading_limits, store_readings
+from .pagination import keyset_paginate
+from .reports import (
+    METRIC_LABELS, cached_report, prepare_chart_data, readings_rows, render_statistics_pdf,
+    shared_statistics_data, statistics_version, units_version, write_readings_pdf,
+)
+from .routers import use_replica
+from .search import KINDS as SEARCH_KINDS, SEARCH_LIMIT, search
+from .series import (
+    AGGREGATIONS, FILLS, auto_step, fleet_bands, load_columns, load_unit_columns, nan_to_none,
+    parse_hours, parse_step, resample, resample_groups, to_lists,
+)
+from .singleflight import single_flight
+from .sketches import recent_window, sketch_summary
+from .sparklines import WINDOWS as SPARKLINE_WINDOWS, polylines, series as sparkline_series
+from .timeline import SOURCE_TYPES, unit_timeline
+from .writer import run_write
+from .yields import GROUPS, yield_report
 from django.contrib.auth.forms import AuthenticationForm
 from django.shortcuts import render, redirect
 from django.contrib.auth.forms import UserCreationForm
@@ -36,74 +72,81 @@ def welcome_view(request):
 
 
 @login_required
+@use_replica
 def export_readings_pdf(request, unit_id):
     unit = get_object_or_404(CompostUnit, id=unit_id, owner=request.user)
     readings = SensorReading.objects.filter(compost_unit=unit).order_by('timestamp')
 
+    # ?step=1h&agg=mean&fill=none exporta la serie remuestreada en lugar de cada lectura
+    try:
+        rows = readings_rows(readings, request.GET.get('step'),
+                             request.GET.get('agg', 'mean'), request.GET.get('fill', 'none'))
+    except ValueError:
+        return HttpResponse('Parámetros de remuestreo inválidos.', status=400)
+
     # Crear respuesta HTTP con tipo PDF
     response = HttpResponse(content_type='application/pdf')
     response['Content-Disposition'] = f'attachment; filename="{unit.name}_readings.pdf"'
+    write_readings_pdf(response, unit, rows)
+    return response
 
-    # Crear el objeto PDF
-    p = canvas.Canvas(response, pagesize=letter)
-    width, height = letter
-
-    # Título
-    p.setFont("Helvetica-Bold", 16)
-    p.drawString(72, height - 72, f"Registros de sensores - Unidad: {unit.name}")
-
-    # Encabezados de tabla
-    p.setFont("Helvetica-Bold", 12)
-    y = height - 100
-    p.drawString(72, y, "Fecha y hora")
-    p.drawString(180, y, "Temperatura (°C)")
-    p.drawString(320, y, "Humedad (%)")
-    p.drawString(420, y, "pH")
-    p.drawString(470, y, "Oxígeno (%)")
-
-    # Contenido
-    p.setFont("Helvetica", 10)
-    y -= 20
-    line_height = 15
-    max_lines_per_page = 40
-    lines_written = 0
-
-    for reading in readings:
-        if y < 72:  # Nueva página si llegamos al final
-            p.showPage()
-            y = height - 72
-            lines_written = 0
-            # Repetir encabezados en nueva página
-            p.setFont("Helvetica-Bold", 12)
-            p.drawString(72, y, "Fecha y hora")
-            p.drawString(180, y, "Temperatura (°C)")
-            p.drawString(320, y, "Humedad (%)")
-            p.drawString(420, y, "pH")
-            p.drawString(470, y, "Oxígeno (%)")
-            p.setFont("Helvetica", 10)
-            y -= 20
-
-        p.drawString(72, y, reading.timestamp.strftime('%Y-%m-%d %H:%M:%S'))
-        p.drawString(180, y, str(reading.temperature if reading.temperature is not None else '-'))
-        p.drawString(320, y, str(reading.humidity if reading.humidity is not None else '-'))
-        p.drawString(420, y, str(reading.ph if reading.ph is not None else '-'))
-        p.drawString(470, y, str(reading.oxygen if reading.oxygen is not None else '-'))
-
-        y -= line_height
-        lines_written += 1
-
-    p.showPage()
-    p.save()
 
-    return response
 
+@require_POST
+@device_key_required
+def api_ingest_readings(request):
+    """Recibe lecturas de un sensor o gateway autenticado con clave de API.
+
+    Acepta un objeto JSON o una lista; cada lectura indica `unit` (id de la
+    unidad, opcional si la clave es de una sola unidad), `timestamp` opcional
+    y las métricas temperature, ph, humidity y oxygen.
+    """
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'error': 'JSON inválido.'}, status=400)
+    records = payload if isinstance(payload, list) else [payload]
+
+    unit_ids = request.device.unit_ids
+    default_unit = next(iter(unit_ids)) if len(unit_ids) == 1 else None
+    limits = reading_limits()
+    rows, errors = [], []
+    for index, record in enumerate(records):
+        if not isinstance(record, dict):
+            errors.append({'index': index, 'error': 'cada lectura debe ser un objeto'})
+            continue
+        record = dict(record)
+        record.setdefault('timestamp', timezone.now().isoformat())
+        if default_unit and not any(record.get(k) for k in ('unit', 'unit_id', 'compost_unit')):
+            record['unit'] = str(default_unit)
+        try:
+            unit_ref, *values = parse_record(record, limits)
+            unit_id = uuid.UUID(unit_ref)
+        except ValueError as exc:
+            errors.append({'index': index, 'error': str(exc)})
+            continue
+        if unit_id not in unit_ids:
+            errors.append({'index': index, 'error': 'unidad no autorizada para esta clave'})
+            continue
+        rows.append((unit_id, *values))
+
+    inserted = duplicates = 0
+    if rows:
+        inserted, duplicates, skipped = run_write(store_readings, rows)
+        if skipped:
+            errors.append({'index': None, 'error': f'{skipped} lecturas de unidades borradas'})
+    status = 201 if inserted else (400 if errors and not duplicates else 200)
+    return JsonResponse(
+        {'inserted': inserted, 'duplicates': duplicates, 'errors': errors},
+        status=status,
+    )
 
 
 def register(request):
     if request.method == 'POST':
         form = UserCreationForm(request.POST)
         if form.is_valid():
-            form.save()
+            run_write(form.save)
             messages.success(request, "Registro exitoso. Ahora puedes iniciar sesión.")
             return redirect('login')
     else:
@@ -143,15 +186,19 @@ def register_view(request):
     if request.method == 'POST':
         form = CustomUserCreationForm(request.POST)
         if form.is_valid():
-            user = form.save()
+            def create_account():
+                user = form.save()
+                # Crear el perfil solo si no existe
+                organization = form.cleaned_data.get('organization')
+                if organization:
+                    UserProfile.objects.get_or_create(
+                        user=user, defaults={'organization': organization}
+                    )
+
+            run_write(create_account)
             username = form.cleaned_data.get('username')
             messages.success(request, f'Cuenta creada exitosamente para {username}!')
 
-            # Crear el perfil solo si no existe
-            organization = form.cleaned_data.get('organization')
-            if organization:
-                UserProfile.objects.get_or_create(user=user, defaults={'organization': organization})
-
             user = authenticate(
                 username=form.cleaned_data['username'],
                 password=form.cleaned_data['password1']
@@ -166,10 +213,9 @@ def register_view(request):
     return render(request, 'authentication/register.html', {'form': form})
 
 
-@login_required
-def dashboard(request):
-    user_units = CompostUnit.objects.filter(owner=request.user)
-    active_units = user_units.filter(status='active').count()
+def _dashboard_data(user):
+    user_units = list(CompostUnit.objects.filter(owner=user))
+    active_units = sum(unit.status == 'active' for unit in user_units)
     total_capacity = sum(unit.capacity for unit in user_units)
 
     recent_data = []
@@ -182,26 +228,67 @@ def dashboard(request):
                 'phase': latest_reading.get_compost_phase()
             })
 
-    context = {
+    return {
         'user_units': user_units,
         'active_units': active_units,
         'total_capacity': total_capacity,
         'recent_data': recent_data,
     }
+
+
+@login_required
+def dashboard(request):
+    # Operadores que abren el panel a la vez comparten un mismo cálculo
+    context = single_flight(
+        ('dashboard', request.user.pk, units_version(request.user)),
+        lambda: _dashboard_data(request.user),
+    )
     return render(request, 'authentication/dashboard.html', context)
 
 
 @login_required
 def manage_units(request):
     units_list = CompostUnit.objects.filter(owner=request.user).order_by('-created_at')
-    paginator = Paginator(units_list, 10)
+    window = request.GET.get('window')
+    if window not in SPARKLINE_WINDOWS:
+        window = 'day'
+    # Los minigráficos vienen en la misma consulta que la página
+    paginator = Paginator(units_list.select_related('sparkline'), 10)
     page_obj = paginator.get_page(request.GET.get('page'))
+    for unit in page_obj:
+        unit.trends = _unit_trends(unit, window)
+        # Fase según la última temperatura del minigráfico, sin leer las lecturas
+        temperature = next((trend['last'] for trend in unit.trends
+                            if trend['metric'] == 'temperature'), None)
+        unit.phase = None if temperature is None else compost_phase(temperature)
     return render(request, 'authentication/manage_units.html', {
         'page_obj': page_obj,
         'total_units': units_list.count(),
+        'window': window,
+        'export_organization': can_export_organization(request.user),
     })
 
 
+def _unit_trends(unit, window):
+    """Minigráficos de una unidad desde su fila precalculada, sin consultas"""
+    try:
+        sparkline = unit.sparkline
+    except CompostUnit.sparkline.RelatedObjectDoesNotExist:
+        return []
+    trends = []
+    for metric in METRICS:
+        values = sparkline_series(sparkline, window, metric)
+        present = [value for value in values if value is not None]
+        if not present:
+            continue
+        label, suffix = METRIC_LABELS[metric]
+        trends.append({
+            'metric': metric, 'label': label, 'suffix': suffix, 'lines': polylines(values),
+            'last': present[-1], 'low': min(present), 'high': max(present),
+        })
+    return trends
+
+
 @login_required
 def create_unit(request):
     if request.method == 'POST':
@@ -209,7 +296,7 @@ def create_unit(request):
         if form.is_valid():
             unit = form.save(commit=False)
             unit.owner = request.user
-            unit.save()
+            run_write(unit.save)
             messages.success(request, f'Unidad "{unit.name}" creada exitosamente!')
             return redirect('manage_units')
         messages.error(request, 'Por favor corrige los errores en el formulario.')
@@ -218,9 +305,18 @@ def create_unit(request):
     return render(request, 'authentication/create_unit.html', {'form': form})
 
 
+def _unit_balance(unit):
+    try:
+        return unit.balance
+    except CompostUnit.balance.RelatedObjectDoesNotExist:
+        return None
+
+
 @login_required
 def unit_detail(request, unit_id):
-    unit = get_object_or_404(CompostUnit, id=unit_id, owner=request.user)
+    unit = get_object_or_404(
+        CompostUnit.objects.select_related('balance'), id=unit_id, owner=request.user
+    )
     latest_reading = unit.get_latest_reading()
     
     recent_readings = SensorReading.objects.filter(
@@ -230,11 +326,17 @@ def unit_detail(request, unit_id):
 
     chart_data = prepare_chart_data(recent_readings)
 
-    readings_list = SensorReading.objects.filter(compost_unit=unit).order_by('-timestamp')
-    readings_page = Paginator(readings_list, 20).get_page(request.GET.get('page'))
+    # Paginación por cursor: sin COUNT(*) ni OFFSET sobre el historial completo
+    readings_page = keyset_paginate(
+        SensorReading.objects.filter(compost_unit=unit),
+        cursor=request.GET.get('cursor'),
+        per_page=20,
+        approx_total=unit.reading_count,
+    )
 
     return render(request, 'authentication/unit_detail.html', {
         'unit': unit,
+        'balance': _unit_balance(unit),
         'latest_reading': latest_reading,
         'recent_readings': recent_readings,
         'readings_page': readings_page,
@@ -248,77 +350,257 @@ def unit_detail(request, unit_id):
 
 
 @login_required
-def delete_unit(request, unit_id):
-    unit = get_object_or_404(CompostUnit, id=unit_id, owner=request.user)
-    if request.method == 'POST':
-        unit_name = unit.name
-        unit.delete()
-        messages.success(request, f'Unidad "{unit_name}" eliminada exitosamente.')
-        return redirect('manage_units')
-    return render(request, 'authentication/delete_unit_confirm.html', {'unit': unit})
+def unit_balance(request, unit_id):
+    """Balance C/N de la unidad y simulación de nuevas entradas.
+
+    `?material=<id>&quantity=<kg>` (repetibles) devuelve además el balance
+    proyectado; no recorre las entradas de la unidad.
+    """
+    unit = get_object_or_404(
+        CompostUnit.objects.select_related('balance'), id=unit_id, owner=request.user
+    )
+    materials = request.GET.getlist('material')
+    quantities = request.GET.getlist('quantity')
+    if len(materials) != len(quantities):
+        return JsonResponse({'error': 'Cada material necesita su cantidad.'}, status=400)
+    try:
+        additions = [(int(m), Decimal(q)) for m, q in zip(materials, quantities)]
+    except (ValueError, InvalidOperation):
+        return JsonResponse({'error': 'Material o cantidad inválidos.'}, status=400)
+    try:
+        result = what_if(_unit_balance(unit), additions)
+    except (ValueError, InvalidOperation) as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    result['unit'] = str(unit.pk)
+    result['target_cn'] = list(CompostBalance.TARGET_CN)
+    return JsonResponse(result)
 
-def prepare_chart_data(readings):
-    labels = []
-    temperature = []
-    ph = []
-    humidity = []
-    oxygen = []
 
-    # Ordenar cronológicamente las lecturas
-    readings = readings.order_by('timestamp')
+@login_required
+@use_replica
+def unit_timeline_view(request, unit_id):
+    """Actividad de la unidad (lecturas, monitoreo, entradas y cosechas) por páginas.
+
+    `?types=reading,log,entry,harvest` filtra las fuentes y `?cursor=`
+    continúa desde la página anterior.
+    """
+    unit = get_object_or_404(CompostUnit.objects.only('id'), id=unit_id, owner=request.user)
+    types = [t for t in request.GET.get('types', '').split(',') if t in SOURCE_TYPES]
+    try:
+        per_page = min(max(int(request.GET.get('per_page', 50)), 1), 500)
+    except ValueError:
+        per_page = 50
+    events, next_cursor = unit_timeline(
+        unit.pk, cursor=request.GET.get('cursor'), per_page=per_page,
+        types=types or SOURCE_TYPES,
+    )
+    return JsonResponse({'unit': str(unit.pk), 'events': events, 'next_cursor': next_cursor})
 
-    for r in readings:
-        labels.append(r.timestamp.strftime('%d/%m %H:%M'))  # formato fecha/hora
-        temperature.append(float(r.temperature) if r.temperature is not None else None)
-        ph.append(float(r.ph) if r.ph is not None else None)
-        humidity.append(r.humidity if r.humidity is not None else None)
-        oxygen.append(r.oxygen if r.oxygen is not None else None)
 
-    return {
-        'labels': labels,
-        'temperature': temperature,
-        'ph': ph,
-        'humidity': humidity,
-        'oxygen': oxygen,
-    }
+@login_required
+@use_replica
+def unit_series(request, unit_id):
+    """Lecturas de la unidad remuestreadas a una grilla regular (JSON).
+
+    Parámetros: `hours` (ventana, 24 por defecto), `step` (5m, 1h, ... o
+    segundos; automático si falta), `agg` (mean, last, min, max) y `fill`
+    (none, ffill, linear).
+    """
+    unit = get_object_or_404(CompostUnit.objects.only('id'), id=unit_id, owner=request.user)
+    try:
+        hours = parse_hours(request.GET.get('hours', 24))
+        step = parse_step(request.GET['step']) if request.GET.get('step') else None
+        agg = request.GET.get('agg', 'mean')
+        fill = request.GET.get('fill', 'none')
+        end = timezone.now()
+        start = end - timedelta(hours=hours)
+        readings = SensorReading.objects.filter(
+            compost_unit=unit, timestamp__gte=start, timestamp__lte=end
+        )
+        ts, values = load_columns(readings)
+        step = step or auto_step(hours * 3600)
+        grid, matrix = resample(ts, values, step, agg=agg, fill=fill,
+                                start=start.timestamp() // step * step, end=end.timestamp())
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc) or 'Parámetros inválidos.'}, status=400)
+    return JsonResponse({
+        'unit': str(unit.pk),
+        'step': step,
+        'agg': agg,
+        'fill': fill,
+        'timestamps': [int(t) for t in grid.tolist()],
+        'series': {metric: nan_to_none(matrix[:, i]) for i, metric in enumerate(METRICS)},
+    })
+
 
+# Límite de unidades por comparación para acotar la matriz de respuesta
+MAX_COMPARE_UNITS = 200
 
 
 @login_required
-def statistics(request):
-    user_units = CompostUnit.objects.filter(owner=request.user)
-    total_readings = SensorReading.objects.filter(compost_unit__owner=request.user).count()
+@use_replica
+def compare_units(request):
+    """Una métrica de varias unidades sobre una grilla común (JSON).
+
+    `?units=<id>&units=<id>...` (por defecto todas las del usuario), `metric`,
+    `hours`, `step`, `agg` y `fill` como en unit_series. Todas las series se
+    leen en una sola consulta; la respuesta incluye la matriz unidad × tiempo,
+    la media de la flota y bandas de percentiles.
+    """
+    metric = request.GET.get('metric', 'temperature')
+    if metric not in METRICS:
+        return JsonResponse({'error': f'Métrica inválida; opciones: {", ".join(METRICS)}.'},
+                            status=400)
+    units = CompostUnit.objects.filter(owner=request.user).order_by('name')
+    requested = request.GET.getlist('units')
+    if requested:
+        try:
+            units = units.filter(pk__in=[uuid.UUID(value) for value in requested])
+        except ValueError:
+            return JsonResponse({'error': 'Id de unidad inválido.'}, status=400)
+    units = list(units.values_list('pk', 'name')[:MAX_COMPARE_UNITS + 1])
+    if len(units) > MAX_COMPARE_UNITS:
+        return JsonResponse({'error': f'Como máximo {MAX_COMPARE_UNITS} unidades.'}, status=400)
+    unit_ids = [pk for pk, _ in units]
+
+    try:
+        hours = parse_hours(request.GET.get('hours', 24))
+        step = parse_step(request.GET['step']) if request.GET.get('step') else auto_step(hours * 3600)
+        agg = request.GET.get('agg', 'mean')
+        fill = request.GET.get('fill', 'none')
+        end = timezone.now()
+        start = end - timedelta(hours=hours)
+        groups, ts, values = load_unit_columns(
+            SensorReading.objects.filter(timestamp__gte=start, timestamp__lte=end),
+            metric, unit_ids,
+        )
+        grid, matrix = resample_groups(
+            groups, len(unit_ids), ts, values, step, agg=agg, fill=fill,
+            start=start.timestamp() // step * step, end=end.timestamp(),
+        )
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc) or 'Parámetros inválidos.'}, status=400)
+
+    mean, bands = fleet_bands(matrix)
+    return JsonResponse({
+        'metric': metric,
+        'step': step,
+        'agg': agg,
+        'fill': fill,
+        'timestamps': [int(t) for t in grid.tolist()],
+        'units': [{'id': str(pk), 'name': name} for pk, name in units],
+        'matrix': [nan_to_none(row) for row in matrix],
+        'mean': nan_to_none(mean),
+        'bands': {f'p{p}': nan_to_none(band) for p, band in bands.items()},
+    })
 
-    unit_stats = []
-    for unit in user_units:
-        readings = SensorReading.objects.filter(compost_unit=unit)
-        if readings.exists():
-            stats = readings.aggregate(
-                avg_temp=Avg('temperature'),
-                avg_ph=Avg('ph'),
-                avg_humidity=Avg('humidity'),
-                avg_oxygen=Avg('oxygen'),
-                count=Count('id')
-            )
-            stats.update({
-                'unit': unit,
-                'latest': readings.order_by('-timestamp').first()
-            })
-            unit_stats.append(stats)
 
-    recent_readings = SensorReading.objects.filter(
-        compost_unit__owner=request.user
-    ).order_by('-timestamp')[:100]
+@login_required
+@use_replica
+def reading_percentiles(request):
+    """Percentiles aproximados de las unidades del usuario (JSON).
+
+    `?metric=` (repetible; por defecto todas), `from`/`to` en AAAA-MM-DD
+    (por defecto los últimos 30 días), `units` como en compare_units y
+    `per_unit=1` para incluir el detalle por unidad. Sale de los t-digest
+    diarios, sin recorrer las lecturas.
+    """
+    metrics = request.GET.getlist('metric') or list(METRICS)
+    if any(metric not in METRICS for metric in metrics):
+        return JsonResponse({'error': f'Métrica inválida; opciones: {", ".join(METRICS)}.'},
+                            status=400)
+    units = CompostUnit.objects.filter(owner=request.user)
+    try:
+        if request.GET.getlist('units'):
+            units = units.filter(pk__in=[uuid.UUID(value) for value in request.GET.getlist('units')])
+        start, end = recent_window()
+        start = parse_day(request.GET.get('from')) or start
+        end = parse_day(request.GET.get('to')) or end
+    except ValueError:
+        return JsonResponse({'error': 'Id de unidad o fecha inválidos.'}, status=400)
+    unit_ids = list(units.values_list('pk', flat=True))
+    fleet, per_unit = sketch_summary(unit_ids, start, end, metrics)
+    data = {'from': start.isoformat(), 'to': end.isoformat(), 'units': len(unit_ids),
+            'fleet': fleet}
+    if request.GET.get('per_unit') == '1':
+        data['per_unit'] = {str(pk): summary for pk, summary in per_unit.items()}
+    return JsonResponse(data)
 
-    chart_data = prepare_chart_data(recent_readings)
 
-    materiales = CompostMaterial.objects.filter(is_recommended=True)
-    materiales_labels = [m.name for m in materiales]
-    materiales_data = [float(m.carbon_nitrogen_ratio) for m in materiales]
+@login_required
+@use_replica
+def search_view(request):
+    """Búsqueda de texto completo en unidades, materiales y notas (JSON).
+
+    `?q=` con las palabras a buscar (todas deben aparecer, como prefijo),
+    `kind=` (repetible) para limitar los tipos y `limit=` (hasta 100). Solo
+    unidades propias; el personal puede pedir `scope=all`.
+    """
+    kinds = request.GET.getlist('kind') or list(SEARCH_KINDS)
+    if any(kind not in SEARCH_KINDS for kind in kinds):
+        return JsonResponse({'error': f'Tipo inválido; opciones: {", ".join(SEARCH_KINDS)}.'},
+                            status=400)
+    try:
+        limit = min(max(int(request.GET.get('limit', SEARCH_LIMIT)), 1), 100)
+    except ValueError:
+        return JsonResponse({'error': 'limit debe ser un entero.'}, status=400)
+    owner = None if request.user.is_staff and request.GET.get('scope') == 'all' else request.user
+    results = search(request.GET.get('q', ''), kinds, owner, limit, using=CompostUnit.objects.db)
+    for result in results:
+        result['url'] = (reverse('unit_detail', args=[result['unit_id']])
+                         if result['unit_id'] else None)
+        result['id'] = str(result['id'])
+        result['unit_id'] = result['unit_id'] and str(result['unit_id'])
+    return JsonResponse({'query': request.GET.get('q', ''), 'results': results})
+
+
+@use_replica
+@cache_control(public=True, max_age=60)
+def public_map_units(request):
+    """Unidades públicas del área visible del mapa (sin sesión).
+
+    `?bbox=oeste,sur,este,norte&zoom=Z`. Hasta el zoom 14 devuelve
+    agrupaciones precalculadas por celda de geohash; desde el 15, las
+    unidades individuales.
+    """
+    try:
+        west, south, east, north = (float(v) for v in request.GET['bbox'].split(','))
+        zoom = int(request.GET.get('zoom', 10))
+        if not (-90 <= south <= north <= 90 and -180 <= west <= 180 and -180 <= east <= 180):
+            raise ValueError
+    except (KeyError, ValueError):
+        return JsonResponse({'error': 'Parámetro bbox=oeste,sur,este,norte inválido.'}, status=400)
+
+    precision, clusters = map_clusters(south, west, north, east, zoom)
+    if precision is None:
+        return JsonResponse({'zoom': zoom, 'points': map_points(south, west, north, east)})
+    return JsonResponse({'zoom': zoom, 'precision': precision, 'clusters': clusters})
+
+
+@login_required
+def delete_unit(request, unit_id):
+    unit = get_object_or_404(CompostUnit, id=unit_id, owner=request.user)
+    if request.method == 'POST':
+        # La unidad desaparece ya; su historial se borra en segundo plano
+        soft_delete_units([unit], owner=request.user)
+        messages.success(
+            request,
+            f'Unidad "{unit.name}" eliminada. Su historial se está borrando en segundo plano.',
+        )
+        return redirect('manage_units')
+    return render(request, 'authentication/delete_unit_confirm.html', {'unit': unit})
+
+@login_required
+@use_replica
+def statistics(request):
+    data = shared_statistics_data(request.user)
+    chart_data = data['chart']
+    materiales_labels, materiales_data = data['materials']
 
     return render(request, 'authentication/statistics.html', {
-    'total_readings': total_readings,
-    'unit_stats': unit_stats,
+    'total_readings': data['total_readings'],
+    'unit_stats': data['unit_stats'],
+    'percentiles': data['percentiles'],
     'temp_labels': chart_data['labels'],  # sin json.dumps
     'temp_data': chart_data['temperature'],
     'ph_labels': chart_data['labels'],
@@ -331,75 +613,218 @@ def statistics(request):
 })
 
 
+@login_required
+@use_replica
+def statistics_pdf(request):
+    """Informe de estadísticas en PDF con gráficas vectoriales.
+
+    Se cachea por usuario y versión de los datos; la versión sirve también
+    de ETag para que el navegador revalide sin descargar el PDF de nuevo.
+    """
+    version = statistics_version(request.user)
+    etag = f'"{version}"'
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+    else:
+        pdf, _ = cached_report(
+            'statistics', request.user, version,
+            lambda: render_statistics_pdf(request.user,
+                                          **shared_statistics_data(request.user, version)),
+        )
+        response = HttpResponse(pdf, content_type='application/pdf')
+        response['Content-Disposition'] = 'attachment; filename="estadisticas_compost_iot.pdf"'
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@login_required
+@use_replica
+def yield_report_view(request):
+    """Rendimiento de cosechas por unidad, propietario u organización.
+
+    Se arma desde YieldSummary (una fila por unidad y mes), sin recorrer
+    cosechas ni entradas. El personal puede ver todas las unidades.
+    """
+    group = request.GET.get('group', 'unit')
+    if group not in GROUPS:
+        group = 'unit'
+    summaries = YieldSummary.objects.filter(compost_unit__deleted_at__isnull=True)
+    if not (request.user.is_staff and request.GET.get('scope') == 'all'):
+        summaries = summaries.filter(compost_unit__owner=request.user)
+
+    start, end = request.GET.get('from', ''), request.GET.get('to', '')
+    try:
+        if start:
+            summaries = summaries.filter(month__gte=datetime.strptime(start, '%Y-%m').date())
+        if end:
+            summaries = summaries.filter(month__lte=datetime.strptime(end, '%Y-%m').date())
+    except ValueError:
+        messages.error(request, 'Las fechas deben tener el formato AAAA-MM.')
+
+    return render(request, 'authentication/yield_report.html', {
+        'groups': yield_report(summaries, group),
+        'group': group,
+        'scope': request.GET.get('scope', ''),
+        'start': start,
+        'end': end,
+    })
 
 
 @login_required
 def create_demo_data(request):
     if request.method == 'POST':
-        demo_units = [
-            {'name': 'Unidad Demo 1', 'location': 'Jardín Principal', 'capacity': 100.0,
-             'description': 'Unidad de demostración para residuos orgánicos del hogar'},
-            {'name': 'Unidad Demo 2', 'location': 'Área de Compostaje', 'capacity': 200.0,
-             'description': 'Unidad industrial para grandes volúmenes de compost'}
-        ]
-
-        created = 0
-        for data in demo_units:
-            if not CompostUnit.objects.filter(owner=request.user, name=data['name']).exists():
-                unit = CompostUnit.objects.create(owner=request.user, **data)
-                create_demo_sensor_data(unit)
-                created += 1
-
-        if created:
-            messages.success(request, f'Se crearon {created} unidades de demostración.')
-        else:
-            messages.info(request, 'Las unidades de demostración ya existen.')
+        # La siembra corre en segundo plano (ver authentication/tasks.py)
+        job = run_write(enqueue, 'demo_data', {'user_id': request.user.pk}, owner=request.user,
+                        priority=5, dedup_key=f'demo_data:{request.user.pk}')
+        messages.info(request, 'Se están creando las unidades de demostración; '
+                               'aparecerán en unos instantes.')
+        return redirect('job_detail', job_id=job.pk)
 
     return redirect('dashboard')
 
 
-def prepare_chart_data(readings):
-    labels, temperature, humidity, ph, oxygen = [], [], [], [], []
-    for reading in readings:
-        labels.append(reading.timestamp.strftime('%d/%m %H:%M'))
-        temperature.append(float(reading.temperature))
-        humidity.append(float(reading.humidity))
-        ph.append(float(reading.ph))
-        oxygen.append(float(reading.oxygen))
-    return {
-        'labels': labels,
-        'temperature': temperature,
-        'humidity': humidity,
-        'ph': ph,
-        'oxygen': oxygen,
+def _job_payload(job, user):
+    data = {
+        'id': job.pk,
+        'kind': job.kind,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'progress': round(job.progress, 4),
+        'progress_message': job.progress_message,
+        'attempts': job.attempts,
+        'max_attempts': job.max_attempts,
+        'created_at': job.created_at.isoformat(),
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'result': job.result,
+        'result_url': reverse('job_result', args=[job.pk])
+        if job.status == 'done' and job.result_file else None,
     }
+    if job.error:
+        # El detalle completo (traceback) solo para el personal
+        data['error'] = job.error if user.is_staff else job.error.strip().splitlines()[-1]
+    return data
+
+
+def _user_job(request, job_id):
+    jobs = Job.objects.all() if request.user.is_staff else Job.objects.filter(owner=request.user)
+    return get_object_or_404(jobs, pk=job_id)
+
+
+@login_required
+def job_detail(request, job_id):
+    """Estado de un trabajo: JSON para sondear (?format=json) o una página que lo sondea"""
+    job = _user_job(request, job_id)
+    if request.GET.get('format') == 'json' or 'application/json' in request.headers.get('Accept', ''):
+        return JsonResponse(_job_payload(job, request.user))
+    return render(request, 'authentication/job_detail.html', {
+        'job': job, 'job_data': _job_payload(job, request.user),
+    })
+
+
+@login_required
+def job_result(request, job_id):
+    job = _user_job(request, job_id)
+    path = result_path(job)
+    if job.status != 'done' or not path or not os.path.isfile(path):
+        raise Http404('El trabajo no tiene un archivo disponible.')
+    filename = (job.result or {}).get('filename') or os.path.basename(path)
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=filename)
+
+
+@login_required
+@require_POST
+def job_cancel(request, job_id):
+    job = _user_job(request, job_id)
+    cancelled = cancel(job)
+    job.refresh_from_db()
+    return JsonResponse({'cancelled': bool(cancelled), **_job_payload(job, request.user)})
+
+
+def can_export_organization(user):
+    profile = getattr(user, 'profile', None)
+    return bool(profile and profile.organization and (profile.is_verified or user.is_staff))
+
+
+def _exportable_units(user, scope):
+    """Unidades que `user` puede exportar: las propias o las de su organización.
+
+    La organización es texto libre del registro: solo cuenta si el personal
+    verificó el perfil. Exportan la organización los usuarios verificados (o
+    del personal) y solo incluye unidades de dueños verificados.
+    """
+    units = CompostUnit.objects.filter(owner=user)
+    if scope == 'organization' and can_export_organization(user):
+        units = CompostUnit.objects.filter(
+            Q(owner=user) | Q(owner__profile__organization=user.profile.organization,
+                              owner__profile__is_verified=True)
+        )
+    return units
+
+
+@login_required
+@require_POST
+def export_bundle_job(request):
+    """Encola un ZIP con un PDF y/o CSV por unidad, generados en paralelo.
+
+    `scope` es mine u organization; `unit` (repetible) limita a esas unidades.
+    `from`/`to` son días AAAA-MM-DD inclusive.
+    """
+    units = _exportable_units(request.user, request.POST.get('scope', 'mine'))
+    selected = request.POST.getlist('unit')
+    if selected:
+        try:
+            units = units.filter(pk__in=[uuid.UUID(pk) for pk in selected])
+        except ValueError:
+            return HttpResponse('Identificador de unidad inválido.', status=400)
+    formats = [fmt for fmt in BUNDLE_FORMATS if fmt in request.POST.getlist('format')]
+    start, end = request.POST.get('from', ''), request.POST.get('to', '')
+    try:
+        parse_day(start), parse_day(end)
+    except ValueError:
+        return HttpResponse('Las fechas deben tener el formato AAAA-MM-DD.', status=400)
+
+    unit_ids = sorted(str(pk) for pk in units.values_list('pk', flat=True))
+    if not unit_ids:
+        messages.error(request, 'No hay unidades para exportar.')
+        return redirect('manage_units')
+    params = {'unit_ids': unit_ids, 'formats': formats or list(BUNDLE_FORMATS),
+              'start': start or None, 'end': end or None}
+    digest = hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()
+    job = run_write(enqueue, 'export_bundle', params, owner=request.user, priority=3,
+                    dedup_key=f'export_bundle:{request.user.pk}:{digest}')
+    if 'application/json' in request.headers.get('Accept', ''):
+        return JsonResponse(_job_payload(job, request.user), status=202)
+    return redirect('job_detail', job_id=job.pk)
+
+
+@login_required
+@require_POST
+def export_readings_job(request, unit_id):
+    """Encola la exportación en PDF de las lecturas de una unidad"""
+    unit = get_object_or_404(CompostUnit, id=unit_id, owner=request.user)
+    step = request.POST.get('step') or None
+    agg = request.POST.get('agg', 'mean')
+    fill = request.POST.get('fill', 'none')
+    try:
+        if step:
+            parse_step(step)
+        if agg not in AGGREGATIONS or fill not in FILLS:
+            raise ValueError
+    except ValueError:
+        return HttpResponse('Parámetros de remuestreo inválidos.', status=400)
+
+    job = run_write(
+        enqueue, 'export_readings_pdf',
+        {'unit_id': str(unit.pk), 'step': step, 'agg': agg, 'fill': fill},
+        owner=request.user, priority=5,
+        dedup_key=f'export_readings_pdf:{unit.pk}:{step}:{agg}:{fill}',
+    )
+    if 'application/json' in request.headers.get('Accept', ''):
+        return JsonResponse(_job_payload(job, request.user), status=202)
+    return redirect('job_detail', job_id=job.pk)
 
 
-def create_demo_sensor_data(unit):
-    now = timezone.now()
-    phases = [
-        {'temp_range': (45, 65), 'humidity_range': (40, 60), 'ph_range': (6.0, 7.5), 'oxygen_range': (5, 15)},
-        {'temp_range': (25, 45), 'humidity_range': (50, 70), 'ph_range': (6.5, 8.0), 'oxygen_range': (10, 20)},
-        {'temp_range': (20, 35), 'humidity_range': (55, 75), 'ph_range': (7.0, 8.5), 'oxygen_range': (15, 25)},
-        {'temp_range': (15, 25), 'humidity_range': (60, 80), 'ph_range': (7.5, 8.5), 'oxygen_range': (18, 30)},
-    ]
-
-    for day in range(7):
-        phase = phases[min(day // 2, len(phases) - 1)]
-        for _ in range(random.randint(4, 6)):
-            timestamp = now - timedelta(days=6-day, hours=random.randint(0, 23), minutes=random.randint(0, 59))
-            if not SensorReading.objects.filter(
-                unit=unit,
-                timestamp__range=[timestamp - timedelta(minutes=30), timestamp + timedelta(minutes=30)]
-            ).exists():
-                SensorReading.objects.create(
-                    unit=unit,
-                    temperature=round(random.uniform(*phase['temp_range']), 1),
-                    humidity=round(random.uniform(*phase['humidity_range']), 1),
-                    ph=round(random.uniform(*phase['ph_range']), 1),
-                    oxygen=round(random.uniform(*phase['oxygen_range']), 1),
-                    timestamp=timestamp
-                )
 from django.shortcuts import render, get_object_or_404
 from django.utils.timezone import now, timedelta
 from .models import CompostUnit, MonitoringLog
@@ -442,3 +867,37 @@ def compost_temperature_chart(request, unit_id):
     }
     return render(request, 'compost/chart.html', context)
 
+
+@require_GET
+def serve_static(request, path):
+    """Sirve STATIC_ROOT con la variante precomprimida que acepte el cliente.
+
+    Los nombres con hash de contenido nunca cambian: se cachean un año como
+    inmutables. El resto se revalida con ETag.
+    """
+    if not settings.STATIC_ROOT:
+        raise Http404
+    try:
+        original = safe_join(settings.STATIC_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(original):
+        raise Http404
+    served, encoding = pick_variant(original, request.headers.get('Accept-Encoding', ''))
+    stat = os.stat(served)
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+    if HASHED_NAME.search(path):
+        cache = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    else:
+        cache = 'public, no-cache'
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+    else:
+        response = FileResponse(open(served, 'rb'), content_type=content_type(original))
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = cache
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
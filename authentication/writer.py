@@ -0,0 +1,155 @@
+# authentication/writer.py
+"""Canal de escritura único para SQLite.
+
+Todas las escrituras del proceso se encolan y las ejecuta un solo hilo con su
+propia conexión, agrupando las pendientes en una misma transacción. Entre
+procesos, un candado de archivo garantiza que solo un escritor tenga la base
+de datos a la vez, de modo que los escritores nunca chocan y los lectores
+(modo WAL) nunca se bloquean.
+
+Alcance: pasan por aquí las escrituras de la aplicación (unidades, registro
+de usuarios, ingreso de lecturas por la API, trabajos, purgas, registro de
+consultas lentas) y, dentro de ellas, las de sus señales. Las escrituras
+que Django hace en la conexión de la propia petición (sesiones, last_login
+al iniciar sesión, formularios del admin, que ya corren en su transacción)
+no usan este canal: las serializa SQLite con transacciones IMMEDIATE y el
+busy_timeout de settings.SQLITE_PRAGMAS.
+"""
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin candado entre procesos
+    fcntl = None
+
+# Máximo de escrituras pendientes que se agrupan en una transacción
+MAX_BATCH = 100
+
+
+def get_lock_path():
+    runtime_dir = getattr(settings, 'RUNTIME_DIR', settings.BASE_DIR / 'var')
+    os.makedirs(runtime_dir, exist_ok=True)
+    return os.path.join(runtime_dir, 'db-writer.lock')
+
+
+@contextmanager
+def process_write_lock():
+    """Candado exclusivo entre procesos alrededor de una transacción de escritura"""
+    if fcntl is None:
+        yield
+        return
+    with open(get_lock_path(), 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class SingleWriter:
+    """Hilo escritor único que serializa las escrituras de este proceso"""
+
+    def __init__(self, using='default'):
+        self.using = using
+        self._queue = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_started(self):
+        # Tras un fork el hilo no existe en el proceso hijo: se vuelve a lanzar
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(
+                    target=self._loop, name='compost-db-writer', daemon=True
+                )
+                self._thread.start()
+
+    def in_writer_thread(self):
+        return threading.current_thread() is self._thread
+
+    def submit(self, func, *args, **kwargs):
+        """Encola una escritura y devuelve un Future con su resultado"""
+        future = Future()
+        if self.in_writer_thread():
+            # Escritura anidada: ya estamos dentro de la transacción del escritor
+            try:
+                future.set_result(func(*args, **kwargs))
+            except BaseException as exc:
+                future.set_exception(exc)
+            return future
+        self._ensure_started()
+        self._queue.put((future, func, args, kwargs))
+        return future
+
+    def run(self, func, *args, timeout=None, **kwargs):
+        """Ejecuta una escritura en el hilo escritor y espera su resultado"""
+        return self.submit(func, *args, **kwargs).result(timeout)
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        while len(batch) < MAX_BATCH:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return [item for item in batch if item[0].set_running_or_notify_cancel()]
+
+    def _loop(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                continue
+            close_old_connections()
+            results = []
+            try:
+                with process_write_lock(), transaction.atomic(using=self.using):
+                    for future, func, args, kwargs in batch:
+                        # Cada escritura en su savepoint: un fallo no aborta las demás
+                        try:
+                            with transaction.atomic(using=self.using):
+                                results.append((future, True, func(*args, **kwargs)))
+                        except Exception as exc:
+                            results.append((future, False, exc))
+            except BaseException as exc:
+                for future, *_ in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+                continue
+            # Los resultados se publican solo cuando la transacción ya se confirmó
+            for future, ok, value in results:
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+
+
+writer = SingleWriter()
+
+
+def run_write(func, *args, **kwargs):
+    """Atajo para ejecutar una escritura a través del escritor único"""
+    from .routers import note_write
+
+    # La escritura ocurre en otro hilo: las lecturas siguientes de esta
+    # petición deben ir a la base principal
+    note_write()
+    if connection.in_atomic_block:
+        # El llamador ya tiene una transacción abierta (y con ella el candado de
+        # escritura): delegar en el hilo escritor provocaría un interbloqueo.
+        return func(*args, **kwargs)
+    if not getattr(settings, 'SINGLE_WRITER_ENABLED', True):
+        with transaction.atomic():
+            return func(*args, **kwargs)
+    return writer.run(func, *args, **kwargs)
@@ -0,0 +1,173 @@
+# authentication/yields.py
+"""Rendimiento de las cosechas.
+
+YieldSummary guarda por unidad y por mes lo cosechado (kg, cantidad, grados
+de calidad, edad acumulada) y lo ingresado. Cada escritura de una cosecha o
+entrada ajusta solo la fila de su mes con F(), de modo que un informe de
+varios años y sitios se arma con unas pocas filas por unidad en lugar de
+recorrer CompostHarvest y CompostEntry.
+"""
+from collections import OrderedDict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+GRADES = ('A', 'B', 'C', 'D')
+
+GROUPS = {
+    'unit': ('compost_unit', 'compost_unit__name'),
+    'owner': ('compost_unit__owner', 'compost_unit__owner__username'),
+    'organization': ('compost_unit__owner__profile__organization',
+                     'compost_unit__owner__profile__organization'),
+}
+
+
+def month_of(value):
+    """Primer día del mes (en la zona horaria activa) de una fecha/hora"""
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    return value.date().replace(day=1)
+
+
+def _bump(unit_id, month, create, **deltas):
+    """Suma `deltas` a la fila (unidad, mes); la crea solo si `create`"""
+    from .models import YieldSummary
+
+    rows = YieldSummary.objects.filter(compost_unit_id=unit_id, month=month)
+    if rows.update(**{name: F(name) + value for name, value in deltas.items()}) or not create:
+        # Al restar no se crean filas: en un borrado en cascada la unidad ya no existe
+        return
+    try:
+        with transaction.atomic():
+            YieldSummary.objects.create(compost_unit_id=unit_id, month=month, **deltas)
+    except IntegrityError:
+        # Otro proceso creó la fila del mes entre el UPDATE y el INSERT
+        rows.update(**{name: F(name) + value for name, value in deltas.items()})
+
+
+def apply_harvest(state, sign=1):
+    """Suma (sign=1) o resta (sign=-1) una cosecha a su resumen mensual"""
+    if state['compost_unit_id'] is None or state['harvest_date'] is None:
+        return
+    deltas = {
+        'harvested_kg': sign * Decimal(str(state['quantity'])),
+        'harvest_count': sign,
+        'age_days_total': sign * (state['compost_age_days'] or 0),
+    }
+    if state['quality_grade'] in GRADES:
+        deltas['grade_' + state['quality_grade'].lower()] = sign
+    _bump(state['compost_unit_id'], month_of(state['harvest_date']), sign > 0, **deltas)
+
+
+def apply_input(unit_id, date_added, quantity, sign=1):
+    """Suma o resta material ingresado al resumen del mes de la entrada"""
+    if unit_id is None or date_added is None or quantity is None:
+        return
+    _bump(unit_id, month_of(date_added), sign > 0,
+          input_kg=sign * Decimal(str(quantity)))
+
+
+def rebuild_yield_summaries(unit_ids=None):
+    """Recalcula los resúmenes desde cosechas y entradas; devuelve cuántas filas escribió"""
+    from .models import CompostEntry, CompostHarvest, YieldSummary
+
+    harvests = CompostHarvest.objects.all()
+    entries = CompostEntry.objects.all()
+    summaries = YieldSummary.objects.all()
+    if unit_ids is not None:
+        harvests = harvests.filter(compost_unit__in=unit_ids)
+        entries = entries.filter(compost_unit__in=unit_ids)
+        summaries = summaries.filter(compost_unit__in=unit_ids)
+
+    rows = {}
+
+    def row(unit_id, month):
+        month = month_of(month)
+        if (unit_id, month) not in rows:
+            rows[unit_id, month] = YieldSummary(compost_unit_id=unit_id, month=month)
+        return rows[unit_id, month]
+
+    grouped = (
+        harvests.order_by()
+        .annotate(period=TruncMonth('harvest_date'))
+        .values('compost_unit', 'period')
+        .annotate(
+            kg=Sum('quantity'), count=Count('id'), age=Sum('compost_age_days'),
+            **{'grade_' + g.lower(): Count('id', filter=Q(quality_grade=g)) for g in GRADES}
+        )
+    )
+    for values in grouped:
+        summary = row(values['compost_unit'], values['period'])
+        summary.harvested_kg = values['kg']
+        summary.harvest_count = values['count']
+        summary.age_days_total = values['age'] or 0
+        for grade in GRADES:
+            name = 'grade_' + grade.lower()
+            setattr(summary, name, values[name])
+
+    grouped = (
+        entries.order_by()
+        .annotate(period=TruncMonth('date_added'))
+        .values('compost_unit', 'period')
+        .annotate(kg=Sum('quantity'))
+    )
+    for values in grouped:
+        row(values['compost_unit'], values['period']).input_kg = values['kg']
+
+    with transaction.atomic():
+        summaries.delete()
+        YieldSummary.objects.bulk_create(rows.values(), batch_size=500)
+    return len(rows)
+
+
+def yield_report(summaries, group='unit'):
+    """Agrega resúmenes mensuales por unidad, propietario u organización.
+
+    Devuelve una lista de dicts con totales, distribución de calidad, edad
+    media, eficiencia (cosechado / ingresado) y kg por mes.
+    """
+    key, label = GROUPS[group]
+    totals = (
+        summaries.order_by()
+        .values(*dict.fromkeys((key, label, 'month')))
+        .annotate(
+            harvested=Sum('harvested_kg'), harvests=Sum('harvest_count'),
+            age=Sum('age_days_total'), input=Sum('input_kg'),
+            **{g: Sum('grade_' + g.lower()) for g in GRADES}
+        )
+        .order_by(label, 'month')
+    )
+    report = OrderedDict()
+    for values in totals:
+        item = report.setdefault(values[key], {
+            'key': values[key],
+            'label': values[label] or 'Sin organización',
+            'harvested_kg': Decimal(0),
+            'harvest_count': 0,
+            'age_days_total': 0,
+            'input_kg': Decimal(0),
+            'grades': dict.fromkeys(GRADES, 0),
+            'months': [],
+        })
+        item['harvested_kg'] += values['harvested'] or 0
+        item['harvest_count'] += values['harvests'] or 0
+        item['age_days_total'] += values['age'] or 0
+        item['input_kg'] += values['input'] or 0
+        for grade in GRADES:
+            item['grades'][grade] += values[grade] or 0
+        item['months'].append((values['month'], values['harvested'] or Decimal(0)))
+
+    for item in report.values():
+        count = item['harvest_count']
+        item['mean_age_days'] = item['age_days_total'] / count if count else None
+        item['grade_share'] = [
+            (grade, item['grades'][grade], 100 * item['grades'][grade] / count if count else 0)
+            for grade in GRADES
+        ]
+        item['efficiency'] = (
+            float(item['harvested_kg'] / item['input_kg']) * 100 if item['input_kg'] else None
+        )
+    return list(report.values())
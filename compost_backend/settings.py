@@ -49,8 +49,14 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'authentication.querylog.SlowQueryMiddleware',
+    'authentication.routers.ReplicaRoutingMiddleware',
 ]
 
+# Registro de consultas lentas: umbral en milisegundos (None lo desactiva).
+# Ver `python manage.py slow_queries` para el ranking por tiempo total.
+SLOW_QUERY_THRESHOLD_MS = 100
+
 ROOT_URLCONF = 'compost_backend.urls'
 # Configuración para redireccionar después del login/logout
 STATIC_URL = 'static/'
@@ -80,13 +86,84 @@ WSGI_APPLICATION = 'compost_backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Perfil de producción para SQLite: WAL para que los lectores no bloqueen a
+# los escritores, transacciones IMMEDIATE para evitar "database is locked" al
+# pasar de lectura a escritura, y conexiones persistentes.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -20000,  # negativo = KiB (~20 MB por conexión)
+    'busy_timeout': 20000,  # ms
+    'temp_store': 'MEMORY',
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': ';'.join(
+                f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()
+            ),
+        },
+    },
+    # Copia de solo lectura para vistas analíticas, refrescada con
+    # `python manage.py snapshot_replica --interval 60`
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db_replica.sqlite3',
+        'OPTIONS': {
+            'init_command': 'PRAGMA query_only=ON;PRAGMA mmap_size=268435456',
+        },
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    },
+}
+
+DATABASE_ROUTERS = ['authentication.routers.ReplicaRouter']
+
+# Claves de API de dispositivos: tamaño y vigencia (segundos) de la caché de
+# verificación. Una clave revocada deja de funcionar como mucho tras el TTL.
+DEVICE_KEY_CACHE_SIZE = 1024
+DEVICE_KEY_REJECTED_CACHE_SIZE = 256
+DEVICE_KEY_CACHE_TTL = 60
+
+# Desfase máximo (segundos) aceptado para leer de la réplica; si la copia es
+# más antigua las lecturas vuelven a la base principal
+REPLICA_MAX_STALENESS = 300
+
+# Directorio para archivos de ejecución (candados, cachés, resultados)
+RUNTIME_DIR = BASE_DIR / 'var'
+
+# 'reports' guarda en disco los PDF generados para compartirlos entre procesos
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'reports': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': RUNTIME_DIR / 'cache' / 'reports',
+        'OPTIONS': {'MAX_ENTRIES': 500},
+    },
+    # Resultados compartidos entre procesos de los cálculos coalescidos
+    # (ver authentication/singleflight.py)
+    'singleflight': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': RUNTIME_DIR / 'cache' / 'singleflight',
+        'OPTIONS': {'MAX_ENTRIES': 1000},
+    },
 }
 
+# Serializa las escrituras de la aplicación a través de un único hilo escritor
+# por proceso y un candado de archivo entre procesos (ver authentication/writer.py;
+# sesiones, login y admin escriben en su propia conexión con BEGIN IMMEDIATE)
+SINGLE_WRITER_ENABLED = True
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -126,6 +203,17 @@ STATIC_URL = 'static/'
 STATICFILES_DIRS = [
     BASE_DIR / 'authentication' / 'static'
 ]
+# Destino de collectstatic: nombres con hash de contenido y variantes .gz/.br
+# (ver authentication/assets.py)
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'authentication.assets.CompressedManifestStaticFilesStorage',
+    },
+}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -17,13 +17,17 @@ Including another URLconf
 
 # compost_backend/urls.py
 from django.contrib import admin
-from django.urls import path, include
+from django.conf import settings
+from django.urls import path, include, re_path
 from django.shortcuts import redirect
 
+from authentication.views import serve_static
+
 urlpatterns = [
     #path('accounts/', include('django.contrib.auth.urls')),
     path('admin/', admin.site.urls),
     path('auth/', include('authentication.urls')),
     path('', lambda request: redirect('login'), name='home'),
-    
+    # Estáticos con hash y precomprimidos (en DEBUG runserver los sirve desde las apps)
+    re_path(r'^%s(?P<path>.+)$' % settings.STATIC_URL.lstrip('/'), serve_static, name='static'),
 ]
\ No newline at end of file